@@ -1,23 +1,53 @@
-import startup.system_check as system_check
-from controllers.display_controller import DisplayController
-
-def boot_sequence():
-    print("🚀 Robot başlatılıyor...")
-    
-    # Donanım kontrolleri
-    print("🔧 Donanım testleri yapılıyor...")
+import logging
+
+from utils.boot_orchestrator import BootOrchestrator, BootError
+from utils.logger_tools import setup_logging
+
+logger = logging.getLogger('boot')
+
+def start_display():
+    from controllers.display_controller import DisplayController
+    display = DisplayController()
+    display.init_display(message="Kontrol ediliyor...")
+    return display
+
+def run_system_check():
+    # Donanım testleri ekranı beklemeden, ekranla aynı anda çalışır
+    import startup.system_check as system_check
     if not system_check.run_all_tests():
-        print("❌ Donanım testi başarısız! Lütfen kontrol et.")
+        raise RuntimeError("Donanım testi başarısız")
+    return True
+
+def boot_sequence(wait_display=False):
+    setup_logging()
+    logger.info("🚀 Robot başlatılıyor...")
+
+    logger.info("🔧 Donanım testleri yapılıyor...")
+    boot = BootOrchestrator()
+    boot.add('display', start_display)
+    boot.add('system_check', run_system_check)
+    try:
+        components = boot.boot()
+    except BootError as e:
+        logger.error("❌ Donanım testi başarısız! Lütfen kontrol et. (%s)", e)
+        boot.report()
+        display = boot.components['display'].instance
+        if display is not None:
+            display.show_message("Donanım hatası!")
+            if wait_display:
+                display.wait_idle()
         # İstersen burada hata durumunda sistemi durdurabilirsin.
         return False
-    
-    # Ekran açılıyor
-    display = DisplayController()
-    display.init_display()
+    boot.report()
+
+    display = components['display']
     display.show_message("Robot Başladı!")
-    
-    print("✅ Başlangıç başarılı.")
+    if wait_display:
+        # Mesajlar arka planda gösteriliyor, süreç kapanmadan bitmelerini bekle
+        display.wait_idle()
+
+    logger.info("✅ Başlangıç başarılı.")
     return True
 
 if __name__ == "__main__":
-    boot_sequence()
+    boot_sequence(wait_display=True)
@@ -3,76 +3,177 @@ audio_controller.py
 
 Handles microphone input and speaker output.
 Integrates speech recognition and text-to-speech capabilities.
+The microphone is captured continuously; a voice activity detector cuts
+utterances out of the stream and only those are sent to the recognizer.
+Speech output is queued and cached (see speech_output.py), so speak() never blocks.
+Sound effects from assets/sounds and speech share one mixed output stream (sound_engine.py).
 """
 
-import pyaudio
+import logging
 import wave
+import queue
 import threading
 import speech_recognition as sr
 import pyttsx3
 import time
+import numpy as np
+
+from controllers.voice_activity import AudioRingBuffer, EnergyVAD, UtteranceSegmenter
+from controllers.speech_recognizers import SpeechRecognizer, create_recognizer
+from controllers.speech_output import SpeechOutput, PRIORITY_NORMAL
+from controllers.sound_engine import SoundEngine
+from utils.hardware import pyaudio
+
+logger = logging.getLogger(__name__)
 
 class AudioController:
-    def __init__(self):
+    def __init__(self, recognizer="google", sample_rate=16000, frame_ms=30, ring_seconds=5,
+                 barge_in=False, **recognizer_args):
+        """
+        :param recognizer: "google", "sphinx", "vosk" or a SpeechRecognizer instance
+        :param sample_rate: microphone sample rate in Hz
+        :param frame_ms: VAD frame length
+        :param ring_seconds: capture ring buffer length
+        :param barge_in: stop talking as soon as the user starts speaking
+        :param recognizer_args: passed to the recognizer backend (e.g. language, model_path)
+        """
         # Initialize PyAudio for input/output
         self.p = pyaudio.PyAudio()
         self.stream = None
         
         # Speech recognizer
-        self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        if isinstance(recognizer, SpeechRecognizer):
+            self.recognizer = recognizer
+        else:
+            self.recognizer = create_recognizer(recognizer, **recognizer_args)
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.ring = AudioRingBuffer(sample_rate * ring_seconds)
+        self.segmenter = UtteranceSegmenter(EnergyVAD(), frame_ms=frame_ms)
+        self.utterances = queue.Queue(maxsize=4)
+        
+        # Sound effects, preloaded and mixed on one persistent output stream
+        self.sounds = SoundEngine(self.p)
+        self.sounds.start()
         
         # Text-to-speech engine
         self.tts_engine = pyttsx3.init()
+        self.speech = SpeechOutput(self.tts_engine, self.p, mixer=self.sounds)
+        self.barge_in = barge_in
         
         self.listening = False
         self.listening_thread = None
+        self.recognition_thread = None
         self.callback = None  # Function to call when speech is recognized
+        self.recognition_errors = 0
+        self.callback_errors = 0
     
     def start_listening(self, callback):
         """Start background listening to microphone and call callback(text) on recognized speech."""
         if self.listening:
-            print("[AudioController] Already listening")
+            logger.warning("Already listening")
             return
         self.callback = callback
         self.listening = True
+        self.stream = self.p.open(format=pyaudio.paInt16, channels=1, rate=self.sample_rate, input=True,
+                                  frames_per_buffer=self.frame_samples, stream_callback=self._capture)
         self.listening_thread = threading.Thread(target=self._listen_in_background, daemon=True)
         self.listening_thread.start()
-        print("[AudioController] Started listening")
+        self.recognition_thread = threading.Thread(target=self._recognize_in_background, daemon=True)
+        self.recognition_thread.start()
+        logger.info("Started listening")
+
+    def _capture(self, in_data, frame_count, time_info, status):
+        """PyAudio callback: only copies samples into the ring buffer."""
+        self.ring.write(np.frombuffer(in_data, dtype=np.int16))
+        return (None, pyaudio.paContinue)
 
     def _listen_in_background(self):
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source)
-            while self.listening:
-                print("[AudioController] Listening...")
+        """Run the VAD over the captured stream and queue complete utterances."""
+        while self.listening:
+            frame = self.ring.read(self.frame_samples, timeout=0.5)
+            if frame is None:
+                continue
+            was_in_speech = self.segmenter.in_speech
+            utterance = self.segmenter.feed(frame)
+            if self.barge_in and self.segmenter.in_speech and not was_in_speech:
+                self.speech.interrupt()
+            if utterance is None:
+                continue
+            try:
+                self.utterances.put_nowait(utterance)
+            except queue.Full:
+                logger.warning("Recognizer busy, dropping utterance")
+
+    def _recognize_in_background(self):
+        while self.listening:
+            try:
+                utterance = self.utterances.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Any failure costs this utterance only; letting it escape would end listening for good
+            try:
+                text = self.recognizer.recognize(utterance.tobytes(), self.sample_rate)
+            except sr.UnknownValueError:
+                text = None
+            except Exception as e:
+                self.recognition_errors += 1
+                logger.error("Recognition error: %s", e)
+                continue
+            if not text:
+                logger.debug("Could not understand audio")
+                continue
+            logger.info("Recognized: %s", text)
+            if self.callback:
                 try:
-                    audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=5)
-                    text = self.recognizer.recognize_google(audio)
-                    print(f"[AudioController] Recognized: {text}")
-                    if self.callback:
-                        self.callback(text)
-                except sr.WaitTimeoutError:
-                    print("[AudioController] Listening timeout, retrying...")
-                except sr.UnknownValueError:
-                    print("[AudioController] Could not understand audio")
-                except sr.RequestError as e:
-                    print(f"[AudioController] Recognition error: {e}")
-                time.sleep(0.5)
+                    self.callback(text)
+                except Exception as e:
+                    self.callback_errors += 1
+                    logger.error("Command callback failed: %s", e)
     
     def stop_listening(self):
         """Stop the background listening thread."""
         self.listening = False
-        if self.listening_thread:
-            self.listening_thread.join()
-        print("[AudioController] Stopped listening")
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        for thread in (self.listening_thread, self.recognition_thread):
+            if thread:
+                thread.join()
+        logger.info("Stopped listening")
+
+    def get_listening_stats(self):
+        return {
+            'utterances': self.segmenter.utterances,
+            'discarded': self.segmenter.discarded,
+            'ring_overruns': self.ring.overruns,
+            'noise_floor': self.segmenter.vad.noise_floor,
+            'recognition_errors': self.recognition_errors,
+            'callback_errors': self.callback_errors,
+        }
     
-    def speak(self, text):
-        """Speak given text out loud."""
-        print(f"[AudioController] Speaking: {text}")
-        self.tts_engine.say(text)
-        self.tts_engine.runAndWait()
+    def speak(self, text, priority=PRIORITY_NORMAL, interrupt=False, wait=False):
+        """
+        Speak given text out loud. Returns immediately unless wait=True.
+        :param interrupt: cut off whatever is being said right now
+        """
+        logger.info("Speaking: %s", text)
+        self.speech.say(text, priority=priority, interrupt=interrupt)
+        if wait:
+            self.speech.wait_idle()
+
+    def play_sound(self, name, gain=1.0, loop=False):
+        """Start a sound effect from assets/sounds (e.g. "hello") without blocking."""
+        return self.sounds.play(name, gain=gain, loop=loop)
+
+    def prerender_phrases(self, phrases):
+        """Synthesize frequent phrases (greetings, error prompts) into the speech cache in the background."""
+        self.speech.prerender(phrases)
     
     def cleanup(self):
         self.stop_listening()
+        self.speech.stop()
+        self.sounds.stop()
         self.p.terminate()
-        print("[AudioController] Cleaned up audio resources")
+        logger.info("Cleaned up audio resources")
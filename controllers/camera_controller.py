@@ -2,71 +2,256 @@
 camera_controller.py
 
 Handles camera initialization, frame capture, and face detection.
-Uses OpenCV Haar cascades or TensorFlow Lite for lightweight face recognition.
+Uses OpenCV Haar cascades or TensorFlow Lite for lightweight face recognition
+(see face_detectors.py for the backends).
+Captured frames go into a preallocated ring and are handed out as read-only views.
 """
 
 import cv2
 import numpy as np
+import logging
 import threading
 import time
 import os
+from collections import namedtuple
+
+from controllers.face_tracker import FacePipeline
+from controllers.face_detectors import FaceDetector, create_detector
+from controllers.motion_gate import MotionGate
+from utils.hardware import open_camera
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+FramePacket = namedtuple('FramePacket', ['frame_id', 'timestamp', 'image'])
+
+MIN_FACE_SIZE = 50  # smallest face to detect, in pixels of the captured frame
+
+def scaled_min_size(detect_scale):
+    """Haar minimum face size on a frame downscaled by detect_scale."""
+    return max(1, int(MIN_FACE_SIZE * detect_scale))
+
+class FrameRing:
+    """
+    Preallocated ring of grayscale frame buffers.
+    Frames are published with monotonically increasing IDs and capture timestamps.
+    Consumers get read-only views into the ring, so a view is only valid until the
+    slot is reused, i.e. for `slots - 1` further frames; use is_current() to check
+    or copy the image if it must be kept longer.
+    Size the ring for the slowest consumer that reads a view in place: with 4 slots
+    at 30 fps it has about 100 ms, enough for a JPEG encode on a Pi. Face detection
+    takes longer and works on a copy.
+    """
+
+    def __init__(self, slots=4):
+        self.slots = slots
+        self.buffers = None
+        self.views = None
+        self.latest = None
+        self.cond = threading.Condition()
+        self._next_slot = 0
+        self._next_id = 1
+
+    def write_buffer(self, shape):
+        """Return the buffer the next frame should be written into (capture thread only)."""
+        if self.buffers is None or self.buffers[0].shape != shape:
+            self.buffers = [np.empty(shape, dtype=np.uint8) for _ in range(self.slots)]
+            self.views = []
+            for buf in self.buffers:
+                view = buf.view()
+                view.flags.writeable = False
+                self.views.append(view)
+            self._next_slot = 0
+        return self.buffers[self._next_slot]
+
+    def publish(self, timestamp):
+        """Publish the buffer returned by write_buffer() as the newest frame."""
+        packet = FramePacket(self._next_id, timestamp, self.views[self._next_slot])
+        with self.cond:
+            self.latest = packet
+            self.cond.notify_all()
+        self._next_id += 1
+        self._next_slot = (self._next_slot + 1) % self.slots
+
+    def wait_for_frame(self, after_id=0, timeout=None):
+        """Return the newest FramePacket with frame_id > after_id, or None on timeout."""
+        with self.cond:
+            if self.cond.wait_for(lambda: self.latest is not None and self.latest.frame_id > after_id, timeout):
+                return self.latest
+            return None
+
+    def is_current(self, packet):
+        """True while the packet's slot has not been overwritten by newer frames."""
+        latest = self.latest
+        return latest is not None and latest.frame_id - packet.frame_id < self.slots - 1
 
 class CameraController:
-    def __init__(self, cascade_path=None):
-        self.camera = cv2.VideoCapture(0)
+    def __init__(self, cascade_path=None, ring_slots=4, detect_interval=5, detect_scale=0.5,
+                 detector="haar", model_path=None, detector_threads=2, motion_gate=True,
+                 max_fps=30, recorder=None):
+        """
+        :param cascade_path: Haar cascade XML file (defaults to OpenCV's frontal face model)
+        :param ring_slots: number of preallocated frame buffers
+        :param detect_interval: run full face detection every N frames, track in between
+        :param detect_scale: downscale factor for full face detection
+        :param detector: "haar", "tflite" or a FaceDetector instance
+        :param model_path: .tflite model file for the "tflite" backend
+        :param detector_threads: TFLite interpreter threads
+        :param motion_gate: only run face detection on frames where the scene changed
+        :param max_fps: capture rate limit (None to take frames as fast as the camera delivers them)
+        :param recorder: optional utils.recording.Recorder receiving every grayscale frame
+        """
+        self.camera = open_camera(0)
         if not self.camera.isOpened():
             raise Exception("[CameraController] Unable to open camera")
         
-        # Load Haar cascade for face detection
-        if cascade_path is None:
-            cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        self.face_cascade = cv2.CascadeClassifier(cascade_path)
+        # Face detector backend
+        if isinstance(detector, FaceDetector):
+            self.detector = detector
+        elif detector == "haar":
+            # Detection runs on the downscaled frame, scale the minimum face size with it
+            self.detector = create_detector("haar", cascade_path=cascade_path,
+                                            min_size=scaled_min_size(detect_scale))
+        else:
+            self.detector = create_detector(detector, model_path=model_path, num_threads=detector_threads)
+        logger.info("Face detector: %s", self.detector.name)
+        self.motion_gate = MotionGate() if motion_gate else None
+        self.face_pipeline = FacePipeline(self.detector.detect, detect_interval=detect_interval,
+                                          detect_scale=detect_scale, gate=self.motion_gate)
         
         self.running = False
-        self.frame = None
-        self.lock = threading.Lock()
+        self.frames = FrameRing(ring_slots)
         self.thread = None
+        self.max_fps = max_fps
+        self.recorder = recorder
+        self._resolution = None  # (width, height) requested by set_vision_rates(), applied by the capture thread
+
+        # Last detection result, reused while no newer frame has arrived
+        self._work = None  # private copy of the frame being processed
+        self._detected_frame_id = None
+        self._frame_shape = None
+        self._faces = []
 
     def start_camera(self):
         """Start continuous frame capture in a separate thread."""
         if self.running:
-            print("[CameraController] Camera already running")
+            logger.warning("Camera already running")
             return
         
         self.running = True
         self.thread = threading.Thread(target=self._update_frames, daemon=True)
         self.thread.start()
-        print("[CameraController] Camera started")
+        logger.info("Camera started")
     
     def _update_frames(self):
+        capture = None
+        next_frame = time.monotonic()
         while self.running:
-            ret, frame = self.camera.read()
+            if self._resolution is not None:
+                width, height = self._resolution
+                self._resolution = None
+                self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+                self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+                capture = None
+            ret, capture = self.camera.read(capture)
             if not ret:
-                print("[CameraController] Frame capture failed")
+                logger.warning("Frame capture failed")
+                capture = None
+                time.sleep(0.1)
                 continue
-            with self.lock:
-                self.frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            time.sleep(0.03)  # ~30 FPS
+            timestamp = time.monotonic()
+            gray = self.frames.write_buffer(capture.shape[:2])
+            if capture.ndim == 2:
+                np.copyto(gray, capture)
+            else:
+                cv2.cvtColor(capture, cv2.COLOR_BGR2GRAY, dst=gray)
+            self.frames.publish(timestamp)
+            if self.recorder is not None:
+                self.recorder.record_frame(gray, timestamp)
+            if self.max_fps:
+                next_frame = max(next_frame + 1.0 / self.max_fps, timestamp)
+                time.sleep(max(0.0, next_frame - time.monotonic()))
     
     def get_frame(self):
-        """Return the latest grayscale frame."""
-        with self.lock:
-            return self.frame.copy() if self.frame is not None else None
+        """Return the latest grayscale frame as a read-only view (see FrameRing)."""
+        packet = self.frames.latest
+        return packet.image if packet is not None else None
+
+    def get_frame_packet(self):
+        """Return the latest FramePacket(frame_id, timestamp, image), or None."""
+        return self.frames.latest
+
+    def wait_for_frame(self, after_id=0, timeout=None):
+        """Block until a frame newer than `after_id` is captured; returns its FramePacket or None."""
+        return self.frames.wait_for_frame(after_id, timeout)
+
+    def is_current(self, packet):
+        """True while the packet's image has not been overwritten (see FrameRing)."""
+        return self.frames.is_current(packet)
+    
+    @timed('camera.detect_faces')
+    def detect_faces(self):
+        """
+        Detect or track faces in the current frame.
+        :return: list of FaceTrack(track_id, box, confidence), box in full-resolution pixels
+        """
+        packet = self.frames.latest
+        if packet is None:
+            return []
+        if packet.frame_id == self._detected_frame_id:
+            # Already processed this frame
+            return self._faces
+        if packet.image.shape != self._frame_shape:
+            # Resolution changed, tracks from the old frames no longer apply
+            self.face_pipeline.reset()
+            self._frame_shape = packet.image.shape
+            self._work = np.empty(packet.image.shape, dtype=np.uint8)
+        # Detection outlasts the ring slot, so work on a copy; a frame overwritten during the copy is skipped
+        np.copyto(self._work, packet.image)
+        if not self.frames.is_current(packet):
+            return self._faces
+        faces = self.face_pipeline.process(self._work)
+        if len(faces) != len(self._faces):
+            logger.debug("Faces in view: %d", len(faces))
+        self._detected_frame_id = packet.frame_id
+        self._faces = faces
+        return faces
     
     def detect_face(self):
         """Detect face in current frame, returns True if detected."""
-        frame = self.get_frame()
-        if frame is None:
-            return False
-        faces = self.face_cascade.detectMultiScale(frame, scaleFactor=1.1, minNeighbors=5, minSize=(50, 50))
-        if len(faces) > 0:
-            print(f"[CameraController] Face detected: {len(faces)} found")
-            return True
-        return False
+        return len(self.detect_faces()) > 0
+
+    def set_vision_rates(self, max_fps=None, resolution=None, detect_interval=None, detect_scale=None,
+                         scale_factor=None):
+        """
+        Change capture and detection settings while running; None keeps the current value.
+        :param resolution: (width, height) requested from the camera; detect_scale applies to this size
+        :param scale_factor: Haar image pyramid step (larger is faster and less thorough)
+        """
+        if max_fps is not None:
+            self.max_fps = max_fps
+        if resolution is not None:
+            self._resolution = tuple(resolution)
+        if detect_interval is not None:
+            self.face_pipeline.detect_interval = detect_interval
+        if detect_scale is not None:
+            self.face_pipeline.detect_scale = detect_scale
+            if hasattr(self.detector, 'min_size'):
+                self.detector.min_size = scaled_min_size(detect_scale)
+        if scale_factor is not None and hasattr(self.detector, 'scale_factor'):
+            self.detector.scale_factor = scale_factor
+
+    def get_vision_stats(self):
+        """Face pipeline and motion gate counters (detections, tracked frames, skip rate)."""
+        stats = {'pipeline': self.face_pipeline.get_stats()}
+        if self.motion_gate is not None:
+            stats['motion_gate'] = self.motion_gate.get_stats()
+        return stats
     
     def stop_camera(self):
         self.running = False
         if self.thread is not None:
             self.thread.join()
         self.camera.release()
-        print("[CameraController] Camera stopped")
+        self.detector.close()
+        logger.info("Camera stopped")
@@ -0,0 +1,205 @@
+"""
+display_compositor.py
+
+Background compositor for the OLED display.
+Runs at a fixed frame rate, takes queued display commands (timed messages,
+blinks, keyframe animations) and pushes the resulting frames so callers
+never wait on the display.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Command priorities (higher wins, a higher priority command preempts the active one)
+PRIORITY_IDLE = 0
+PRIORITY_ANIMATION = 10
+PRIORITY_MESSAGE = 20
+PRIORITY_ALERT = 30
+
+class DisplayCommand:
+    """Base class for queued display commands. Frames are opaque objects passed to the push function."""
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.started = None
+
+    def start(self, now):
+        self.started = now
+
+    def frame_at(self, now):
+        """Return the frame to show at time `now`, or None when the command has finished."""
+        raise NotImplementedError
+
+class StaticFrameCommand(DisplayCommand):
+    """Show a single frame for `ttl` seconds (e.g. a text message)."""
+
+    def __init__(self, frame, ttl, priority=PRIORITY_MESSAGE):
+        super().__init__(priority)
+        self.frame = frame
+        self.ttl = ttl
+
+    def frame_at(self, now):
+        if now - self.started >= self.ttl:
+            return None
+        return self.frame
+
+class AnimationCommand(DisplayCommand):
+    """Play a list of (frame, duration) keyframes, optionally looping until preempted."""
+
+    def __init__(self, keyframes, loop=False, priority=PRIORITY_ANIMATION):
+        super().__init__(priority)
+        self.keyframes = list(keyframes)
+        self.loop = loop
+        self.total = sum(duration for _, duration in self.keyframes)
+
+    def frame_at(self, now):
+        if not self.keyframes or self.total <= 0:
+            return None
+        elapsed = now - self.started
+        if elapsed >= self.total:
+            if not self.loop:
+                return None
+            elapsed %= self.total
+        for frame, duration in self.keyframes:
+            if elapsed < duration:
+                return frame
+            elapsed -= duration
+        return self.keyframes[-1][0]
+
+class DisplayCompositor:
+    def __init__(self, push_frame, blank_frame, fps=20):
+        """
+        :param push_frame: function(frame) that sends a frame to the display;
+                           returning False means the bus was busy and the frame was skipped
+        :param blank_frame: frame shown when there is nothing else to show
+        :param fps: compositor frame rate
+        """
+        self.push_frame = push_frame
+        self.blank_frame = blank_frame
+        self.fps = fps
+
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self._wake = threading.Event()
+        self._queue = []
+        self._seq = itertools.count()
+        self._active = None
+        self._base = None
+        self._shown = None
+
+        self.running = False
+        self.thread = None
+
+        # Statistics
+        self.frames_pushed = 0
+        self.frames_skipped = 0
+        self.commands_preempted = 0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def submit(self, command):
+        """Queue a command and return immediately."""
+        with self.lock:
+            heapq.heappush(self._queue, (-command.priority, next(self._seq), command))
+        self._wake.set()
+
+    def set_base(self, frame):
+        """Set the frame shown whenever no command is active (e.g. the current eye expression)."""
+        with self.lock:
+            self._base = frame
+        self._wake.set()
+
+    def clear(self):
+        """Drop all queued and active commands and fall back to a blank screen."""
+        with self.lock:
+            self._queue.clear()
+            self._active = None
+            self._base = None
+            self.idle.notify_all()
+        self._wake.set()
+
+    def forget_shown(self):
+        """Force the next tick to push its frame even if it did not change."""
+        with self.lock:
+            self._shown = None
+
+    def is_idle(self):
+        with self.lock:
+            return self._active is None and not self._queue
+
+    def wait_idle(self, timeout=None):
+        """Block until every queued command has finished. Returns False on timeout."""
+        with self.idle:
+            return self.idle.wait_for(lambda: self._active is None and not self._queue, timeout)
+
+    def _compose(self, now):
+        with self.lock:
+            if self._active is not None and self._queue and -self._queue[0][0] > self._active.priority:
+                self._active = None
+                self.commands_preempted += 1
+            while True:
+                if self._active is None:
+                    if not self._queue:
+                        break
+                    self._active = heapq.heappop(self._queue)[2]
+                    self._active.start(now)
+                frame = self._active.frame_at(now)
+                if frame is not None:
+                    return frame
+                self._active = None
+            self.idle.notify_all()
+            return self._base if self._base is not None else self.blank_frame
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while self.running:
+            period = 1.0 / self.fps  # fps may be changed while running
+            self._wake.wait(max(0.0, next_tick - time.monotonic()))
+            self._wake.clear()
+            if not self.running:
+                break
+
+            frame = self._compose(time.monotonic())
+            if frame is not self._shown:
+                try:
+                    if self.push_frame(frame) is False:
+                        self.frames_skipped += 1
+                    else:
+                        self._shown = frame
+                        self.frames_pushed += 1
+                except Exception as e:
+                    logger.error("Frame push failed: %s", e)
+
+            # Drop the ticks we missed instead of trying to catch up when the bus is slow
+            now = time.monotonic()
+            if now >= next_tick:
+                next_tick += period
+                if now >= next_tick:
+                    missed = int((now - next_tick) / period) + 1
+                    self.frames_skipped += missed
+                    next_tick += missed * period
+
+    def get_stats(self):
+        return {
+            'frames_pushed': self.frames_pushed,
+            'frames_skipped': self.frames_skipped,
+            'commands_preempted': self.commands_preempted,
+            'queued': len(self._queue),
+        }
@@ -3,60 +3,235 @@ display_controller.py
 
 Controls SSD1106 OLED display.
 Shows eye animations and simple text messages.
+All drawing goes through a background compositor, so none of the calls block.
 """
 
-import time
-from luma.core.interface.serial import i2c
-from luma.oled.device import sh1106  # Note: use sh1106 if SSD1306 driver unavailable; adjust if needed
+import numpy as np
+from collections import OrderedDict
 from PIL import Image, ImageDraw, ImageFont
+import logging
 import os
 
+from controllers.display_framebuffer import PageFramebuffer
+from controllers.display_compositor import (DisplayCompositor, StaticFrameCommand, AnimationCommand,
+                                            PRIORITY_ANIMATION, PRIORITY_MESSAGE)
+from utils.i2c_bus import get_bus_manager, PRIORITY_DISPLAY
+from utils.hardware import open_display
+from utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+DISPLAY_ADDR = 0x3C
+
+# Eye assets are stored as assets/eyes/eyes_<name>.png
+EYE_ASSET_PREFIX = "eyes_"
+EYE_ASSET_EXTENSIONS = ('.png', '.bmp')
+
+# Expression names used by the rest of the robot mapped to asset names
+EXPRESSION_ALIASES = {
+    "neutral": "normal",
+    "happy": "hey",
+    "sad": "cry",
+    "surprised": "weird",
+    "closed": "sleep",
+}
+
 class DisplayController:
-    def __init__(self):
-        # Initialize I2C interface and OLED device
-        serial = i2c(port=1, address=0x3C)
-        self.device = sh1106(serial)  # or SSD1306 if your display is that
+    def __init__(self, max_cached_eyes=16, fps=20):
+        """
+        :param max_cached_eyes: maximum number of decoded eye images kept in memory
+        :param fps: compositor frame rate
+        """
+        # Initialize I2C interface and OLED device on the shared, arbitrated bus
+        self.bus_manager = get_bus_manager(1)
+        bus = self.bus_manager.client(PRIORITY_DISPLAY)
+        self.device = open_display(bus, DISPLAY_ADDR)  # luma sh1106, or the virtual panel in simulation
+        self.framebuffer = PageFramebuffer(self.device, batch=lambda: bus.batch(DISPLAY_ADDR))
         self.width = self.device.width
         self.height = self.device.height
         self.font = ImageFont.load_default()
         self.assets_path = os.path.join(os.path.dirname(__file__), '..', 'assets', 'eyes')
         self.current_image = None
-    
-    def init_display(self):
-        self.device.clear()
-        self.show_message("Robot Ready")
-    
+        self.current_expression = None
+
+        # Decoded eye images as (PIL image, page bytes) pairs (LRU ordered)
+        self.max_cached_eyes = max_cached_eyes
+        self._eye_cache = OrderedDict()
+        self._eye_files = self._index_eye_assets()
+        self._missing_eyes = set()
+
+        blank = Image.new('1', (self.width, self.height), "black")
+        self._blank_frame = (blank, np.zeros((self.framebuffer.pages, self.width), dtype=np.uint8))
+        self.compositor = DisplayCompositor(self._push_frame, self._blank_frame, fps=fps)
+
+    def init_display(self, message="Robot Ready"):
+        """
+        :param message: shown once the display is up (None to show nothing, e.g. while booting)
+        """
+        self.framebuffer.clear()
+        self.compositor.start()
+        if message:
+            self.show_message(message)
+        self.preload_eyes()
+
     def clear_display(self):
-        self.device.clear()
-    
-    def show_message(self, message, duration=2):
+        self.compositor.clear()
+        self.framebuffer.clear()
+        self.current_image = None
+        self.current_expression = None
+
+    def stop_display(self):
+        """Stop the compositor thread and blank the screen."""
+        self.compositor.stop()
+        self.clear_display()
+
+    def wait_idle(self, timeout=None):
+        """Block until queued messages and animations have finished."""
+        return self.compositor.wait_idle(timeout)
+
+    def set_fps(self, fps):
+        """Change the compositor frame rate while running."""
+        if fps:
+            self.compositor.fps = fps
+
+    def get_display_stats(self):
+        """Return framebuffer and compositor counters (frames pushed/skipped, bytes sent/saved)."""
+        stats = self.framebuffer.get_stats()
+        stats.update(('compositor_' + key, value) for key, value in self.compositor.get_stats().items())
+        return stats
+
+    def _push_frame(self, frame):
+        """
+        Called from the compositor thread with an (image, pages) frame.
+        Returns False (frame skipped) while sensor transactions are waiting for the bus.
+        """
+        if self.bus_manager.is_contended(PRIORITY_DISPLAY):
+            return False
+        img, pages = frame
+        with span('display.push'):
+            self.framebuffer.push(pages)
+        self.current_image = img
+
+    def _submit(self, command):
+        self.compositor.start()
+        self.compositor.submit(command)
+
+    def render_message(self, message):
+        """Render centered text into an (image, pages) frame."""
         img = Image.new('1', (self.width, self.height), "black")
         draw = ImageDraw.Draw(img)
         w, h = draw.textsize(message, font=self.font)
         draw.text(((self.width - w) // 2, (self.height - h) // 2), message, font=self.font, fill=255)
-        self.device.display(img)
-        time.sleep(duration)
-        self.clear_display()
-    
+        return (img, self.framebuffer.to_pages(img))
+
+    def show_message(self, message, duration=2, priority=PRIORITY_MESSAGE):
+        """
+        Show a text message for `duration` seconds, then return to the eyes.
+        Returns immediately; a higher priority command cuts the message short.
+        """
+        self._submit(StaticFrameCommand(self.render_message(message), duration, priority))
+
+    def show_status(self, message):
+        """
+        Keep a status line on screen until the next call replaces it (e.g. boot progress), instead of
+        queueing timed messages behind each other. Messages and animations still show on top of it.
+        :param message: text to show, or None to clear it
+        """
+        self.current_expression = None
+        self.compositor.start()
+        self.compositor.set_base(self.render_message(message) if message else None)
+
+    def _index_eye_assets(self):
+        """Map asset names (e.g. 'normal') to file paths, scanned once."""
+        files = {}
+        if not os.path.isdir(self.assets_path):
+            logger.warning("Eye asset directory not found: %s", self.assets_path)
+            return files
+        for filename in sorted(os.listdir(self.assets_path)):
+            name, ext = os.path.splitext(filename)
+            if ext.lower() not in EYE_ASSET_EXTENSIONS:
+                continue
+            if name.startswith(EYE_ASSET_PREFIX):
+                name = name[len(EYE_ASSET_PREFIX):]
+            files.setdefault(name, os.path.join(self.assets_path, filename))
+        return files
+
+    def _resolve_eye_name(self, expression):
+        if expression in self._eye_files:
+            return expression
+        return EXPRESSION_ALIASES.get(expression, expression)
+
+    def _load_eye_image(self, expression):
+        """
+        Return (image, pages) for an expression, decoding it on first use.
+        pages is the device-ready SH1106 page buffer for the image.
+        """
+        name = self._resolve_eye_name(expression)
+        entry = self._eye_cache.get(name)
+        if entry is not None:
+            self._eye_cache.move_to_end(name)
+            return entry
+        if name in self._missing_eyes:
+            return None
+
+        filepath = self._eye_files.get(name)
+        if filepath is None:
+            logger.warning("Eye image not found: %s", expression)
+            self._missing_eyes.add(name)
+            return None
+
+        try:
+            with Image.open(filepath) as src:
+                img = src.convert('L').resize((self.width, self.height)).convert('1')
+        except Exception as e:
+            logger.error("Failed to load eye image: %s", e)
+            self._missing_eyes.add(name)
+            return None
+
+        entry = (img, self.framebuffer.to_pages(img))
+        self._eye_cache[name] = entry
+        while len(self._eye_cache) > self.max_cached_eyes:
+            self._eye_cache.popitem(last=False)
+        return entry
+
+    def preload_eyes(self):
+        """Decode all eye assets up front so show_eyes() never touches the filesystem."""
+        for name in list(self._eye_files)[:self.max_cached_eyes]:
+            self._load_eye_image(name)
+        logger.info("Preloaded %d eye images", len(self._eye_cache))
+
     def show_eyes(self, expression="neutral"):
         """
         Display eye animation based on expression.
         Expressions: neutral, happy, sad, surprised, closed
+        (or any asset name in assets/eyes, e.g. "normal", "hey", "cry").
+        The expression stays on screen whenever no message or animation is active.
+        Repeating the expression already on screen sends nothing to the display.
         """
-        filename = f"{expression}.bmp"
-        filepath = os.path.join(self.assets_path, filename)
-        if not os.path.isfile(filepath):
-            print(f"[DisplayController] Eye image not found: {filepath}")
+        if expression == self.current_expression:
             return
-        
-        try:
-            img = Image.open(filepath).resize((self.width, self.height)).convert('1')
-            self.device.display(img)
-            self.current_image = img
-        except Exception as e:
-            print(f"[DisplayController] Failed to load eye image: {e}")
-    
+
+        entry = self._load_eye_image(expression)
+        if entry is None:
+            return
+        self.current_expression = expression
+        self.compositor.start()
+        self.compositor.set_base(entry)
+
+    def play_animation(self, keyframes, loop=False, priority=PRIORITY_ANIMATION):
+        """
+        Play a keyframe animation built from eye assets.
+        :param keyframes: list of (expression, duration_seconds)
+        :param loop: repeat until preempted or the display is cleared
+        """
+        frames = []
+        for expression, duration in keyframes:
+            entry = self._load_eye_image(expression)
+            if entry is not None:
+                frames.append((entry, duration))
+        if frames:
+            self._submit(AnimationCommand(frames, loop, priority))
+
     def blink_eyes(self, interval=0.3):
-        self.show_eyes("closed")
-        time.sleep(interval)
-        self.show_eyes("neutral")
+        """Close the eyes for `interval` seconds, then return to the current expression."""
+        self.play_animation([("closed", interval)])
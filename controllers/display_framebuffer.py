@@ -0,0 +1,127 @@
+"""
+display_framebuffer.py
+
+Page-level dirty-region framebuffer for the SH1106 OLED.
+Keeps the last frame sent to the panel and only transmits the column spans
+of each 8-row page that actually changed.
+"""
+
+import threading
+from contextlib import nullcontext
+import numpy as np
+
+# SH1106 addressing commands
+SET_PAGE_ADDRESS = 0xB0
+SET_LOW_COLUMN = 0x00
+SET_HIGH_COLUMN = 0x10
+SH1106_COLUMN_OFFSET = 2  # 128 px panels sit in the middle of the 132 column RAM
+
+# Bytes of addressing commands sent before every page segment
+SEGMENT_COMMAND_BYTES = 3
+
+class PageFramebuffer:
+    def __init__(self, device, column_offset=SH1106_COLUMN_OFFSET, merge_gap=SEGMENT_COMMAND_BYTES, batch=None):
+        """
+        :param device: luma sh1106 device (provides command(), data(), preprocess())
+        :param column_offset: first visible column in the controller RAM
+        :param merge_gap: unchanged columns between two dirty spans that are cheaper to
+                          resend than to pay for a new segment's addressing commands
+        :param batch: optional function returning a context manager that holds the bus
+                      while one segment (addressing commands + data) is written
+        """
+        self.device = device
+        self.width = device.width
+        self.height = device.height
+        self.pages = self.height // 8
+        self.column_offset = column_offset
+        self.merge_gap = merge_gap
+        self.batch = batch or nullcontext
+        self.lock = threading.Lock()
+        self._last = None  # (pages, width) uint8 array currently on the panel
+
+        # Statistics
+        self.frames_pushed = 0
+        self.frames_unchanged = 0
+        self.segments_sent = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+
+    @property
+    def full_frame_bytes(self):
+        return self.pages * (self.width + SEGMENT_COMMAND_BYTES)
+
+    def to_pages(self, image):
+        """
+        Convert a PIL '1' image of panel size into SH1106 page bytes.
+        :return: uint8 array of shape (pages, width), one byte = 8 vertical pixels (LSB on top)
+        """
+        image = self.device.preprocess(image)
+        bits = np.asarray(image, dtype=bool).reshape(self.pages, 8, self.width)
+        return np.packbits(bits, axis=1, bitorder='little').reshape(self.pages, self.width)
+
+    def _dirty_segments(self, old_row, new_row):
+        """Return (start, end) column spans (end exclusive) that differ between two pages."""
+        changed = np.flatnonzero(old_row != new_row)
+        if changed.size == 0:
+            return []
+        # Split where the gap between changed columns is worth a new segment
+        breaks = np.flatnonzero(np.diff(changed) > self.merge_gap + 1)
+        starts = np.concatenate(([changed[0]], changed[breaks + 1]))
+        ends = np.concatenate((changed[breaks], [changed[-1]])) + 1
+        return list(zip(starts.tolist(), ends.tolist()))
+
+    def _send_segment(self, page, start, data):
+        column = start + self.column_offset
+        with self.batch():
+            self.device.command(SET_PAGE_ADDRESS | page,
+                                SET_LOW_COLUMN | (column & 0x0F),
+                                SET_HIGH_COLUMN | (column >> 4))
+            self.device.data(data.tolist())
+        self.segments_sent += 1
+        return SEGMENT_COMMAND_BYTES + len(data)
+
+    def push(self, frame):
+        """
+        Send a frame to the panel, transmitting only the changed page segments.
+        :param frame: PIL '1' image or page array returned by to_pages()
+        :return: number of bytes written to the bus
+        """
+        pages = frame if isinstance(frame, np.ndarray) else self.to_pages(frame)
+        with self.lock:
+            sent = 0
+            if self._last is None:
+                for page in range(self.pages):
+                    sent += self._send_segment(page, 0, pages[page])
+            else:
+                for page in range(self.pages):
+                    for start, end in self._dirty_segments(self._last[page], pages[page]):
+                        sent += self._send_segment(page, start, pages[page, start:end])
+            self._last = pages.copy()
+
+            if sent:
+                self.frames_pushed += 1
+            else:
+                self.frames_unchanged += 1
+            self.bytes_sent += sent
+            self.bytes_saved += self.full_frame_bytes - sent
+            return sent
+
+    def clear(self):
+        """Blank the panel and remember that it is blank."""
+        with self.lock:
+            self.device.clear()
+            self._last = np.zeros((self.pages, self.width), dtype=np.uint8)
+
+    def invalidate(self):
+        """Forget the panel contents so the next push() resends the whole frame."""
+        with self.lock:
+            self._last = None
+
+    def get_stats(self):
+        return {
+            'frames_pushed': self.frames_pushed,
+            'frames_unchanged': self.frames_unchanged,
+            'segments_sent': self.segments_sent,
+            'bytes_sent': self.bytes_sent,
+            'bytes_saved': self.bytes_saved,
+        }
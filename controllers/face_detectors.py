@@ -0,0 +1,207 @@
+"""
+face_detectors.py
+
+Pluggable face detector backends used by CameraController.
+Every backend takes a grayscale image and returns a list of
+((x, y, w, h), confidence) in that image's pixel coordinates.
+"""
+
+import cv2
+import numpy as np
+
+class FaceDetector:
+    name = "base"
+
+    def detect(self, gray):
+        """Return [((x, y, w, h), confidence)] for a grayscale image."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class HaarFaceDetector(FaceDetector):
+    name = "haar"
+
+    def __init__(self, cascade_path=None, scale_factor=1.1, min_neighbors=5, min_size=50):
+        """
+        :param cascade_path: Haar cascade XML file (defaults to OpenCV's frontal face model)
+        :param min_size: smallest face in pixels of the image passed to detect()
+        """
+        if cascade_path is None:
+            cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise Exception(f"[HaarFaceDetector] Unable to load cascade: {cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, gray):
+        faces, _, weights = self.cascade.detectMultiScale3(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=(self.min_size, self.min_size), outputRejectLevels=True)
+        # Map the cascade's level weights onto 0..1
+        confidences = 1.0 / (1.0 + np.exp(-np.asarray(weights, dtype=float).ravel()))
+        return [(tuple(int(v) for v in box), float(confidence)) for box, confidence in zip(faces, confidences)]
+
+DETECTION_OUTPUTS = ('boxes', 'classes', 'scores', 'count')
+
+class TFLiteFaceDetector(FaceDetector):
+    """
+    SSD-style TFLite face detector whose graph ends in TFLite_Detection_PostProcess
+    (outputs: boxes, classes, scores, count). Float, uint8 and int8 models are supported.
+    """
+    name = "tflite"
+
+    def __init__(self, model_path, num_threads=2, score_threshold=0.5, output_order=None):
+        """
+        :param model_path: .tflite model file
+        :param num_threads: interpreter worker threads
+        :param score_threshold: drop detections below this score
+        :param output_order: names from DETECTION_OUTPUTS in the order of the model's output details,
+                             for models the automatic mapping gets wrong (None: identify by shape)
+        """
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite.python.interpreter import Interpreter
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.score_threshold = score_threshold
+
+        details = self.interpreter.get_input_details()[0]
+        self.input_index = details['index']
+        _, self.input_height, self.input_width, self.input_channels = details['shape']
+        self.input_float = details['dtype'] == np.float32
+        # Quantized models get pixels through a lookup table built from the input's quantization
+        self._input_table = None if self.input_float else self._quantization_table(details)
+
+        # Preallocated buffers: resize target, channel expansion and the input tensor itself
+        self._resized = np.empty((self.input_height, self.input_width), dtype=np.uint8)
+        self._color = np.empty((self.input_height, self.input_width, 3), dtype=np.uint8)
+        self.input_tensor = np.zeros(details['shape'], dtype=details['dtype'])
+
+        outputs = self.interpreter.get_output_details()
+        if output_order is not None:
+            if sorted(output_order) != sorted(DETECTION_OUTPUTS):
+                raise ValueError(f"output_order must name each of {DETECTION_OUTPUTS} once")
+            self.outputs = {name: d for name, d in zip(output_order, outputs)}
+            self._scores_known = True
+        else:
+            self.outputs = self._map_outputs(outputs)
+            self._scores_known = False
+
+    @staticmethod
+    def _quantization_table(details):
+        """Input value for each pixel level 0..255 of a uint8 or int8 input tensor."""
+        info = np.iinfo(details['dtype'])
+        scale, zero_point = details.get('quantization', (0.0, 0))
+        pixels = np.arange(256, dtype=np.float64)
+        if scale:
+            # Quantize the -1..1 value a float model gets (see _fill_input)
+            values = np.round((pixels / 127.5 - 1.0) / scale) + zero_point
+        else:
+            values = pixels + (info.min if info.min < 0 else 0)
+        return np.clip(values, info.min, info.max).astype(details['dtype'])
+
+    @staticmethod
+    def _map_outputs(outputs):
+        """
+        Identify the post-processing outputs by shape: boxes are [1, N, 4] and count has one element.
+        Output names differ between exporters (TF2 models use StatefulPartitionedCall:N, in an order
+        unrelated to the outputs), so they only break the tie between the two [1, N] outputs, and
+        detect() corrects that guess from the values if needed.
+        """
+        if len(outputs) < 4:
+            raise ValueError(f"Expected boxes, classes, scores and count outputs, got {len(outputs)}")
+        mapped = {}
+        pairs = []
+        for d in outputs:
+            shape = tuple(d['shape'])
+            if len(shape) == 3 and shape[-1] == 4 and 'boxes' not in mapped:
+                mapped['boxes'] = d
+            elif int(np.prod(shape)) == 1 and 'count' not in mapped:
+                mapped['count'] = d
+            else:
+                pairs.append(d)
+        if 'boxes' not in mapped or 'count' not in mapped or len(pairs) < 2:
+            raise ValueError("Unrecognized detection outputs: " +
+                             ", ".join(f"{d['name']} {tuple(d['shape'])}" for d in outputs))
+        pairs = pairs[:2]
+        named = [d for d in pairs if 'score' in d['name'].lower()]
+        # TFLite_Detection_PostProcess lists classes before scores
+        scores = named[0] if named else pairs[1]
+        mapped['scores'] = scores
+        mapped['classes'] = pairs[0] if scores is pairs[1] else pairs[1]
+        return mapped
+
+    def _output(self, name):
+        """Output tensor as floats, dequantized if the model quantizes it."""
+        details = self.outputs[name]
+        value = self.interpreter.get_tensor(details['index'])[0]
+        scale, zero_point = details.get('quantization', (0.0, 0))
+        if scale and details['dtype'] != np.float32:
+            return (value.astype(np.float32) - zero_point) * scale
+        return value
+
+    def _check_scores(self, classes, scores, count):
+        """
+        Swap the classes and scores mapping when the values show the guess was wrong: scores are
+        fractions, class IDs are whole numbers. Settled at the first frame that tells them apart.
+        """
+        classes, scores = classes[:count], scores[:count]
+        scores_whole = bool(np.all(scores == np.round(scores)))
+        classes_whole = bool(np.all(classes == np.round(classes)))
+        if scores_whole == classes_whole:
+            return False
+        self._scores_known = True
+        if scores_whole:
+            self.outputs['classes'], self.outputs['scores'] = self.outputs['scores'], self.outputs['classes']
+            return True
+        return False
+
+    def _fill_input(self, gray):
+        cv2.resize(gray, (self.input_width, self.input_height), dst=self._resized, interpolation=cv2.INTER_AREA)
+        if self.input_channels == 3:
+            cv2.cvtColor(self._resized, cv2.COLOR_GRAY2RGB, dst=self._color)
+            source = self._color
+        else:
+            source = self._resized[..., np.newaxis]
+        if self.input_float:
+            # Scale to -1..1 in place
+            np.subtract(source, 127.5, out=self.input_tensor[0], casting='unsafe')
+            self.input_tensor[0] /= 127.5
+        else:
+            np.take(self._input_table, source, out=self.input_tensor[0])
+
+    def detect(self, gray):
+        height, width = gray.shape[:2]
+        self._fill_input(gray)
+        self.interpreter.set_tensor(self.input_index, self.input_tensor)
+        self.interpreter.invoke()
+
+        boxes = self._output('boxes')
+        scores = self._output('scores')
+        count = int(self._output('count').ravel()[0])
+        if not self._scores_known and count and self._check_scores(self._output('classes'), scores, count):
+            scores = self._output('scores')
+
+        faces = []
+        for (ymin, xmin, ymax, xmax), score in zip(boxes[:count], scores[:count]):
+            if score < self.score_threshold:
+                continue
+            x0, y0 = int(max(0.0, xmin) * width), int(max(0.0, ymin) * height)
+            x1, y1 = int(min(1.0, xmax) * width), int(min(1.0, ymax) * height)
+            faces.append(((x0, y0, x1 - x0, y1 - y0), float(score)))
+        return faces
+
+def create_detector(backend="haar", **kwargs):
+    """
+    Build a detector by name.
+    :param backend: "haar" or "tflite"
+    :param kwargs: passed to the backend constructor (e.g. model_path for tflite)
+    """
+    backends = {HaarFaceDetector.name: HaarFaceDetector, TFLiteFaceDetector.name: TFLiteFaceDetector}
+    if backend not in backends:
+        raise ValueError(f"Unknown face detector backend: {backend}")
+    return backends[backend](**kwargs)
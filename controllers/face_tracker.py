@@ -0,0 +1,176 @@
+"""
+face_tracker.py
+
+Detect-then-track face pipeline.
+Runs the (expensive) face detector on a downscaled frame every few frames and
+follows known faces in between with template matching restricted to a small
+region of interest around their last position. An optional motion gate skips
+detection on static scenes.
+"""
+
+import cv2
+import numpy as np
+import itertools
+from collections import namedtuple
+
+# box is (x, y, w, h) in full-resolution pixel coordinates
+FaceTrack = namedtuple('FaceTrack', ['track_id', 'box', 'confidence'])
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+class FacePipeline:
+    def __init__(self, detect, detect_interval=5, detect_scale=0.5, search_margin=0.5,
+                 min_track_score=0.6, match_iou=0.3, gate=None, search_interval=None):
+        """
+        :param detect: function(gray_image) -> list of ((x, y, w, h), confidence), called on the downscaled image
+        :param detect_interval: run full detection every N frames while faces are being tracked
+        :param search_interval: run full detection every N frames while nobody is tracked
+                                (None: same as detect_interval)
+        :param detect_scale: downscale factor applied before full detection
+        :param search_margin: ROI around the last box, as a fraction of the box size on each side
+        :param min_track_score: minimum normalized template match score to keep a track
+        :param match_iou: minimum overlap to carry a track ID over to a new detection
+        :param gate: optional MotionGate deciding whether (and where) a due detection runs
+        """
+        self.detect = detect
+        self.detect_interval = detect_interval
+        self.detect_scale = detect_scale
+        self.search_margin = search_margin
+        self.min_track_score = min_track_score
+        self.match_iou = match_iou
+        self.gate = gate
+        self.search_interval = search_interval
+
+        self.tracks = []      # list of FaceTrack
+        self._templates = {}  # track_id -> grayscale patch captured at detection time
+        self._ids = itertools.count(1)
+        self._frames_since_detection = 0
+        self._detection_due = True  # detect on the next frame: at start and right after losing a face
+        self._small = None
+
+        # Statistics
+        self.detections = 0
+        self.tracked_frames = 0
+        self.gated_frames = 0
+        self.idle_frames = 0
+
+    def reset(self):
+        self.tracks = []
+        self._templates.clear()
+        self._frames_since_detection = 0
+        self._detection_due = True
+
+    def process(self, gray):
+        """
+        Update tracks with a new grayscale frame.
+        :return: list of FaceTrack
+        """
+        if self.tracks:
+            interval = self.detect_interval
+        else:
+            interval = self.search_interval or self.detect_interval
+        if self._detection_due or self._frames_since_detection >= interval:
+            run, region = (True, None) if self.gate is None else self.gate.check(gray)
+            if run:
+                # A region search would lose tracks outside it, so search everywhere while tracking
+                self._run_detection(gray, None if self.tracks else region)
+            elif self.tracks:
+                self._run_tracking(gray)
+            else:
+                # Static scene and nobody in view; the detection stays due until something moves
+                self.gated_frames += 1
+        elif self.tracks:
+            self._run_tracking(gray)
+        else:
+            # Nobody in view and no detection due: nothing to do on this frame
+            self.idle_frames += 1
+            self._frames_since_detection += 1
+        return self.tracks
+
+    def _downscale(self, gray):
+        height, width = gray.shape[:2]
+        size = (max(1, int(width * self.detect_scale)), max(1, int(height * self.detect_scale)))
+        if self._small is None or self._small.shape[::-1] != size:
+            self._small = np.empty(size[::-1], dtype=np.uint8)
+        cv2.resize(gray, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        return self._small
+
+    def _run_detection(self, gray, region=None):
+        """Run the detector on the whole frame, or only on `region` (x, y, w, h) if given."""
+        self.detections += 1
+        self._frames_since_detection = 0
+        self._detection_due = False
+        ox, oy = 0, 0
+        if region is not None:
+            ox, oy, rw, rh = region
+            source = gray[oy:oy + rh, ox:ox + rw]
+            small = source if self.detect_scale == 1.0 else cv2.resize(
+                source, None, fx=self.detect_scale, fy=self.detect_scale, interpolation=cv2.INTER_AREA)
+        else:
+            small = self._downscale(gray) if self.detect_scale != 1.0 else gray
+        scale = 1.0 / self.detect_scale
+
+        tracks = []
+        templates = {}
+        for (x, y, w, h), confidence in self.detect(small):
+            box = (ox + int(x * scale), oy + int(y * scale), int(w * scale), int(h * scale))
+            track_id = self._match_track(box, tracks)
+            tracks.append(FaceTrack(track_id, box, float(confidence)))
+            bx, by, bw, bh = box
+            templates[track_id] = np.array(gray[by:by + bh, bx:bx + bw])
+        self.tracks = tracks
+        self._templates = templates
+
+    def _match_track(self, box, taken):
+        """Reuse the ID of the best overlapping previous track, or allocate a new one."""
+        used = {track.track_id for track in taken}
+        best_id, best_iou = None, self.match_iou
+        for track in self.tracks:
+            if track.track_id in used:
+                continue
+            iou = box_iou(box, track.box)
+            if iou >= best_iou:
+                best_id, best_iou = track.track_id, iou
+        return best_id if best_id is not None else next(self._ids)
+
+    def _run_tracking(self, gray):
+        self.tracked_frames += 1
+        self._frames_since_detection += 1
+        height, width = gray.shape[:2]
+        tracks = []
+        for track in self.tracks:
+            template = self._templates.get(track.track_id)
+            if template is None or template.size == 0:
+                continue
+            x, y, w, h = track.box
+            mx, my = int(w * self.search_margin), int(h * self.search_margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(width, x + w + mx), min(height, y + h + my)
+            roi = gray[y0:y1, x0:x1]
+            if roi.shape[0] < template.shape[0] or roi.shape[1] < template.shape[1]:
+                continue
+            scores = cv2.matchTemplate(roi, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if score >= self.min_track_score:
+                tracks.append(FaceTrack(track.track_id, (x0 + dx, y0 + dy, w, h), float(score)))
+        if len(tracks) < len(self.tracks):
+            # Lost a face, look again on the next frame
+            self._detection_due = True
+        self.tracks = tracks
+
+    def get_stats(self):
+        return {
+            'detections': self.detections,
+            'tracked_frames': self.tracked_frames,
+            'gated_frames': self.gated_frames,
+            'idle_frames': self.idle_frames,
+            'tracks': len(self.tracks),
+        }
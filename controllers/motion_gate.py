@@ -0,0 +1,106 @@
+"""
+motion_gate.py
+
+Cheap motion gate for the face pipeline.
+Keeps a running-average background of a heavily downsampled frame and only
+lets the expensive detector run when enough of the scene changed (or when a
+periodic refresh is due).
+"""
+
+import time
+import cv2
+import numpy as np
+
+class MotionGate:
+    def __init__(self, width=80, pixel_threshold=18, min_changed_fraction=0.005,
+                 alpha=0.05, refresh_seconds=2.0, region_margin=0.5):
+        """
+        :param width: width of the downsampled comparison image (height keeps the aspect ratio)
+        :param pixel_threshold: gray level difference that counts a pixel as changed
+        :param min_changed_fraction: fraction of changed pixels needed to run the detector
+        :param alpha: background learning rate for the running average
+        :param refresh_seconds: force a full detection at least this often
+        :param region_margin: grow the changed region by this fraction of its size on each side
+        """
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.alpha = alpha
+        self.refresh_seconds = refresh_seconds
+        self.region_margin = region_margin
+
+        self._source_shape = None
+        self._small = None
+        self._small_f = None
+        self._diff = None
+        self._mask = None
+        self.background = None
+        self._last_run = 0.0
+
+        # Statistics
+        self.frames = 0
+        self.skipped = 0
+        self.forced = 0
+        self.last_changed_fraction = 0.0
+
+    def _allocate(self, shape):
+        self._source_shape = shape
+        height, width = shape
+        size = (self.width, max(1, int(height * self.width / width)))
+        self._small = np.empty(size[::-1], dtype=np.uint8)
+        self._small_f = np.empty(size[::-1], dtype=np.float32)
+        self._diff = np.empty(size[::-1], dtype=np.float32)
+        self._mask = np.empty(size[::-1], dtype=np.uint8)
+        self.background = None
+
+    def check(self, gray):
+        """
+        Decide whether the detector should run on this frame.
+        :return: (run, region) where region is (x, y, w, h) in full-resolution pixels
+                 covering the change, or None to search the whole frame
+        """
+        self.frames += 1
+        if gray.shape[:2] != self._source_shape:
+            self._allocate(gray.shape[:2])
+        cv2.resize(gray, self._small.shape[::-1], dst=self._small, interpolation=cv2.INTER_AREA)
+        np.copyto(self._small_f, self._small, casting='unsafe')
+
+        now = time.monotonic()
+        if self.background is None:
+            self.background = self._small_f.copy()
+            self._last_run = now
+            return True, None
+
+        cv2.absdiff(self._small_f, self.background, dst=self._diff)
+        cv2.accumulateWeighted(self._small_f, self.background, self.alpha)
+        np.greater(self._diff, self.pixel_threshold, out=self._mask, casting='unsafe')
+        self.last_changed_fraction = float(np.count_nonzero(self._mask)) / self._mask.size
+
+        if now - self._last_run >= self.refresh_seconds:
+            self.forced += 1
+            self._last_run = now
+            return True, None
+        if self.last_changed_fraction < self.min_changed_fraction:
+            self.skipped += 1
+            return False, None
+
+        self._last_run = now
+        return True, self._changed_region(gray.shape[:2])
+
+    def _changed_region(self, shape):
+        height, width = shape
+        x, y, w, h = cv2.boundingRect(self._mask)
+        scale = width / self._mask.shape[1]
+        mx, my = w * self.region_margin, h * self.region_margin
+        x0, y0 = max(0, int((x - mx) * scale)), max(0, int((y - my) * scale))
+        x1, y1 = min(width, int((x + w + mx) * scale)), min(height, int((y + h + my) * scale))
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def get_stats(self):
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'forced': self.forced,
+            'skip_rate': self.skipped / self.frames if self.frames else 0.0,
+            'changed_fraction': self.last_changed_fraction,
+        }
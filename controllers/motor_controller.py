@@ -3,17 +3,38 @@ motor_controller.py
 
 Controls two DC motors via MX1508 motor driver.
 Provides simple forward, backward, left, right and stop functions.
+With the control loop running, move() only sets target speeds; a fixed-rate
+thread ramps towards them with acceleration/jerk limits and only touches
+GPIO when a duty cycle actually changes.
 """
 
-import RPi.GPIO as GPIO
+import logging
+import math
+import threading
 import time
+from contextlib import contextmanager
+
+from utils.hardware import GPIO
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
 
 class MotorController:
-    def __init__(self, motor1_pins=(17, 18), motor2_pins=(22, 23), pwm_freq=1000):
+    def __init__(self, motor1_pins=(17, 18), motor2_pins=(22, 23), pwm_freq=1000,
+                 control_rate=50, max_accel=200.0, max_jerk=2000.0, imu=None, heading_gain=0.5,
+                 heading_integral_gain=0.2, heading_integral_limit=20.0):
         """
         :param motor1_pins: tuple(GPIO_pin_forward, GPIO_pin_backward) for motor 1
         :param motor2_pins: tuple(GPIO_pin_forward, GPIO_pin_backward) for motor 2
         :param pwm_freq: PWM frequency in Hz
+        :param control_rate: control loop rate in Hz
+        :param max_accel: speed change limit in %/s
+        :param max_jerk: acceleration change limit in %/s^2
+        :param imu: optional SensorController or MPU6050; its gyro Z rate is used to hold
+                    heading while driving straight
+        :param heading_gain: speed correction (%) per deg/s of yaw rate
+        :param heading_integral_gain: speed correction (%) per degree of accumulated heading drift
+        :param heading_integral_limit: largest correction (%) the accumulated drift may contribute (anti-windup)
         """
         self.motor1_forward_pin, self.motor1_backward_pin = motor1_pins
         self.motor2_forward_pin, self.motor2_backward_pin = motor2_pins
@@ -34,6 +55,46 @@ class MotorController:
         self.motor1_backward_pwm.start(0)
         self.motor2_forward_pwm.start(0)
         self.motor2_backward_pwm.start(0)
+        self._duty = {pwm: 0 for pwm in (self.motor1_forward_pwm, self.motor1_backward_pwm,
+                                         self.motor2_forward_pwm, self.motor2_backward_pwm)}
+
+        self.pwm_freq = pwm_freq
+
+        # Control loop state
+        self.control_rate = control_rate
+        self.max_accel = max_accel
+        self.max_jerk = max_jerk
+        self.imu = imu
+        self.heading_gain = heading_gain
+        self.heading_integral_gain = heading_integral_gain
+        self.heading_integral_limit = heading_integral_limit
+        # Guards target, speed, accel and the duty cache: a control tick and stop_all never interleave
+        self._lock = threading.Lock()
+        self.target = (0.0, 0.0)   # latest commanded speeds; replaced as a whole, so bursts coalesce
+        self.speed = [0.0, 0.0]    # current ramped speeds
+        self.accel = [0.0, 0.0]
+        self._heading_drift = 0.0
+        self._owner = None         # thread holding exclusive(); move() from any other thread is ignored
+        self._preemptions = 0      # exclusive() blocks entered so far
+        self._preemptible = {}     # thread -> _preemptions when its preemptible() block began
+        self.running = False
+        self.thread = None
+
+        # Statistics
+        self.commands = 0
+        self.gpio_writes = 0
+        self.gpio_writes_skipped = 0
+        self.commands_preempted = 0
+
+    def _write_duty(self, pwm, duty):
+        """ChangeDutyCycle only when the value differs from what the channel already has."""
+        duty = round(duty, 1)
+        if self._duty[pwm] == duty:
+            self.gpio_writes_skipped += 1
+            return
+        pwm.ChangeDutyCycle(duty)
+        self._duty[pwm] = duty
+        self.gpio_writes += 1
     
     def _set_motor(self, forward_pwm, backward_pwm, speed):
         """
@@ -42,20 +103,171 @@ class MotorController:
         """
         speed = max(min(speed, 100), -100)  # Clamp speed
         if speed > 0:
-            forward_pwm.ChangeDutyCycle(speed)
-            backward_pwm.ChangeDutyCycle(0)
+            self._write_duty(forward_pwm, speed)
+            self._write_duty(backward_pwm, 0)
         elif speed < 0:
-            forward_pwm.ChangeDutyCycle(0)
-            backward_pwm.ChangeDutyCycle(-speed)
+            self._write_duty(forward_pwm, 0)
+            self._write_duty(backward_pwm, -speed)
         else:
-            forward_pwm.ChangeDutyCycle(0)
-            backward_pwm.ChangeDutyCycle(0)
-    
-    def move(self, motor1_speed=0, motor2_speed=0):
-        """Set speed for each motor"""
+            self._write_duty(forward_pwm, 0)
+            self._write_duty(backward_pwm, 0)
+
+    def _apply(self, motor1_speed, motor2_speed):
         self._set_motor(self.motor1_forward_pwm, self.motor1_backward_pwm, motor1_speed)
         self._set_motor(self.motor2_forward_pwm, self.motor2_backward_pwm, motor2_speed)
     
+    @timed('motor.move')
+    def move(self, motor1_speed=0, motor2_speed=0):
+        """
+        Set speed for each motor.
+        Returns immediately while the control loop runs (the loop ramps to the new target);
+        otherwise the duty cycles are applied directly.
+        """
+        self.commands += 1
+        with self._lock:
+            if not self._may_move(threading.get_ident()):
+                self.commands_preempted += 1
+                return
+            self.target = (max(min(motor1_speed, 100), -100), max(min(motor2_speed, 100), -100))
+            if not self.running:
+                self.speed = list(self.target)
+                self._apply(*self.target)
+
+    def _may_move(self, thread):
+        """False while another thread holds exclusive() or once this thread's preemptible() block was preempted."""
+        if self._owner is not None and self._owner != thread:
+            return False
+        return self._preemptible.get(thread, self._preemptions) == self._preemptions
+
+    def _hold(self, seconds):
+        """
+        Keep the current command for `seconds`; returns False early if the calling thread lost
+        the motors to a safety manoeuvre meanwhile, so the rest of the manoeuvre is skipped.
+        """
+        end = time.monotonic() + seconds
+        thread = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._may_move(thread):
+                    return False
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return True
+            time.sleep(min(remaining, 0.05))
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Give the calling thread sole control of the motors for the block (safety manoeuvres):
+        move() calls from other threads, e.g. a still-running face reaction, are ignored meanwhile.
+        """
+        with self._lock:
+            self._owner = threading.get_ident()
+            self._preemptions += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._owner = None
+
+    @contextmanager
+    def preemptible(self):
+        """
+        Run a normal manoeuvre that an exclusive() block cancels: once a safety manoeuvre has started,
+        move() calls from this block are ignored until it ends, even after the safety manoeuvre is over.
+        """
+        thread = threading.get_ident()
+        with self._lock:
+            self._preemptible[thread] = self._preemptions
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._preemptible.pop(thread, None)
+
+    def initialize_motors(self):
+        """Start the fixed-rate control loop."""
+        self.start_control_loop()
+        logger.info("Motors initialized.")
+
+    def start_control_loop(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._control_loop, daemon=True)
+        self.thread.start()
+
+    def stop_control_loop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _ramp(self, index, target, dt):
+        """Move one motor's speed towards target under acceleration and jerk limits."""
+        error = target - self.speed[index]
+        if error == 0 and self.accel[index] == 0:
+            return
+        # Largest acceleration that can still be jerked back to zero before reaching the target
+        desired = math.copysign(min(self.max_accel, math.sqrt(2 * self.max_jerk * abs(error))), error)
+        step = self.max_jerk * dt
+        self.accel[index] += max(-step, min(step, desired - self.accel[index]))
+        new_speed = self.speed[index] + self.accel[index] * dt
+        if (new_speed - target) * error >= 0:
+            # Reached (or would pass) the target
+            new_speed = target
+            self.accel[index] = 0.0
+        self.speed[index] = new_speed
+
+    def _yaw_rate(self):
+        if hasattr(self.imu, 'get_orientation'):
+            orientation = self.imu.get_orientation()
+            return orientation['gyro'][2] if orientation else None
+        return self.imu.get_gyro()[2]
+
+    def _read_yaw_rate(self):
+        """Yaw rate for heading hold, or None; read outside the lock so a slow IMU never delays stop_all."""
+        if self.imu is None:
+            return None
+        try:
+            return self._yaw_rate()
+        except Exception as e:
+            logger.warning("Heading hold disabled: %s", e)
+            self.imu = None
+            return None
+
+    def _heading_correction(self, target, yaw_rate, dt):
+        """Differential speed correction that cancels yaw while both motors are commanded equally."""
+        if self.imu is None or target[0] != target[1] or target[0] == 0:
+            self._heading_drift = 0.0
+            return 0.0
+        if yaw_rate is None:
+            return 0.0
+        self._heading_drift += yaw_rate * dt
+        if self.heading_integral_gain:
+            # Anti-windup: the drift term never asks for more than heading_integral_limit
+            limit = self.heading_integral_limit / self.heading_integral_gain
+            self._heading_drift = max(-limit, min(limit, self._heading_drift))
+        return self.heading_gain * yaw_rate + self.heading_integral_gain * self._heading_drift
+
+    def _control_loop(self):
+        period = 1.0 / self.control_rate
+        next_tick = time.monotonic()
+        while self.running:
+            yaw_rate = self._read_yaw_rate()
+            with self._lock:
+                target = self.target
+                self._ramp(0, target[0], period)
+                self._ramp(1, target[1], period)
+                correction = self._heading_correction(target, yaw_rate, period)
+                self._apply(self.speed[0] + correction, self.speed[1] - correction)
+
+            next_tick += period
+            now = time.monotonic()
+            if next_tick < now:
+                next_tick = now
+            time.sleep(next_tick - now)
+    
     def forward(self, speed=50):
         self.move(speed, speed)
     
@@ -70,12 +282,64 @@ class MotorController:
     
     def stop(self):
         self.move(0, 0)
+
+    def avoid_obstacle(self, speed=50, reverse_time=0.5, turn_time=0.4):
+        """
+        Back away from an obstacle in front and turn right; blocks for about reverse_time + turn_time.
+        Run it inside exclusive() so no other manoeuvre writes to the motors meanwhile.
+        """
+        self.stop_all()
+        self.backward(speed)
+        if self._hold(reverse_time):
+            self.turn_right(speed)
+            self._hold(turn_time)
+        self.stop()
+
+    def react_to_face(self, speed=40, wiggle_time=0.15):
+        """
+        Short left-right wiggle towards a detected face.
+        Inside preemptible() it gives up as soon as a safety manoeuvre takes the motors.
+        """
+        for move in (self.turn_left, self.turn_right, self.turn_left, self.turn_right):
+            move(speed)
+            if not self._hold(wiggle_time):
+                return
+        self.stop()
+
+    def stop_all(self):
+        """Stop immediately, bypassing the ramp limits (emergency stop)."""
+        with self._lock:
+            self.target = (0.0, 0.0)
+            self.speed = [0.0, 0.0]
+            self.accel = [0.0, 0.0]
+            self._heading_drift = 0.0
+            self._apply(0, 0)
+
+    def set_pwm_frequency(self, frequency):
+        """Change the PWM frequency of all motor pins (software PWM costs CPU per cycle)."""
+        if not frequency or frequency == self.pwm_freq:
+            return
+        with self._lock:
+            for pwm in self._duty:
+                pwm.ChangeFrequency(frequency)
+            self.pwm_freq = frequency
+
+    def get_motor_stats(self):
+        return {
+            'commands': self.commands,
+            'gpio_writes': self.gpio_writes,
+            'gpio_writes_skipped': self.gpio_writes_skipped,
+            'commands_preempted': self.commands_preempted,
+            'speed': tuple(self.speed),
+            'target': self.target,
+        }
     
     def cleanup(self):
-        self.stop()
+        self.stop_control_loop()
+        self.stop_all()
         self.motor1_forward_pwm.stop()
         self.motor1_backward_pwm.stop()
         self.motor2_forward_pwm.stop()
         self.motor2_backward_pwm.stop()
         GPIO.cleanup()
-        print("[MotorController] Motors stopped and GPIO cleaned up.")
+        logger.info("Motors stopped and GPIO cleaned up.")
@@ -3,93 +3,430 @@ sensor_controller.py
 
 Handles MPU6050 (gyroscope + accelerometer) and GY-530 (VL53L0X ToF distance) sensors.
 Provides functions for orientation, tilt detection, and obstacle detection.
+Once acquisition is started, readings come from background snapshots instead of the bus.
 """
 
-import smbus2
+from utils.hardware import smbus2
+import logging
+import threading
 import time
+import numpy as np
+from collections import namedtuple
+
+from controllers.sensor_service import SensorService
+from utils.i2c_bus import get_bus_manager, PRIORITY_IMU, PRIORITY_RANGING
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
 
 # MPU6050 registers and constants
 MPU6050_ADDR = 0x68
 PWR_MGMT_1 = 0x6B
+SMPLRT_DIV = 0x19
+CONFIG = 0x1A
+FIFO_EN = 0x23
+INT_STATUS = 0x3A
 ACCEL_XOUT_H = 0x3B
 GYRO_XOUT_H = 0x43
+USER_CTRL = 0x6A
+FIFO_COUNTH = 0x72
+FIFO_R_W = 0x74
+
+ACCEL_SCALE = 16384.0  # LSB/g at +-2g
+GYRO_SCALE = 131.0     # LSB/(deg/s) at +-250 deg/s
+TEMP_SCALE = 340.0
+TEMP_OFFSET = 36.53
+
+# Burst layout: accel xyz, temp, gyro xyz as big-endian int16
+BURST_LENGTH = 14
+BURST_SCALE = np.array([1 / ACCEL_SCALE] * 3 + [1 / TEMP_SCALE] + [1 / GYRO_SCALE] * 3)
+BURST_OFFSET = np.array([0.0] * 3 + [TEMP_OFFSET] + [0.0] * 3)
+
+# FIFO configuration
+DLPF_188HZ = 0x01          # gyro output rate 1 kHz with the DLPF enabled
+GYRO_OUTPUT_RATE = 1000
+FIFO_EN_ACCEL_GYRO = 0x78  # XG, YG, ZG and ACCEL into the FIFO
+USER_CTRL_FIFO_EN = 0x40
+USER_CTRL_FIFO_RESET = 0x04
+INT_FIFO_OFLOW = 0x10
+FIFO_SAMPLE_BYTES = 12     # accel xyz + gyro xyz
+FIFO_SIZE = 1024
+FIFO_SCALE = np.array([1 / ACCEL_SCALE] * 3 + [1 / GYRO_SCALE] * 3)
 
 # VL53L0X I2C address (GY-530 default)
 VL53L0X_ADDR = 0x29
+VL53L0X_OUT_OF_RANGE = 8190  # reported when nothing is within range
+OBSTACLE_MM = 200            # default obstacle_detected() threshold
+TOF_POLL_FACTOR = 2          # data-ready polls per measurement, so polling does not alias with ranging
+
+DistanceReading = namedtuple('DistanceReading', ['filtered', 'raw', 'timestamp'])
 
 # For VL53L0X, we'll use the adafruit_vl53l0x library for simplicity
 try:
-    import board
-    import busio
     import adafruit_vl53l0x
 except ImportError:
-    print("[SensorController] adafruit_vl53l0x library not found. Distance sensor disabled.")
+    logger.warning("adafruit_vl53l0x library not found. Distance sensor disabled.")
+
+class ImuRingBuffer:
+    """
+    Fixed-size ring of timestamped IMU samples.
+    Each row is (timestamp, ax, ay, az, gx, gy, gz); accel in g, gyro in deg/s.
+    """
+
+    def __init__(self, capacity=2048):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, 7))
+        self.count = 0  # total samples ever written
+        self.lock = threading.Lock()
+
+    def extend(self, samples):
+        """Append an (n, 7) array of samples, overwriting the oldest ones."""
+        n = len(samples)
+        if n == 0:
+            return
+        with self.lock:
+            if n > self.capacity:
+                samples = samples[-self.capacity:]
+                self.count += n - self.capacity
+                n = self.capacity
+            start = self.count % self.capacity
+            first = min(n, self.capacity - start)
+            self.data[start:start + first] = samples[:first]
+            self.data[:n - first] = samples[first:]
+            self.count += n
+
+    def latest(self, n=None):
+        """Return a copy of the newest `n` samples (all stored samples if None), oldest first."""
+        with self.lock:
+            available = min(self.count, self.capacity)
+            n = available if n is None else min(n, available)
+            end = self.count % self.capacity
+            idx = np.arange(end - n, end) % self.capacity
+            return self.data[idx]
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+class RangeFilter:
+    """
+    Median filter with outlier rejection for VL53L0X readings.
+    A reading far from the current median (more than `outlier_mm` plus a multiple of the
+    median absolute deviation) is rejected, unless enough consecutive readings agree that
+    the distance really changed. A sudden obstacle closer than `near_mm` only needs one
+    confirming reading, so it is reported one measurement later instead of several.
+    """
+
+    def __init__(self, window=5, outlier_mm=100, mad_factor=3.0, near_mm=OBSTACLE_MM):
+        self.window = np.zeros(window)
+        self.size = window
+        self.count = 0
+        self.outlier_mm = outlier_mm
+        self.mad_factor = mad_factor
+        self.near_mm = near_mm
+        self.rejected = 0
+        self._consecutive_rejects = 0
+        self._last_rejected = None
+
+    def _values(self):
+        return self.window[:min(self.count, self.size)]
+
+    def update(self, raw, timestamp):
+        """
+        Add a raw reading (mm) and return a DistanceReading.
+        Out-of-range readings are passed through unfiltered as None.
+        """
+        if raw is None or raw >= VL53L0X_OUT_OF_RANGE:
+            return DistanceReading(None, raw, timestamp)
+
+        values = self._values()
+        if len(values) >= 3:
+            median = np.median(values)
+            mad = np.median(np.abs(values - median))
+            if abs(raw - median) > self.outlier_mm + self.mad_factor * mad:
+                self._consecutive_rejects += 1
+                # A step to within obstacle range is confirmed by a single further reading
+                confirmations = 1 if raw < min(median, self.near_mm) else self.size // 2
+                if self._consecutive_rejects <= confirmations:
+                    self.rejected += 1
+                    self._last_rejected = raw
+                    return DistanceReading(int(median), raw, timestamp)
+                # Several readings in a row agree: the scene changed, start over from them
+                self.window[0] = self._last_rejected
+                self.count = 1
+        self._consecutive_rejects = 0
+
+        self.window[self.count % self.size] = raw
+        self.count += 1
+        return DistanceReading(int(np.median(self._values())), raw, timestamp)
 
 class MPU6050:
     def __init__(self, bus=1):
-        self.bus = smbus2.SMBus(bus)
+        """
+        :param bus: I2C bus number; transactions go through the shared bus manager
+        """
+        self.bus = get_bus_manager(bus).client(PRIORITY_IMU)
         self.addr = MPU6050_ADDR
         # Wake up MPU6050
         self.bus.write_byte_data(self.addr, PWR_MGMT_1, 0)
         time.sleep(0.1)
+
+        # FIFO sampling state
+        self.fifo_enabled = False
+        self.odr = None
+        self.samples = None
+        self.fifo_overflows = 0
     
     def read_raw_data(self, reg):
-        high = self.bus.read_byte_data(self.addr, reg)
-        low = self.bus.read_byte_data(self.addr, reg+1)
+        high, low = self.bus.read_i2c_block_data(self.addr, reg, 2)
         value = ((high << 8) | low)
-        if value > 32768:
+        if value >= 32768:
             value = value - 65536
         return value
+
+    def read_burst(self):
+        """
+        Read accel, temperature and gyro in a single 14 byte block transaction.
+        :return: numpy array [ax, ay, az, temp_c, gx, gy, gz] sampled at the same instant
+        """
+        block = self.bus.read_i2c_block_data(self.addr, ACCEL_XOUT_H, BURST_LENGTH)
+        raw = np.frombuffer(bytes(block), dtype='>i2')
+        return raw * BURST_SCALE + BURST_OFFSET
+
+    def _read_vector(self, reg, scale):
+        block = self.bus.read_i2c_block_data(self.addr, reg, 6)
+        return tuple((np.frombuffer(bytes(block), dtype='>i2') / scale).tolist())
     
     def get_acceleration(self):
-        ax = self.read_raw_data(ACCEL_XOUT_H) / 16384.0
-        ay = self.read_raw_data(ACCEL_XOUT_H + 2) / 16384.0
-        az = self.read_raw_data(ACCEL_XOUT_H + 4) / 16384.0
-        return (ax, ay, az)
+        return self._read_vector(ACCEL_XOUT_H, ACCEL_SCALE)
     
     def get_gyro(self):
-        gx = self.read_raw_data(GYRO_XOUT_H) / 131.0
-        gy = self.read_raw_data(GYRO_XOUT_H + 2) / 131.0
-        gz = self.read_raw_data(GYRO_XOUT_H + 4) / 131.0
-        return (gx, gy, gz)
+        return self._read_vector(GYRO_XOUT_H, GYRO_SCALE)
+
+    def get_motion(self):
+        """Return (acceleration, gyro) tuples from one burst read."""
+        values = self.read_burst().tolist()
+        return tuple(values[0:3]), tuple(values[4:7])
+
+    def start_fifo(self, odr=500, buffer_size=2048):
+        """
+        Sample accel + gyro into the hardware FIFO at `odr` Hz.
+        Call read_fifo() often enough that the 1024 byte FIFO does not overflow
+        (about 85 samples, i.e. 170 ms at 500 Hz).
+        """
+        divider = max(0, min(255, int(round(GYRO_OUTPUT_RATE / odr)) - 1))
+        self.odr = GYRO_OUTPUT_RATE / (divider + 1)
+        self.samples = ImuRingBuffer(buffer_size)
+
+        self.bus.write_byte_data(self.addr, CONFIG, DLPF_188HZ)
+        self.bus.write_byte_data(self.addr, SMPLRT_DIV, divider)
+        self.bus.write_byte_data(self.addr, USER_CTRL, USER_CTRL_FIFO_RESET)
+        self.bus.write_byte_data(self.addr, FIFO_EN, FIFO_EN_ACCEL_GYRO)
+        self.bus.write_byte_data(self.addr, USER_CTRL, USER_CTRL_FIFO_EN)
+        self.fifo_enabled = True
+        logger.info("MPU6050 FIFO sampling at %.0f Hz", self.odr)
+
+    def stop_fifo(self):
+        self.bus.write_byte_data(self.addr, FIFO_EN, 0)
+        self.bus.write_byte_data(self.addr, USER_CTRL, USER_CTRL_FIFO_RESET)
+        self.fifo_enabled = False
+
+    def _reset_fifo(self):
+        self.bus.write_byte_data(self.addr, USER_CTRL, USER_CTRL_FIFO_RESET | USER_CTRL_FIFO_EN)
+
+    def read_fifo(self):
+        """
+        Drain all complete samples from the hardware FIFO into the ring buffer.
+        :return: (n, 7) array of the new samples (timestamp, ax, ay, az, gx, gy, gz)
+        """
+        if not self.fifo_enabled:
+            raise RuntimeError("[MPU6050] FIFO mode not started")
+        now = time.monotonic()
+
+        # Status, count and data reads share one bus arbitration
+        with self.bus.batch(self.addr):
+            if self.bus.read_byte_data(self.addr, INT_STATUS) & INT_FIFO_OFLOW:
+                # Sample boundaries are lost on overflow, start over
+                self.fifo_overflows += 1
+                self._reset_fifo()
+                return np.zeros((0, 7))
+
+            high, low = self.bus.read_i2c_block_data(self.addr, FIFO_COUNTH, 2)
+            count = ((high << 8) | low) // FIFO_SAMPLE_BYTES * FIFO_SAMPLE_BYTES
+            if count == 0:
+                return np.zeros((0, 7))
+
+            write = smbus2.i2c_msg.write(self.addr, [FIFO_R_W])
+            read = smbus2.i2c_msg.read(self.addr, count)
+            self.bus.i2c_rdwr(write, read)
+        raw = np.frombuffer(bytes(read), dtype='>i2').reshape(-1, 6)
+
+        n = len(raw)
+        samples = np.empty((n, 7))
+        # The newest sample was taken at most one period before the drain started
+        samples[:, 0] = now - np.arange(n - 1, -1, -1) / self.odr
+        samples[:, 1:] = raw * FIFO_SCALE
+        self.samples.extend(samples)
+        return samples
 
 class SensorController:
-    def __init__(self):
+    def __init__(self, imu_rate=200, tof_rate=None, max_sample_age=0.5,
+                 timing_budget_us=33000, continuous_ranging=True, filter_window=5, recorder=None):
+        """
+        :param imu_rate: background IMU sampling rate in Hz
+        :param tof_rate: background distance sampling rate in Hz (defaults to TOF_POLL_FACTOR times the
+                         timing budget rate; polls without new data are skipped)
+        :param max_sample_age: snapshots older than this (seconds) are treated as unavailable
+        :param timing_budget_us: VL53L0X measurement timing budget (20000 fast .. 200000 accurate)
+        :param continuous_ranging: range back-to-back instead of one single-shot measurement per read
+        :param filter_window: number of readings in the median filter
+        :param recorder: optional utils.recording.Recorder receiving IMU samples and raw ranges
+        """
+        self.recorder = recorder
         self.mpu = MPU6050()
         self.vl53l0x = None
+        self.continuous_ranging = False
+        self.range_filter = RangeFilter(window=filter_window)
         try:
-            i2c = busio.I2C(board.SCL, board.SDA)
+            i2c = get_bus_manager().busio(PRIORITY_RANGING)
             self.vl53l0x = adafruit_vl53l0x.VL53L0X(i2c)
-            print("[SensorController] VL53L0X distance sensor initialized.")
+            self.vl53l0x.measurement_timing_budget = timing_budget_us
+            if continuous_ranging:
+                self.vl53l0x.start_continuous()
+                self.continuous_ranging = True
+            logger.info("VL53L0X distance sensor initialized.")
         except Exception as e:
-            print(f"[SensorController] VL53L0X init failed: {e}")
-    
-    def initialize_sensors(self):
-        print("[SensorController] Sensors initialized.")
+            logger.error("VL53L0X init failed: %s", e)
+
+        if tof_rate is None:
+            tof_rate = TOF_POLL_FACTOR * 1e6 / timing_budget_us
+
+        self.max_sample_age = max_sample_age
+        self._acquisition_started = None
+        self._imu_stale = False
+        self.imu_stale_events = 0  # times the IMU snapshot went stale (thread stalled or reads failing)
+        self.service = SensorService()
+        self.service.add_sensor('imu', self._read_imu, imu_rate)
+        if self.vl53l0x:
+            self.service.add_sensor('tof', self._read_distance, tof_rate)
     
+    def initialize_sensors(self, background=True):
+        """
+        :param background: start the acquisition threads so reads never block on the bus
+        """
+        if background:
+            self.start_acquisition()
+        logger.info("Sensors initialized.")
+
+    def start_acquisition(self):
+        self._acquisition_started = time.monotonic()
+        self.service.start()
+
+    def stop_acquisition(self):
+        self.service.stop()
+
+    def set_rates(self, imu_rate=None, tof_rate=None):
+        """Change the background sampling rates (Hz) while running; None keeps the current rate."""
+        self.service.set_rate('imu', imu_rate)
+        self.service.set_rate('tof', tof_rate)
+
+    def get_sensor_stats(self):
+        """Per-sensor sample counts, dropped samples, errors and sample age; for the IMU also staleness."""
+        stats = self.service.get_stats()
+        if 'imu' in stats:
+            stats['imu']['stale'] = self._imu_stale
+            stats['imu']['stale_events'] = self.imu_stale_events
+        return stats
+
+    @timed('sensor.read_imu')
+    def _read_imu(self):
+        if self.mpu.fifo_enabled:
+            samples = self.mpu.read_fifo()
+            if len(samples) == 0:
+                return None
+            if self.recorder is not None:
+                self.recorder.record_imu(samples)
+            latest = samples[-1].tolist()
+            return tuple(latest[1:4]), tuple(latest[4:7])
+        accel, gyro = self.mpu.get_motion()
+        if self.recorder is not None:
+            self.recorder.record_imu([(time.monotonic(),) + accel + gyro])
+        return accel, gyro
+
+    @timed('sensor.read_distance')
+    def _read_distance(self):
+        if self.continuous_ranging and not self.vl53l0x.data_ready:
+            return None
+        raw, timestamp = self.vl53l0x.range, time.monotonic()
+        if self.recorder is not None:
+            self.recorder.record_range(raw, timestamp)
+        return self.range_filter.update(raw, timestamp)
+
+    def _fresh_snapshot(self, name):
+        """Return the latest snapshot value if acquisition is running and it is recent enough."""
+        snapshot = self.service.latest(name)
+        if snapshot is None or time.monotonic() - snapshot.timestamp > self.max_sample_age:
+            return None
+        return snapshot.value
+
+    def _imu_motion(self):
+        """Fresh IMU snapshot value, or None; a stale snapshot is logged once and counted."""
+        motion = self._fresh_snapshot('imu')
+        stale = motion is None and time.monotonic() - self._acquisition_started > self.max_sample_age
+        if stale != self._imu_stale:
+            self._imu_stale = stale
+            if stale:
+                self.imu_stale_events += 1
+                logger.warning("IMU data older than %.2fs, tilt detection unavailable", self.max_sample_age)
+            else:
+                logger.info("IMU data fresh again")
+        return motion
+
+    def imu_fault(self):
+        """True while background acquisition runs but the IMU snapshot is stale; the tilt check cannot be trusted."""
+        if not self.service.running:
+            return False
+        self._imu_motion()
+        return self._imu_stale
+
+    @timed('sensor.get_orientation')
     def get_orientation(self):
-        """Return accelerometer and gyro data"""
-        accel = self.mpu.get_acceleration()
-        gyro = self.mpu.get_gyro()
+        """Return accelerometer and gyro data, or None if the background IMU data is stale (see imu_fault())"""
+        if self.service.running:
+            motion = self._imu_motion()
+            if motion is None:
+                return None
+            accel, gyro = motion
+        else:
+            accel, gyro = self.mpu.get_motion()
         return {'acceleration': accel, 'gyro': gyro}
     
-    def get_distance(self):
-        """Return distance from VL53L0X in mm, or None if sensor unavailable"""
+    @timed('sensor.get_distance')
+    def get_distance_reading(self):
+        """
+        Return a DistanceReading(filtered, raw, timestamp) from the VL53L0X,
+        or None if the sensor is unavailable.
+        """
         if self.vl53l0x:
+            if self.service.running:
+                return self._fresh_snapshot('tof')
             try:
-                distance = self.vl53l0x.range
-                return distance
+                return self.range_filter.update(self.vl53l0x.range, time.monotonic())
             except Exception as e:
-                print(f"[SensorController] Distance read error: {e}")
+                logger.error("Distance read error: %s", e)
                 return None
         else:
             return None
+
+    def get_distance(self):
+        """Return filtered distance from VL53L0X in mm, or None if sensor unavailable"""
+        reading = self.get_distance_reading()
+        return reading.filtered if reading is not None else None
     
-    def obstacle_detected(self, threshold_mm=200):
+    def obstacle_detected(self, threshold_mm=OBSTACLE_MM):
         """Returns True if obstacle is closer than threshold"""
         dist = self.get_distance()
         if dist is not None and dist < threshold_mm:
-            print(f"[SensorController] Obstacle detected at {dist}mm")
+            logger.info("Obstacle detected at %smm", dist)
             return True
         return False
     
@@ -98,10 +435,20 @@ class SensorController:
         Detect if robot is tilted by checking acceleration vector deviation from gravity.
         tilt_threshold: allowable deviation from 1G acceleration in any axis.
         """
-        ax, ay, az = self.mpu.get_acceleration()
+        orientation = self.get_orientation()
+        if orientation is None:
+            return False
+        ax, ay, az = orientation['acceleration']
         # Simple magnitude check, expecting ~1G (9.8 m/s² normalized)
         magnitude = (ax**2 + ay**2 + az**2) ** 0.5
         if abs(magnitude - 1) > tilt_threshold:
-            print(f"[SensorController] Tilt detected! Acc magnitude: {magnitude:.2f}G")
+            logger.info("Tilt detected! Acc magnitude: %.2fG", magnitude)
             return True
         return False
+
+    def cleanup(self):
+        self.stop_acquisition()
+        if self.continuous_ranging:
+            self.vl53l0x.stop_continuous()
+            self.continuous_ranging = False
+        logger.info("Sensors stopped.")
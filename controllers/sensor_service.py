@@ -0,0 +1,122 @@
+"""
+sensor_service.py
+
+Background sensor acquisition.
+Each sensor is polled by its own fixed-rate thread which publishes an
+immutable, timestamped snapshot. Readers just grab the latest snapshot
+reference, so they never touch the I2C bus or take a lock.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+SensorSnapshot = namedtuple('SensorSnapshot', ['timestamp', 'value', 'sequence'])
+
+class AcquisitionThread:
+    def __init__(self, name, read, rate_hz):
+        """
+        :param name: sensor name used in stats and log messages
+        :param read: function returning a new value, or None when no new sample is ready
+                     (called on the acquisition thread)
+        :param rate_hz: target sampling rate
+        """
+        self.name = name
+        self.read = read
+        self.rate_hz = rate_hz
+        self.snapshot = None  # replaced, never mutated; reference assignment is atomic
+
+        self.running = False
+        self.thread = None
+
+        # Statistics
+        self.samples = 0
+        self.errors = 0
+        self.dropped = 0  # sampling slots missed because a read overran its period
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"sensor-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while self.running:
+            period = 1.0 / self.rate_hz  # read every tick so set_rate() applies live
+            try:
+                value = self.read()
+                if value is not None:
+                    self.samples += 1
+                    self.snapshot = SensorSnapshot(time.monotonic(), value, self.samples)
+            except Exception as e:
+                self.errors += 1
+                logger.error("%s read error: %s", self.name, e)
+
+            next_tick += period
+            now = time.monotonic()
+            if now >= next_tick:
+                missed = int((now - next_tick) / period) + 1
+                self.dropped += missed
+                next_tick += missed * period
+            time.sleep(max(0.0, next_tick - now))
+
+    def sample_age(self):
+        """Seconds since the latest snapshot was taken, or None if nothing was read yet."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        return time.monotonic() - snapshot.timestamp
+
+    def get_stats(self):
+        return {
+            'rate_hz': self.rate_hz,
+            'samples': self.samples,
+            'errors': self.errors,
+            'dropped': self.dropped,
+            'sample_age': self.sample_age(),
+        }
+
+class SensorService:
+    def __init__(self):
+        self.sensors = {}
+
+    def add_sensor(self, name, read, rate_hz):
+        self.sensors[name] = AcquisitionThread(name, read, rate_hz)
+
+    def start(self):
+        for sensor in self.sensors.values():
+            sensor.start()
+        logger.info("Started acquisition: %s", ', '.join(self.sensors))
+
+    def stop(self):
+        for sensor in self.sensors.values():
+            sensor.stop()
+
+    @property
+    def running(self):
+        return any(sensor.running for sensor in self.sensors.values())
+
+    def set_rate(self, name, rate_hz):
+        """Change a sensor's sampling rate; a running acquisition thread picks it up on its next tick."""
+        sensor = self.sensors.get(name)
+        if sensor is not None and rate_hz:
+            sensor.rate_hz = rate_hz
+
+    def latest(self, name):
+        """Return the latest SensorSnapshot for a sensor, or None."""
+        sensor = self.sensors.get(name)
+        return sensor.snapshot if sensor is not None else None
+
+    def get_stats(self):
+        return {name: sensor.get_stats() for name, sensor in self.sensors.items()}
@@ -0,0 +1,184 @@
+"""
+sound_engine.py
+
+Low-latency sound effect mixer.
+WAV assets are decoded once into float arrays at the output format, a single
+PyAudio output stream stays open, and overlapping sounds are mixed in NumPy
+inside the stream callback. Starting a sound only appends a voice to a list.
+"""
+
+import logging
+import os
+import threading
+import wave
+
+import numpy as np
+
+from utils.hardware import pyaudio
+
+logger = logging.getLogger(__name__)
+
+SOUNDS_DIR = os.path.join(os.path.dirname(__file__), '..', 'assets', 'sounds')
+
+class Voice:
+    def __init__(self, samples, gain, loop):
+        self.samples = samples  # float32 (frames, channels)
+        self.gain = gain
+        self.loop = loop
+        self.pos = 0
+        self.finished = threading.Event()
+
+def load_wav(path):
+    """Return (float32 samples of shape (frames, channels), sample_rate) for a PCM WAV file."""
+    with wave.open(path, 'rb') as wav:
+        width = wav.getsampwidth()
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width: {width}")
+    return samples.reshape(-1, channels), rate
+
+class SoundEngine:
+    def __init__(self, pa, sounds_dir=SOUNDS_DIR, sample_rate=44100, channels=2, block_frames=256):
+        """
+        :param pa: pyaudio.PyAudio instance (shared with AudioController)
+        :param sounds_dir: directory of WAV effects, loaded by file name without extension
+        :param block_frames: frames mixed per callback (256 at 44.1 kHz is ~6 ms)
+        """
+        self.p = pa
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_frames = block_frames
+        self.sounds = {}
+        self.voices = []
+        self.lock = threading.Lock()
+        self.stream = None
+        self._mix = np.zeros((block_frames, channels), dtype=np.float32)
+        self._silence = bytes(block_frames * channels * 2)
+
+        # Statistics
+        self.voices_started = 0
+        self.underflows = 0
+
+        if os.path.isdir(sounds_dir):
+            for filename in sorted(os.listdir(sounds_dir)):
+                name, ext = os.path.splitext(filename)
+                if ext.lower() == '.wav':
+                    self.load(name, os.path.join(sounds_dir, filename))
+
+    def prepare(self, samples, rate):
+        """Convert samples to the engine's rate and channel count."""
+        if samples.shape[1] != self.channels:
+            mono = samples.mean(axis=1, keepdims=True)
+            samples = np.repeat(mono, self.channels, axis=1)
+        if rate != self.sample_rate and len(samples):
+            n = int(round(len(samples) * self.sample_rate / rate))
+            src = np.arange(len(samples))
+            dst = np.linspace(0, len(samples) - 1, n)
+            samples = np.stack([np.interp(dst, src, samples[:, c]) for c in range(self.channels)], axis=1)
+        return np.ascontiguousarray(samples, dtype=np.float32)
+
+    def load(self, name, path):
+        try:
+            samples, rate = load_wav(path)
+            self.sounds[name] = self.prepare(samples, rate)
+        except Exception as e:
+            logger.error("Failed to load %s: %s", path, e)
+
+    def start(self):
+        """Open the persistent output stream."""
+        if self.stream is not None:
+            return
+        self.stream = self.p.open(format=pyaudio.paInt16, channels=self.channels, rate=self.sample_rate,
+                                  output=True, frames_per_buffer=self.block_frames,
+                                  stream_callback=self._callback)
+        logger.info("Output stream open, %d sounds loaded", len(self.sounds))
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        self.stop_all()
+
+    def play(self, name, gain=1.0, loop=False):
+        """Start a preloaded sound and return its Voice immediately (None if unknown)."""
+        samples = self.sounds.get(name)
+        if samples is None:
+            logger.warning("Unknown sound: %s", name)
+            return None
+        return self.play_samples(samples, gain, loop)
+
+    def play_samples(self, samples, gain=1.0, loop=False):
+        """Mix already prepared float32 (frames, channels) samples into the output."""
+        voice = Voice(samples, gain, loop)
+        with self.lock:
+            self.voices.append(voice)
+        self.voices_started += 1
+        self.start()
+        return voice
+
+    def play_file(self, path, gain=1.0):
+        """Decode a WAV file (e.g. rendered speech) and play it on the shared stream."""
+        samples, rate = load_wav(path)
+        return self.play_samples(self.prepare(samples, rate), gain)
+
+    def stop_voice(self, voice):
+        with self.lock:
+            if voice in self.voices:
+                self.voices.remove(voice)
+        voice.finished.set()
+
+    def stop_all(self):
+        with self.lock:
+            voices, self.voices = self.voices, []
+        for voice in voices:
+            voice.finished.set()
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        if status & pyaudio.paOutputUnderflow:
+            self.underflows += 1
+        with self.lock:
+            voices = list(self.voices)
+        if not voices:
+            return (self._silence[:frame_count * self.channels * 2], pyaudio.paContinue)
+
+        mix = self._mix[:frame_count] if frame_count <= len(self._mix) else \
+            np.zeros((frame_count, self.channels), dtype=np.float32)
+        mix.fill(0.0)
+        finished = []
+        for voice in voices:
+            filled = 0
+            while filled < frame_count:
+                chunk = voice.samples[voice.pos:voice.pos + frame_count - filled]
+                mix[filled:filled + len(chunk)] += chunk * voice.gain
+                filled += len(chunk)
+                voice.pos += len(chunk)
+                if voice.pos >= len(voice.samples):
+                    if not voice.loop or len(voice.samples) == 0:
+                        finished.append(voice)
+                        break
+                    voice.pos = 0
+        if finished:
+            with self.lock:
+                self.voices = [v for v in self.voices if v not in finished]
+            for voice in finished:
+                voice.finished.set()
+
+        np.clip(mix, -1.0, 1.0, out=mix)
+        return ((mix * 32767.0).astype('<i2').tobytes(), pyaudio.paContinue)
+
+    def get_stats(self):
+        return {
+            'sounds': len(self.sounds),
+            'active_voices': len(self.voices),
+            'voices_started': self.voices_started,
+            'underflows': self.underflows,
+        }
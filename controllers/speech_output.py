@@ -0,0 +1,225 @@
+"""
+speech_output.py
+
+Asynchronous text-to-speech output.
+Utterances are queued by priority and spoken by a worker thread. Rendered
+speech is cached on disk as WAV files (LRU, keyed by text and voice settings)
+and played through one persistent output stream (the shared SoundEngine when
+one is given), so repeated phrases
+start instantly and a higher priority utterance can cut in (barge-in).
+"""
+
+import hashlib
+import itertools
+import logging
+import os
+import queue
+import threading
+import wave
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 10
+PRIORITY_HIGH = 20
+
+PLAYBACK_CHUNK = 1024  # frames written per stream call; interruption is checked in between
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "cache", "tts")
+
+class SpeechOutput:
+    def __init__(self, tts_engine, pa, cache_dir=CACHE_DIR, max_cache_mb=50, mixer=None):
+        """
+        :param tts_engine: pyttsx3 engine (only used from the worker thread)
+        :param pa: pyaudio.PyAudio instance used for playback when there is no mixer
+        :param mixer: optional SoundEngine; speech is then mixed into its output stream
+        :param cache_dir: directory for rendered WAV files
+        :param max_cache_mb: evict least recently used files beyond this size
+        """
+        self.engine = tts_engine
+        self.p = pa
+        self.mixer = mixer
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_mb * 1024 * 1024
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._interrupt = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._idle = threading.Event()
+        self._idle.set()
+        self.stream = None
+        self._stream_format = None
+
+        self.running = False
+        self.thread = None
+
+        # Statistics
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.interrupted = 0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.interrupt()
+        self.queue.put((0, next(self._seq), None, False))
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+    def say(self, text, priority=PRIORITY_NORMAL, interrupt=False):
+        """
+        Queue text to be spoken and return immediately.
+        :param interrupt: stop the current utterance and drop queued ones of lower priority
+        """
+        if interrupt:
+            self._drop_queued(below=priority)
+            self.interrupt()
+        self._enqueue(text, priority, speak=True)
+
+    def _enqueue(self, text, priority, speak):
+        with self._lock:
+            self._pending += 1
+            self._idle.clear()
+        self.queue.put((-priority, next(self._seq), text, speak))
+        self.start()
+
+    def interrupt(self):
+        """Cut the utterance currently playing short (barge-in)."""
+        if not self._idle.is_set():
+            self._interrupt.set()
+
+    def wait_idle(self, timeout=None):
+        """Block until everything queued has been spoken."""
+        return self._idle.wait(timeout)
+
+    def _drop_queued(self, below):
+        kept = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[2] is None or -item[0] >= below:
+                kept.append(item)
+            else:
+                self._done()
+        for item in kept:
+            self.queue.put(item)
+
+    def _done(self):
+        with self._lock:
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.set()
+
+    def cache_key(self, text):
+        voice = self.engine.getProperty('voice')
+        rate = self.engine.getProperty('rate')
+        volume = self.engine.getProperty('volume')
+        return hashlib.sha1(f"{text}|{voice}|{rate}|{volume}".encode('utf-8')).hexdigest()
+
+    def render(self, text):
+        """Return the path of the rendered WAV for text, synthesizing it on a cache miss."""
+        path = os.path.join(self.cache_dir, self.cache_key(text) + ".wav")
+        if os.path.isfile(path):
+            self.cache_hits += 1
+            os.utime(path)  # mark as recently used
+            return path
+
+        self.cache_misses += 1
+        tmp_path = path + ".tmp.wav"
+        self.engine.save_to_file(text, tmp_path)
+        self.engine.runAndWait()
+        os.replace(tmp_path, path)
+        self._evict()
+        return path
+
+    def prerender(self, phrases):
+        """
+        Queue frequent phrases (e.g. at boot) to be rendered into the cache without speaking them.
+        Runs on the worker thread at low priority, since the TTS engine is not thread-safe.
+        """
+        for text in phrases:
+            self._enqueue(text, PRIORITY_LOW, speak=False)
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".wav") and not name.endswith(".tmp.wav"):
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_cache_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def _open_stream(self, wav):
+        fmt = (wav.getsampwidth(), wav.getnchannels(), wav.getframerate())
+        if self.stream is not None and self._stream_format == fmt:
+            return
+        if self.stream is not None:
+            self.stream.close()
+        self.stream = self.p.open(format=self.p.get_format_from_width(fmt[0]), channels=fmt[1],
+                                  rate=fmt[2], output=True, frames_per_buffer=PLAYBACK_CHUNK)
+        self._stream_format = fmt
+
+    def play(self, path):
+        """Play a WAV file on the persistent stream; returns False if interrupted."""
+        if self.mixer is not None:
+            voice = self.mixer.play_file(path)
+            while not voice.finished.wait(0.02):
+                if self._interrupt.is_set():
+                    self.mixer.stop_voice(voice)
+                    self.interrupted += 1
+                    return False
+            return True
+
+        with wave.open(path, 'rb') as wav:
+            self._open_stream(wav)
+            data = wav.readframes(PLAYBACK_CHUNK)
+            while data:
+                if self._interrupt.is_set():
+                    self.interrupted += 1
+                    return False
+                self.stream.write(data)
+                data = wav.readframes(PLAYBACK_CHUNK)
+        return True
+
+    def _run(self):
+        while self.running:
+            _, _, text, speak = self.queue.get()
+            if text is None:
+                continue
+            self._interrupt.clear()
+            try:
+                path = self.render(text)
+                if speak:
+                    self.play(path)
+            except Exception as e:
+                logger.error("Failed to %s '%s': %s", 'speak' if speak else 'render', text, e)
+            self._done()
+
+    def get_stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'interrupted': self.interrupted,
+        }
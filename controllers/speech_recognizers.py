@@ -0,0 +1,76 @@
+"""
+speech_recognizers.py
+
+Pluggable speech recognizers for AudioController.
+Each backend takes a complete utterance (16-bit mono PCM) and returns the
+recognized text, or None if nothing was understood.
+"""
+
+import json
+
+import speech_recognition as sr
+
+class SpeechRecognizer:
+    name = "base"
+
+    def recognize(self, pcm, sample_rate):
+        """
+        :param pcm: bytes of 16-bit little-endian mono audio
+        :return: recognized text or None
+        """
+        raise NotImplementedError
+
+class GoogleRecognizer(SpeechRecognizer):
+    """Online recognition through the Google Web Speech API (speech_recognition)."""
+    name = "google"
+
+    def __init__(self, language="en-US"):
+        self.recognizer = sr.Recognizer()
+        self.language = language
+
+    def recognize(self, pcm, sample_rate):
+        audio = sr.AudioData(pcm, sample_rate, 2)
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            return None
+
+class SphinxRecognizer(SpeechRecognizer):
+    """Offline recognition with CMU PocketSphinx (speech_recognition)."""
+    name = "sphinx"
+
+    def __init__(self, language="en-US"):
+        self.recognizer = sr.Recognizer()
+        self.language = language
+
+    def recognize(self, pcm, sample_rate):
+        audio = sr.AudioData(pcm, sample_rate, 2)
+        try:
+            return self.recognizer.recognize_sphinx(audio, language=self.language)
+        except sr.UnknownValueError:
+            return None
+
+class VoskRecognizer(SpeechRecognizer):
+    """Offline recognition with a Vosk/Kaldi model directory."""
+    name = "vosk"
+
+    def __init__(self, model_path):
+        from vosk import Model
+        self.model = Model(model_path)
+
+    def recognize(self, pcm, sample_rate):
+        from vosk import KaldiRecognizer
+        recognizer = KaldiRecognizer(self.model, sample_rate)
+        recognizer.AcceptWaveform(pcm)
+        text = json.loads(recognizer.FinalResult()).get('text', '')
+        return text or None
+
+def create_recognizer(backend="google", **kwargs):
+    """
+    Build a recognizer by name.
+    :param backend: "google", "sphinx" or "vosk"
+    """
+    backends = {cls.name: cls for cls in (GoogleRecognizer, SphinxRecognizer, VoskRecognizer)}
+    if backend not in backends:
+        raise ValueError(f"Unknown speech recognizer backend: {backend}")
+    return backends[backend](**kwargs)
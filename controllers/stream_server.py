@@ -0,0 +1,200 @@
+"""
+stream_server.py
+
+MJPEG streaming of CameraController frames over HTTP.
+Each captured frame is JPEG-encoded at most once and fanned out to every
+connected viewer. Nothing is encoded while nobody is watching, and slow
+viewers simply skip to the newest frame instead of building up a backlog.
+"""
+
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY = "frame"
+
+INDEX_PAGE = b'''<html>
+<head><title>Robot Camera</title></head>
+<body>
+    <img src="/stream.mjpg">
+</body>
+</html>
+'''
+
+class MJPEGStreamer:
+    def __init__(self, camera, host='0.0.0.0', port=5000, quality=80, max_fps=15):
+        """
+        :param camera: started CameraController (or VisionProcess) to read frames from
+        :param quality: JPEG quality (0-100)
+        :param max_fps: upper bound on the encoded frame rate
+        """
+        self.camera = camera
+        self.host = host
+        self.port = port
+        self.quality = quality
+        self.max_fps = max_fps
+
+        self.cond = threading.Condition()
+        self.jpeg = None  # (sequence, bytes) of the newest encoded frame
+        self._sequence = 0  # numbers encoded frames; camera frame IDs skip the frames the encoder leaves out
+        self.clients = 0
+
+        self.running = False
+        self.server = None
+        self.server_thread = None
+        self.encoder_thread = None
+
+        # Statistics
+        self.frames_encoded = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0  # encoded frames a client skipped because it was still sending
+        self.frames_stale = 0    # encodes thrown away because the camera reused the frame's buffer meanwhile
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.server.daemon_threads = True
+        self.encoder_thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self.encoder_thread.start()
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        logger.info("Streaming on http://%s:%d/", self.host, self.port)
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        if self.encoder_thread is not None:
+            self.encoder_thread.join()
+        logger.info("Streaming stopped")
+
+    def _encode_loop(self):
+        last_id = 0
+        min_interval = 1.0 / self.max_fps
+        next_encode = 0.0
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), self.quality]
+        while self.running:
+            with self.cond:
+                if self.clients == 0:
+                    # Nobody is watching, don't spend CPU on encoding
+                    self.cond.wait(1.0)
+                    continue
+            packet = self.camera.wait_for_frame(last_id, timeout=1.0)
+            if packet is None:
+                continue
+            now = time.monotonic()
+            if now < next_encode:
+                time.sleep(next_encode - now)
+                continue
+            next_encode = now + min_interval
+
+            ok, buf = cv2.imencode('.jpg', packet.image, params)
+            last_id = packet.frame_id
+            if not ok:
+                continue
+            if not self.camera.is_current(packet):
+                # The image is a view into the camera's ring and was overwritten while encoding
+                self.frames_stale += 1
+                continue
+            with self.cond:
+                self._sequence += 1
+                self.jpeg = (self._sequence, buf.tobytes())
+                self.frames_encoded += 1
+                self.cond.notify_all()
+
+    def _serve_client(self, handler, max_fps=None):
+        """Write the multipart stream to one client until it disconnects."""
+        handler.send_response(200)
+        handler.send_header('Cache-Control', 'no-cache, private')
+        handler.send_header('Pragma', 'no-cache')
+        handler.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        handler.end_headers()
+
+        with self.cond:
+            self.clients += 1
+            self.cond.notify_all()
+        last_sequence = 0
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+        try:
+            while self.running:
+                with self.cond:
+                    if not self.cond.wait_for(lambda: not self.running or
+                                              (self.jpeg is not None and self.jpeg[0] > last_sequence), 1.0):
+                        continue
+                    if not self.running:
+                        break
+                    sequence, data = self.jpeg
+                    if last_sequence:
+                        # Frames encoded while this client was still busy sending are skipped
+                        self.frames_dropped += sequence - last_sequence - 1
+                last_sequence = sequence
+
+                started = time.monotonic()
+                handler.wfile.write(f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n'
+                                    f'Content-Length: {len(data)}\r\n\r\n'.encode())
+                handler.wfile.write(data)
+                handler.wfile.write(b'\r\n')
+                handler.wfile.flush()
+                with self.cond:
+                    self.frames_sent += 1
+
+                if min_interval:
+                    time.sleep(max(0.0, min_interval - (time.monotonic() - started)))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self.cond:
+                self.clients -= 1
+
+    def get_stats(self):
+        return {
+            'clients': self.clients,
+            'frames_encoded': self.frames_encoded,
+            'frames_sent': self.frames_sent,
+            'frames_dropped': self.frames_dropped,
+            'frames_stale': self.frames_stale,
+        }
+
+    def _make_handler(self):
+        streamer = self
+
+        class StreamHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path, _, query = self.path.partition('?')
+                if path == '/':
+                    self._send_body(INDEX_PAGE, 'text/html')
+                elif path in ('/stream.mjpg', '/video_feed'):
+                    params = dict(item.split('=', 1) for item in query.split('&') if '=' in item)
+                    try:
+                        max_fps = float(params['fps']) if 'fps' in params else None
+                    except ValueError:
+                        max_fps = None
+                    streamer._serve_client(self, max_fps)
+                elif path == '/stats':
+                    self._send_body(json.dumps(streamer.get_stats()).encode(), 'application/json')
+                else:
+                    self.send_error(404)
+
+            def _send_body(self, body, content_type):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Keep per-request logging off the console
+                pass
+
+        return StreamHandler
@@ -2,39 +2,223 @@
 touch_controller.py
 
 Handles input from TTP223B capacitive touch sensor.
-Uses Raspberry Pi GPIO to detect touch events and trigger callbacks.
+The GPIO edge callback only timestamps both edges into a deque; a dispatcher
+thread debounces them, classifies gestures (press, tap, double tap, long
+press, hold repeat) from the edge timings and hands them to subscribers on a
+worker pool, so slow handlers never delay or drop edges.
 """
 
-import RPi.GPIO as GPIO
+import logging
 import threading
 import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.hardware import GPIO
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Gesture kinds
+PRESS = 'press'            # touch down, delivered at once
+TAP = 'tap'                # short touch not followed by a second one
+DOUBLE_TAP = 'double_tap'
+LONG_PRESS = 'long_press'  # touch held for long_press seconds
+HOLD = 'hold'              # repeated every repeat_interval while still held after a long press
+GESTURES = (PRESS, TAP, DOUBLE_TAP, LONG_PRESS, HOLD)
+
+# timestamp: edge time that completed the gesture; duration: touch length so far; count: hold repeats
+Gesture = namedtuple('Gesture', ['kind', 'timestamp', 'duration', 'count'])
 
 class TouchController:
-    def __init__(self, touch_pin=17):
+    def __init__(self, touch_pin=17, recorder=None, debounce=0.02, tap_max=0.3, double_tap_window=0.3,
+                 long_press=0.8, repeat_interval=0.25, workers=2):
         """
         :param touch_pin: GPIO pin connected to TTP223B output
+        :param recorder: optional utils.recording.Recorder receiving touch edges
+        :param debounce: edges closer than this (seconds) to the previous one are ignored
+        :param tap_max: longest touch (seconds) that still counts as a tap
+        :param double_tap_window: maximum gap between the taps of a double tap
+        :param long_press: hold time for a long press
+        :param repeat_interval: HOLD repeat period after a long press
+        :param workers: threads delivering gestures to subscribers
         """
         self.touch_pin = touch_pin
-        self.callback = None
+        self.recorder = recorder
+        self.debounce = debounce
+        self.tap_max = tap_max
+        self.double_tap_window = double_tap_window
+        self.long_press = long_press
+        self.repeat_interval = repeat_interval
+        self.workers = workers
+        self.subscribers = []  # (callback, kinds)
         self.running = False
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(self.touch_pin, GPIO.IN)
-    
-    def start_listening(self, callback):
+
+        # Filled by the GPIO callback thread, drained by the dispatcher; deque append/popleft are atomic
+        self.edges = deque(maxlen=256)
+        self._wake = threading.Event()
+        self.dispatcher = None
+        self.executor = None
+
+        # Gesture state (dispatcher thread only)
+        self._pressed = False
+        self._last_edge = 0.0
+        self._pressed_at = None
+        self._long_fired = False
+        self._holds = 0
+        self._pending_tap = None      # (release time, duration) of a tap that may still become a double tap
+        self._first_tap = None        # that tap, once a second press started inside the window
+
+        # Statistics
+        self.edge_count = 0
+        self.bounces = 0
+        self.gesture_counts = dict.fromkeys(GESTURES, 0)
+        self.callback_errors = 0
+        self._latency = metrics.histogram('touch.dispatch_latency')
+
+    def subscribe(self, callback, kinds=None):
+        """
+        Deliver gestures to callback(gesture) on the worker pool.
+        :param kinds: gesture kinds to receive (all when None)
+        """
+        self.subscribers.append((callback, frozenset(kinds) if kinds else None))
+
+    def start_listening(self, callback=None):
         """
         Start listening for touch events.
-        :param callback: function to call on touch event (no params)
+        :param callback: optional function called (no params) on every touch, as a PRESS subscriber
         """
-        self.callback = callback
+        if self.running:
+            logger.warning("Already listening")
+            return
+        if callback is not None:
+            self.subscribe(lambda gesture: callback(), (PRESS,))
         self.running = True
-        GPIO.add_event_detect(self.touch_pin, GPIO.RISING, callback=self._handle_touch, bouncetime=200)
-        print("[TouchController] Started listening for touch events.")
-    
-    def _handle_touch(self, channel):
-        print("[TouchController] Touch detected!")
-        if self.callback:
-            self.callback()
-    
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='touch')
+        self.dispatcher = threading.Thread(target=self._dispatch, name="touch-dispatch", daemon=True)
+        self.dispatcher.start()
+        # No bouncetime: it would swallow the release of a short tap; debouncing happens in the dispatcher
+        GPIO.add_event_detect(self.touch_pin, GPIO.BOTH, callback=self._on_edge)
+        logger.info("Started listening for touch events.")
+
+    def _on_edge(self, channel):
+        """GPIO callback thread: record the edge and return."""
+        self.edges.append((time.monotonic(), GPIO.input(channel)))
+        self._wake.set()
+
+    def _deadline(self):
+        """Time at which a timed gesture fires next, or None."""
+        if self._pressed:
+            if not self._long_fired:
+                return self._pressed_at + self.long_press
+            return self._pressed_at + self.long_press + self._holds * self.repeat_interval
+        if self._pending_tap is not None:
+            return self._pending_tap[0] + self.double_tap_window
+        return None
+
+    def _dispatch(self):
+        while self.running:
+            deadline = self._deadline()
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            self._wake.wait(timeout)
+            self._wake.clear()
+            while self.edges:
+                timestamp, level = self.edges.popleft()
+                self._edge(timestamp, bool(level))
+            self._timers(time.monotonic())
+
+    def _edge(self, timestamp, pressed):
+        self.edge_count += 1
+        if pressed == self._pressed or timestamp - self._last_edge < self.debounce:
+            self.bounces += 1
+            return
+        self._last_edge = timestamp
+        self._pressed = pressed
+        if self.recorder is not None:
+            self.recorder.record_touch(self.touch_pin, int(pressed), timestamp)
+
+        if pressed:
+            # A second press inside the window may turn the pending tap into a double tap
+            if self._pending_tap is not None and timestamp - self._pending_tap[0] <= self.double_tap_window:
+                self._first_tap, self._pending_tap = self._pending_tap, None
+            else:
+                self._flush_tap()
+            self._pressed_at = timestamp
+            self._long_fired = False
+            self._holds = 0
+            self._emit(PRESS, timestamp, 0.0)
+            return
+
+        duration = timestamp - self._pressed_at
+        if self._long_fired:
+            return  # a long press ends silently
+        if duration > self.tap_max:
+            # Too long for a tap, too short for a long press; a tap before it stands on its own
+            self._flush_first_tap()
+        elif self._first_tap is not None:
+            self._first_tap = None
+            self._emit(DOUBLE_TAP, timestamp, duration)
+        else:
+            self._pending_tap = (timestamp, duration)
+
+    def _flush_tap(self):
+        """Deliver the pending tap as a single tap."""
+        if self._pending_tap is not None:
+            self._emit(TAP, *self._pending_tap)
+            self._pending_tap = None
+
+    def _flush_first_tap(self):
+        if self._first_tap is not None:
+            self._emit(TAP, *self._first_tap)
+            self._first_tap = None
+
+    def _timers(self, now):
+        if self._pressed and not self.edges and not GPIO.input(self.touch_pin):
+            # The release fell inside the debounce time of the press; resync with the pin
+            self._edge(now, False)
+        if self._pressed:
+            held = now - self._pressed_at
+            if not self._long_fired and held >= self.long_press:
+                # A tap right before stays a tap; this touch became a long press
+                self._flush_first_tap()
+                self._long_fired = True
+                self._holds = 1
+                self._emit(LONG_PRESS, self._pressed_at + self.long_press, held)
+            elif self._long_fired and held >= self.long_press + self._holds * self.repeat_interval:
+                self._emit(HOLD, self._pressed_at + self.long_press + self._holds * self.repeat_interval,
+                           held, self._holds)
+                self._holds += 1
+        elif self._pending_tap is not None and now - self._pending_tap[0] >= self.double_tap_window:
+            self._flush_tap()
+
+    def _emit(self, kind, timestamp, duration, count=0):
+        gesture = Gesture(kind, timestamp, duration, count)
+        self.gesture_counts[kind] += 1
+        logger.debug("Gesture: %s", kind)
+        for callback, kinds in self.subscribers:
+            if kinds is None or kind in kinds:
+                self.executor.submit(self._deliver, callback, gesture, time.monotonic())
+
+    def _deliver(self, callback, gesture, emitted):
+        if metrics.enabled:
+            self._latency.record(time.monotonic() - emitted)
+        try:
+            callback(gesture)
+        except Exception as e:
+            self.callback_errors += 1
+            logger.error("Gesture callback failed: %s", e)
+
+    def get_touch_stats(self):
+        return {
+            'edges': self.edge_count,
+            'bounces': self.bounces,
+            'gestures': dict(self.gesture_counts),
+            'callback_errors': self.callback_errors,
+            'queued_edges': len(self.edges),
+        }
+
     def stop_listening(self):
         """
         Stop listening and clean up GPIO event detection.
@@ -42,9 +226,12 @@ class TouchController:
         if self.running:
             GPIO.remove_event_detect(self.touch_pin)
             self.running = False
-            print("[TouchController] Stopped listening.")
-    
+            self._wake.set()
+            self.dispatcher.join()
+            self.executor.shutdown(wait=False)
+            logger.info("Stopped listening.")
+
     def cleanup(self):
         self.stop_listening()
         GPIO.cleanup()
-        print("[TouchController] GPIO cleaned up.")
+        logger.info("GPIO cleaned up.")
@@ -0,0 +1,420 @@
+"""
+vision_worker.py
+
+Camera capture and face detection in a separate process.
+The worker process owns the camera and the face pipeline and writes
+grayscale frames into a shared memory ring; face results, frame IDs and
+timings come back over a small queue. VisionProcess mirrors the
+CameraController API, so the rest of the robot does not care where vision
+runs, and a supervisor thread restarts the worker when it dies or stalls.
+"""
+
+import logging
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from controllers.camera_controller import FramePacket, scaled_min_size
+
+logger = logging.getLogger(__name__)
+
+# Per slot metadata at the start of the shared block: frame_id, timestamp (float64)
+META_FIELDS = 2
+
+# Live settings shared with the worker (set_vision_rates); 0 leaves a setting unchanged.
+# The resolution is not among them: it fixes the ring's shape, so changing it respawns the worker.
+CONTROL_FIELDS = ('version', 'max_fps', 'detect_interval', 'detect_scale', 'scale_factor')
+
+class SharedFrameRing:
+    """
+    Ring of grayscale frames in one shared memory block.
+    The writer fills a slot and then stores its frame ID; readers compare the
+    ID before and after use to detect that a slot was overwritten meanwhile.
+    """
+
+    def __init__(self, shape, slots=4, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        meta_bytes = slots * META_FIELDS * 8
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=meta_bytes + slots * frame_bytes)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        # frombuffer keeps the block exported while any view of it exists, so it cannot be unmapped under one
+        self.meta = np.frombuffer(self.shm.buf, dtype=np.float64,
+                                  count=slots * META_FIELDS).reshape(slots, META_FIELDS)
+        self.frames = np.frombuffer(self.shm.buf, dtype=np.uint8, count=slots * frame_bytes,
+                                    offset=meta_bytes).reshape((slots,) + self.shape)
+        if self.owner:
+            self.meta[:] = 0
+        self._next_slot = 0
+        self._unlinked = False
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write_buffer(self):
+        """Return the slot the next frame should be written into (writer only)."""
+        self.meta[self._next_slot, 0] = 0  # invalid while being written
+        return self.frames[self._next_slot]
+
+    def publish(self, frame_id, timestamp):
+        """Mark the slot returned by write_buffer() as holding frame_id; returns the slot index."""
+        slot = self._next_slot
+        self.meta[slot, 1] = timestamp
+        self.meta[slot, 0] = frame_id
+        self._next_slot = (slot + 1) % self.slots
+        return slot
+
+    def view(self, slot):
+        view = self.frames[slot].view()
+        view.flags.writeable = False
+        return view
+
+    def holds(self, slot, frame_id):
+        return self.meta[slot, 0] == frame_id
+
+    def close(self):
+        """
+        Unmap the block (and remove it, if we created it). Returns False while a consumer still
+        holds a frame view; call again later to release the mapping.
+        """
+        # Drop our views before closing the mapping
+        self.meta = None
+        self.frames = None
+        if self.owner and not self._unlinked:
+            self.shm.unlink()
+            self._unlinked = True
+        try:
+            self.shm.close()
+        except BufferError:
+            return False
+        return True
+
+def _apply_control(control, detector, pipeline):
+    """Apply the settings in the shared control block; returns the new max_fps or None."""
+    settings = dict(zip(CONTROL_FIELDS, control[:]))
+    if settings['detect_interval']:
+        pipeline.detect_interval = int(settings['detect_interval'])
+    if settings['detect_scale']:
+        pipeline.detect_scale = settings['detect_scale']
+        if hasattr(detector, 'min_size'):
+            detector.min_size = scaled_min_size(settings['detect_scale'])
+    if settings['scale_factor'] and hasattr(detector, 'scale_factor'):
+        detector.scale_factor = settings['scale_factor']
+    return settings['max_fps'] or None
+
+def _worker_main(ring_name, shape, slots, options, control, results, stop, heartbeat, first_frame_id):
+    """Worker process: capture, convert into the shared ring, run the face pipeline, report."""
+    import cv2
+    from controllers.face_detectors import create_detector
+    from controllers.face_tracker import FacePipeline
+    from controllers.motion_gate import MotionGate
+    from utils.hardware import open_camera
+    from utils.logger_tools import setup_logging
+
+    # The parent process owns the log file; the worker logs to the console only
+    setup_logging(log_file=False)
+    ring = SharedFrameRing(shape, slots, name=ring_name)
+    camera = open_camera(0)
+    if not camera.isOpened():
+        results.put(('error', "Unable to open camera"))
+        return
+    height, width = shape
+    camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    detect_scale = options['detect_scale']
+    if options['detector'] == "haar":
+        detector = create_detector("haar", cascade_path=options['cascade_path'],
+                                   min_size=scaled_min_size(detect_scale))
+    else:
+        detector = create_detector(options['detector'], model_path=options['model_path'],
+                                   num_threads=options['detector_threads'])
+    gate = MotionGate() if options['motion_gate'] else None
+    pipeline = FacePipeline(detector.detect, detect_interval=options['detect_interval'],
+                            detect_scale=detect_scale, gate=gate)
+    results.put(('ready', detector.name))
+
+    capture = gray = None
+    frame_id = first_frame_id  # continues the previous worker's IDs, so waiters see newer frames
+    max_fps = options['max_fps']
+    control_version = 0
+    next_frame = time.monotonic()
+    try:
+        while not stop.is_set():
+            t0 = time.monotonic()
+            heartbeat.value = t0
+            if control[0] != control_version:
+                control_version = control[0]
+                max_fps = _apply_control(control, detector, pipeline) or max_fps
+            ret, capture = camera.read(capture)
+            if not ret:
+                capture = None
+                time.sleep(0.1)
+                continue
+            t1 = time.monotonic()
+            gray = ring.write_buffer()
+            if capture.shape[:2] != (height, width):
+                # The camera did not honour the requested size
+                capture = cv2.resize(capture, (width, height), interpolation=cv2.INTER_AREA)
+            if capture.ndim == 2:
+                np.copyto(gray, capture)
+            else:
+                cv2.cvtColor(capture, cv2.COLOR_BGR2GRAY, dst=gray)
+            frame_id += 1
+            slot = ring.publish(frame_id, t1)
+            t2 = time.monotonic()
+            faces = pipeline.process(gray)
+            t3 = time.monotonic()
+            message = ('frame', frame_id, t1, slot, faces,
+                       {'capture_ms': (t1 - t0) * 1000, 'convert_ms': (t2 - t1) * 1000,
+                        'detect_ms': (t3 - t2) * 1000},
+                       pipeline.get_stats())
+            try:
+                results.put_nowait(message)
+            except queue.Full:
+                pass  # the parent is behind; it only needs the newest results anyway
+            if max_fps:
+                next_frame = max(next_frame + 1.0 / max_fps, t1)
+                time.sleep(max(0.0, next_frame - time.monotonic()))
+    finally:
+        camera.release()
+        detector.close()
+        gray = None  # our last view into the ring, or the block cannot be unmapped
+        ring.close()
+
+class VisionProcess:
+    def __init__(self, cascade_path=None, frame_size=(640, 480), ring_slots=4, detect_interval=5,
+                 detect_scale=0.5, detector="haar", model_path=None, detector_threads=2, motion_gate=True,
+                 max_fps=30, recorder=None, stall_timeout=2.0, startup_timeout=30.0, max_restart_delay=10.0):
+        """
+        Same options as CameraController; the detector is given by name since it is created in the worker.
+        :param frame_size: (width, height) requested from the camera and used for the shared frames
+        :param recorder: optional utils.recording.Recorder; frames are recorded here from shared memory
+        :param stall_timeout: restart the worker when it has not finished a frame for this long
+        :param startup_timeout: time the worker gets to import OpenCV and load its detector
+        :param max_restart_delay: upper bound of the exponential restart backoff
+        """
+        self.options = {
+            'cascade_path': cascade_path, 'detect_interval': detect_interval, 'detect_scale': detect_scale,
+            'detector': detector, 'model_path': model_path, 'detector_threads': detector_threads,
+            'motion_gate': motion_gate, 'max_fps': max_fps,
+        }
+        self.shape = (frame_size[1], frame_size[0])
+        self.ring = SharedFrameRing(self.shape, ring_slots)
+        self._pending_shape = None  # resolution requested by set_vision_rates(), applied by the supervisor
+        self._retired = []          # replaced rings still mapped because a consumer holds one of their frames
+        self.recorder = recorder
+        self.stall_timeout = stall_timeout
+        self.startup_timeout = startup_timeout
+        self.max_restart_delay = max_restart_delay
+        # Spawn so the worker does not inherit our threads and held locks
+        self.ctx = mp.get_context('spawn')
+        self.stop_event = self.ctx.Event()
+        self.heartbeat = self.ctx.Value('d', 0.0, lock=False)
+        self.control = self.ctx.Array('d', len(CONTROL_FIELDS))
+        self.process = None
+        self.results = None
+        self.worker_ready = False
+        self.started_at = 0.0
+
+        self.running = False
+        self.supervisor = None
+        self.cond = threading.Condition()
+        self.latest = None       # FramePacket of the newest frame
+        self._faces = []
+        self._pipeline_stats = {}
+        self._timings = {}
+
+        # Statistics
+        self.frames_received = 0
+        self.restarts = 0
+        self.last_restart_reason = None
+
+    def _spawn(self):
+        self.stop_event.clear()
+        self.worker_ready = False
+        self.heartbeat.value = time.monotonic()
+        self.results = self.ctx.Queue(maxsize=8)
+        self.process = self.ctx.Process(target=_worker_main, name="vision-worker", daemon=True,
+                                        args=(self.ring.name, self.shape, self.ring.slots, self.options,
+                                              self.control, self.results, self.stop_event, self.heartbeat,
+                                              self.latest.frame_id if self.latest is not None else 0))
+        self.process.start()
+        self.started_at = time.monotonic()
+
+    def _terminate(self):
+        if self.process is None:
+            return
+        self.stop_event.set()
+        self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        # A killed worker may leave the queue's pipe in an undefined state, use a fresh one
+        self.results.close()
+        self.results.cancel_join_thread()
+        self.process = None
+
+    def start_camera(self):
+        if self.running:
+            logger.warning("Camera already running")
+            return
+        self.running = True
+        self._spawn()
+        self.supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self.supervisor.start()
+        logger.info("Worker started (pid %d)", self.process.pid)
+
+    def _supervise(self):
+        restart_delay = 0.5
+        while self.running:
+            try:
+                message = self.results.get(timeout=0.2)
+            except queue.Empty:
+                message = None
+            except (EOFError, OSError):
+                message = None
+            if message is not None:
+                self._handle(message)
+            if self._retired:
+                self._retired = [ring for ring in self._retired if not ring.close()]
+            if self._pending_shape is not None and self.running:
+                self._resize()
+                continue
+
+            reason = None
+            if not self.process.is_alive():
+                reason = f"exited with code {self.process.exitcode}"
+            elif self.worker_ready and time.monotonic() - self.heartbeat.value > self.stall_timeout:
+                reason = f"stalled for more than {self.stall_timeout} s"
+            elif not self.worker_ready and time.monotonic() - self.started_at > self.startup_timeout:
+                reason = f"not ready after {self.startup_timeout} s"
+            elif message is not None and message[0] == 'error':
+                reason = message[1]
+            if reason is None or not self.running:
+                if time.monotonic() - self.started_at > 30:
+                    restart_delay = 0.5  # ran long enough, reset the backoff
+                continue
+
+            logger.warning("Worker %s, restarting in %.1f s", reason, restart_delay)
+            self.restarts += 1
+            self.last_restart_reason = reason
+            self._terminate()
+            time.sleep(restart_delay)
+            restart_delay = min(restart_delay * 2, self.max_restart_delay)
+            if self.running:
+                self._spawn()
+
+    def _resize(self):
+        """Respawn the worker with a ring of the requested resolution."""
+        shape, self._pending_shape = self._pending_shape, None
+        if shape == self.shape:
+            return
+        logger.info("Resolution %dx%d, restarting the worker", shape[1], shape[0])
+        self._terminate()
+        # Views of the old ring stay valid for whoever holds them; it is unmapped once they are gone
+        old_ring, self.ring = self.ring, SharedFrameRing(shape, self.ring.slots)
+        if not old_ring.close():
+            self._retired.append(old_ring)
+        self.shape = shape
+        self._spawn()
+
+    def _handle(self, message):
+        kind = message[0]
+        if kind == 'ready':
+            self.worker_ready = True
+            self.heartbeat.value = time.monotonic()
+            logger.info("Face detector: %s", message[1])
+        elif kind == 'frame':
+            _, frame_id, timestamp, slot, faces, timings, pipeline_stats = message
+            packet = FramePacket(frame_id, timestamp, self.ring.view(slot))
+            if self.recorder is not None:
+                # Copy first and check afterwards: the worker may overwrite the slot during the copy
+                image = packet.image.copy()
+                if self.ring.holds(slot, frame_id):
+                    self.recorder.record_frame(image, timestamp)
+            with self.cond:
+                self.latest = packet
+                self._faces = faces
+                self._timings = timings
+                self._pipeline_stats = pipeline_stats
+                self.frames_received += 1
+                self.cond.notify_all()
+
+    def get_frame(self):
+        """Latest grayscale frame as a read-only view into shared memory (see is_current())."""
+        packet = self.latest
+        return packet.image if packet is not None else None
+
+    def get_frame_packet(self):
+        return self.latest
+
+    def is_current(self, packet):
+        """True while the worker has not overwritten the packet's slot."""
+        return self.ring.meta is not None and packet.frame_id in self.ring.meta[:, 0]
+
+    def wait_for_frame(self, after_id=0, timeout=None):
+        with self.cond:
+            if self.cond.wait_for(lambda: self.latest is not None and self.latest.frame_id > after_id, timeout):
+                return self.latest
+            return None
+
+    def detect_faces(self):
+        """Faces found by the worker in its newest frame (never blocks on detection)."""
+        return self._faces
+
+    def detect_face(self):
+        return len(self._faces) > 0
+
+    def set_vision_rates(self, max_fps=None, resolution=None, detect_interval=None, detect_scale=None,
+                         scale_factor=None):
+        """
+        Change capture and detection settings while running; None keeps the current value.
+        The worker applies them before its next frame, and a restarted worker keeps them.
+        A new resolution respawns the worker with a shared ring of that size.
+        """
+        if resolution is not None and (resolution[1], resolution[0]) != self.shape:
+            self._pending_shape = (resolution[1], resolution[0])
+        settings = {'max_fps': max_fps, 'detect_interval': detect_interval, 'detect_scale': detect_scale,
+                    'scale_factor': scale_factor}
+        with self.control.get_lock():
+            for field, value in settings.items():
+                if value is not None:
+                    self.control[CONTROL_FIELDS.index(field)] = value
+            self.control[0] += 1
+
+    def get_vision_stats(self):
+        return {
+            'pipeline': self._pipeline_stats,
+            'timings_ms': self._timings,
+            'frames': self.frames_received,
+            'restarts': self.restarts,
+            'last_restart_reason': self.last_restart_reason,
+            'worker_pid': self.process.pid if self.process is not None else None,
+            'frame_size': self.shape[::-1],
+        }
+
+    def stop_camera(self):
+        if self.ring.frames is None:
+            return
+        self.running = False
+        if self.supervisor is not None:
+            self.supervisor.join()
+            self.supervisor = None
+        self._terminate()
+        self.latest = None
+        # Rings whose frames are still held elsewhere are unmapped when the process exits
+        self._retired = [ring for ring in self._retired + [self.ring] if not ring.close()]
+        logger.info("Camera stopped")
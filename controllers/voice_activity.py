@@ -0,0 +1,141 @@
+"""
+voice_activity.py
+
+Streaming voice activity detection for the microphone.
+Audio is captured continuously into a ring buffer, classified per frame with
+a NumPy energy / zero-crossing VAD and cut into complete utterances
+(with pre-roll) that can be handed to a speech recognizer.
+"""
+
+import threading
+from collections import deque
+
+import numpy as np
+
+class AudioRingBuffer:
+    """Single-producer, single-consumer ring of int16 samples."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.written = 0  # total samples written
+        self.read_pos = 0  # total samples consumed
+        self.overruns = 0
+        self.cond = threading.Condition()
+
+    def write(self, samples):
+        """Append samples (called from the capture callback)."""
+        n = len(samples)
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            n = self.capacity
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        with self.cond:
+            self.written += n
+            self.cond.notify()
+
+    def read(self, n, timeout=None):
+        """Return the next `n` samples, or None if they did not arrive within `timeout`."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.written - self.read_pos >= n, timeout):
+                return None
+            if self.written - self.read_pos > self.capacity:
+                # The consumer fell behind and the oldest audio was overwritten
+                self.overruns += 1
+                self.read_pos = self.written - self.capacity
+            start = self.read_pos % self.capacity
+            self.read_pos += n
+        idx = np.arange(start, start + n) % self.capacity
+        return self.data[idx]
+
+class EnergyVAD:
+    def __init__(self, energy_ratio=3.0, min_energy=2e4, max_zcr=0.35, noise_alpha=0.05, noise_window=100):
+        """
+        :param energy_ratio: speech must be this much louder than the tracked noise floor
+        :param min_energy: absolute mean-square floor (int16 units) below which nothing is speech
+        :param max_zcr: frames crossing zero more often than this (per sample) are hiss, not voice
+        :param noise_alpha: how quickly the noise floor follows non-speech frames
+        :param noise_window: frames of energy history; the floor is raised to the quietest of them
+                             (minimum statistics), so a lasting rise in background noise such as the
+                             motors or a fan stops counting as speech after this many frames
+        """
+        self.energy_ratio = energy_ratio
+        self.min_energy = min_energy
+        self.max_zcr = max_zcr
+        self.noise_alpha = noise_alpha
+        self.noise_floor = None
+        self._energies = deque(maxlen=noise_window)
+
+    def is_speech(self, frame):
+        samples = frame.astype(np.float32)
+        energy = float(np.mean(samples * samples))
+        zcr = float(np.count_nonzero(np.diff(np.signbit(frame)))) / len(frame)
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        self._energies.append(energy)
+        if len(self._energies) == self._energies.maxlen:
+            # Speech has pauses between words; a window without any quiet frame means the noise went up
+            self.noise_floor = max(self.noise_floor, min(self._energies))
+        speech = energy > max(self.min_energy, self.noise_floor * self.energy_ratio) and zcr < self.max_zcr
+        if not speech:
+            self.noise_floor += self.noise_alpha * (energy - self.noise_floor)
+        return speech
+
+class UtteranceSegmenter:
+    def __init__(self, vad, frame_ms=30, pre_roll_ms=300, hangover_ms=500,
+                 min_speech_ms=200, max_utterance_ms=10000):
+        """
+        :param vad: EnergyVAD (or anything with is_speech(frame))
+        :param pre_roll_ms: audio kept from before speech starts, so first syllables are not cut
+        :param hangover_ms: silence needed to end an utterance
+        :param min_speech_ms: shorter bursts (clicks, knocks) are discarded
+        :param max_utterance_ms: force the utterance to end after this long
+        """
+        self.vad = vad
+        self.pre_roll = deque(maxlen=max(1, pre_roll_ms // frame_ms))
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_frames = max(1, max_utterance_ms // frame_ms)
+        self._frames = []
+        self._speech_frames = 0
+        self._silence = 0
+        self.in_speech = False
+
+        # Statistics
+        self.utterances = 0
+        self.discarded = 0
+
+    def feed(self, frame):
+        """Process one frame; returns a complete utterance (int16 array) or None."""
+        speech = self.vad.is_speech(frame)
+        if not self.in_speech:
+            if speech:
+                self.in_speech = True
+                self._frames = list(self.pre_roll)
+                self._frames.append(frame.copy())
+                self._speech_frames = 1
+                self._silence = 0
+                self.pre_roll.clear()
+            else:
+                self.pre_roll.append(frame.copy())
+            return None
+
+        self._frames.append(frame.copy())
+        if speech:
+            self._speech_frames += 1
+            self._silence = 0
+        else:
+            self._silence += 1
+        if self._silence < self.hangover_frames and len(self._frames) < self.max_frames:
+            return None
+
+        self.in_speech = False
+        frames, self._frames = self._frames, []
+        if self._speech_frames < self.min_speech_frames:
+            self.discarded += 1
+            return None
+        self.utterances += 1
+        return np.concatenate(frames)
@@ -1,55 +1,318 @@
-import time
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 
-from controllers.motor_controller import MotorController
-from controllers.sensor_controller import SensorController
-from controllers.camera_controller import CameraController
-from controllers.display_controller import DisplayController
-from ai.face_recognition import FaceRecognition
-from ai.speech_recognition import SpeechRecognition
-from ai.chatbot import ChatBot
+from utils.boot_orchestrator import BootOrchestrator, BootError
+from utils.event_bus import EventBus, BlockingLane, DeadlineMissed
+from utils.governor import governor_from_config
+from utils.logger_tools import setup_logging
+from utils.metrics import metrics
+from utils.recording import recorder_from_config
+from utils.settings import get_section
 
-def main():
-    print("Booting")
+logger = logging.getLogger('runtime')
+
+# Görev periyotları (saniye)
+SENSOR_PERIOD = 0.02
+VISION_PERIOD = 0.05
+
+# Bloklayan çağrılar için süre sınırları (saniye)
+DEADLINES = {
+    'vision': 0.5,
+    'listen': 10.0,
+    'chatbot': 5.0,
+    'speak': 15.0,
+    'motor': 1.0,
+    'safety': 2.0,
+}
+
+async def sensor_task(bus, sensor_ctrl):
+    """Engel ve eğim kontrolü; okumalar arka plan anlık görüntülerinden gelir, bus'a dokunmaz."""
+    loop_timer = metrics.loop('loop.sensors', SENSOR_PERIOD)
+    while True:
+        loop_timer.tick()
+        if sensor_ctrl.obstacle_detected():
+            bus.publish('obstacle', sensor_ctrl.get_distance(), critical=True)
+        if sensor_ctrl.is_tilted():
+            bus.publish('tilt', critical=True)
+        elif sensor_ctrl.imu_fault():
+            # IMU verisi bayat: eğim kontrolü çalışmıyor, güvenli tarafta kalıp dur
+            bus.publish('imu_fault', critical=True)
+        await asyncio.sleep(SENSOR_PERIOD)
+
+async def vision_task(bus, camera_ctrl, lane):
+    """Yüz algılama kendi thread'inde; sadece durum değişince olay yayınlar."""
+    face_present = None
+    loop_timer = metrics.loop('loop.vision', VISION_PERIOD)
+    while True:
+        loop_timer.tick()
+        if lane.busy:
+            # Süresini aşan algılama hâlâ sürüyor; arkasına yenisini kuyruğa ekleme
+            lane.skip()
+            await asyncio.sleep(VISION_PERIOD)
+            continue
+        try:
+            faces = await lane.run(camera_ctrl.detect_faces, deadline=DEADLINES['vision'])
+            present = len(faces) > 0
+            if present != face_present:
+                face_present = present
+                bus.publish('face', faces)
+        except DeadlineMissed as e:
+            logger.warning("Vision deadline missed: %s", e)
+        await asyncio.sleep(VISION_PERIOD)
+
+async def display_task(bus, display_ctrl):
+    subscription = bus.subscribe('face')
+    while True:
+        event = await subscription.get()
+        # show_eyes arka plandaki compositor'a iş bırakır, bloklamaz
+        display_ctrl.show_eyes("happy" if event.data else "neutral")
+
+async def motor_action(name, action, lane, deadline):
+    """Hareketi kendi lane'inde çalıştırır; hatalar loglanır, motor_task'ı durdurmaz."""
+    if lane.busy:
+        # Süresini aşan önceki hareket thread'de hâlâ sürüyor
+        lane.skip()
+        logger.debug("%s action skipped, previous one still running", name)
+        return
+    try:
+        await lane.run(action, deadline=deadline)
+    except DeadlineMissed as e:
+        logger.warning("%s deadline missed: %s", name, e)
+    except (OSError, RuntimeError, ValueError) as e:
+        # GPIO/PWM hataları; programlama hataları (AttributeError vb.) yukarı çıkar
+        logger.error("%s action failed: %s", name, e)
+
+def safety_maneuver(motor_ctrl, topic):
+    """Kaçınma sürerken motorlar yalnızca bu thread'e ait; yarım kalan yüz tepkisi motorlara yazamaz."""
+    def maneuver():
+        with motor_ctrl.exclusive():
+            if topic == 'obstacle':
+                motor_ctrl.avoid_obstacle()
+            else:
+                motor_ctrl.stop_all()
+    return maneuver
+
+def face_reaction(motor_ctrl):
+    """Bir güvenlik manevrası başlarsa bu hareketin motor komutları yok sayılır."""
+    def react():
+        with motor_ctrl.preemptible():
+            motor_ctrl.react_to_face()
+    return react
+
+async def motor_task(bus, motor_ctrl, motor_lane, safety_lane):
+    """
+    Engel/eğim olayları ayrı bir executor'da, diğer hareketlerden önce işlenir.
+    Normal hareketler arka planda çalışır, böylece kritik olaylar hiç beklemez; kritik bir olay
+    gelince bekleyen hareket iptal edilir.
+    """
+    subscription = bus.subscribe('obstacle', 'tilt', 'imu_fault', 'face')
+    safety = None
+    motion = None
+    while True:
+        event = await subscription.get()
+        if event.critical:
+            if motion is not None and not motion.done():
+                motion.cancel()  # Thread'deki çağrı sürse de preemptible() onu motorlardan uzak tutar
+            if safety is not None and not safety.done():
+                continue  # Kaçınma manevrası zaten sürüyor
+            safety = asyncio.ensure_future(motor_action('Safety', safety_maneuver(motor_ctrl, event.topic),
+                                                        safety_lane, DEADLINES['safety']))
+        elif event.topic == 'face' and event.data:
+            busy = [future for future in (safety, motion) if future is not None and not future.done()]
+            if busy:
+                continue  # Güvenlik manevrası veya önceki hareket sürüyor
+            motion = asyncio.ensure_future(motor_action('Motor', face_reaction(motor_ctrl),
+                                                        motor_lane, DEADLINES['motor']))
+
+async def speech_task(bus, speech_ai, chatbot_ai, lane):
+    """Sesli komut dinleme ve cevap; yavaş olsa da diğer görevleri bekletmez."""
+    while True:
+        if lane.busy:
+            # Takılan dinleme/konuşma bitmeden yeni çağrı gönderilmez
+            lane.skip()
+            await asyncio.sleep(0.1)
+            continue
+        try:
+            command = await lane.run(speech_ai.listen, deadline=DEADLINES['listen'])
+            if command:
+                bus.publish('command', command)
+                response = await lane.run(chatbot_ai.get_response, command, deadline=DEADLINES['chatbot'])
+                await lane.run(speech_ai.speak, response, deadline=DEADLINES['speak'])
+        except DeadlineMissed as e:
+            logger.warning("Speech deadline missed: %s", e)
+        await asyncio.sleep(0.1)
+
+async def run(motor_ctrl, sensor_ctrl, camera_ctrl, display_ctrl, speech_ai, chatbot_ai):
+    bus = EventBus()
+    bus.bind()
+
+    if metrics.enabled:
+        # Gecikme istatistikleri: http://127.0.0.1:8081/metrics
+        metrics.serve()
+        metrics.start_reporter()
+    # Kamera yayını: http://<robot-ip>:5000/
+    streamer = start_streamer(camera_ctrl)
+
+    # Her alt sistemin kendi executor'ı var, biri takılınca diğerleri etkilenmez; her birinde en fazla bir çağrı sürer
+    vision_lane = BlockingLane(ThreadPoolExecutor(max_workers=1, thread_name_prefix='vision'))
+    speech_lane = BlockingLane(ThreadPoolExecutor(max_workers=1, thread_name_prefix='speech'))
+    motor_lane = BlockingLane(ThreadPoolExecutor(max_workers=1, thread_name_prefix='motor'))
+    safety_lane = BlockingLane(ThreadPoolExecutor(max_workers=1, thread_name_prefix='safety'))
+
+    tasks = [
+        asyncio.create_task(sensor_task(bus, sensor_ctrl)),
+        asyncio.create_task(motor_task(bus, motor_ctrl, motor_lane, safety_lane)),
+        asyncio.create_task(vision_task(bus, camera_ctrl, vision_lane)),
+        asyncio.create_task(display_task(bus, display_ctrl)),
+        asyncio.create_task(speech_task(bus, speech_ai, chatbot_ai, speech_lane)),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for lane in (vision_lane, speech_lane, motor_lane, safety_lane):
+            lane.shutdown()
+        if streamer is not None:
+            streamer.stop()
+
+# Bileşen fabrikaları: ağır modüller (cv2, pyaudio, luma, konuşma motorları) ilk kullanımda yüklenir
 
-    motor_ctrl = MotorController()
-    sensor_ctrl = SensorController()
-    camera_ctrl = CameraController()
+def start_display():
+    from controllers.display_controller import DisplayController
     display_ctrl = DisplayController()
-    face_ai = FaceRecognition()
-    speech_ai = SpeechRecognition()
-    chatbot_ai = ChatBot()
+    display_ctrl.init_display(message=None)
+    display_ctrl.show_status("Booting")
+    return display_ctrl
 
-    display_ctrl.init_display()
-    motor_ctrl.initialize_motors()
+def start_sensors(recorder):
+    from controllers.sensor_controller import SensorController
+    sensor_ctrl = SensorController(recorder=recorder)
     sensor_ctrl.initialize_sensors()
+    return sensor_ctrl
+
+def start_motors(sensors):
+    from controllers.motor_controller import MotorController
+    motor_ctrl = MotorController(imu=sensors)
+    motor_ctrl.initialize_motors()
+    return motor_ctrl
+
+def start_camera(recorder):
+    # Vision in its own process keeps detection off the GIL shared with motor and sensor work
+    vision_process = os.environ.get('ROBOT_VISION_PROCESS', get_section('vision').get('process', False))
+    if str(vision_process).lower() in ('1', 'true', 'yes'):
+        from controllers.vision_worker import VisionProcess
+        camera_ctrl = VisionProcess(recorder=recorder)
+    else:
+        from controllers.camera_controller import CameraController
+        camera_ctrl = CameraController(recorder=recorder)
     camera_ctrl.start_camera()
+    return camera_ctrl
+
+def start_streamer(camera_ctrl):
+    """MJPEG stream of the camera for watching the robot remotely (ROBOT_STREAM or stream.enabled)."""
+    config = get_section('stream')
+    enabled = os.environ.get('ROBOT_STREAM', config.get('enabled', False))
+    if str(enabled).lower() not in ('1', 'true', 'yes', 'on'):
+        return None
+    from controllers.stream_server import MJPEGStreamer
+    streamer = MJPEGStreamer(camera_ctrl, host=config.get('host', '0.0.0.0'), port=int(config.get('port', 5000)),
+                             quality=int(config.get('quality', 80)), max_fps=float(config.get('max_fps', 15)))
+    streamer.start()
+    return streamer
+
+def start_face_ai():
+    from ai.face_recognition import FaceRecognition
+    return FaceRecognition()
+
+def start_speech_ai():
+    from ai.speech_recognition import SpeechRecognition
+    return SpeechRecognition()
+
+def start_chatbot_ai():
+    from ai.chatbot import ChatBot
+    return ChatBot()
 
+def build_boot(recorder):
+    """Declare the components; independent ones start in parallel."""
+    boot = BootOrchestrator()
+    boot.add('display', start_display, stop=lambda display_ctrl: display_ctrl.stop_display())
+    boot.add('sensors', lambda: start_sensors(recorder), stop=lambda sensor_ctrl: sensor_ctrl.cleanup())
+    boot.add('motors', start_motors, depends=('sensors',), stop=lambda motor_ctrl: motor_ctrl.cleanup())
+    boot.add('camera', lambda: start_camera(recorder), stop=lambda camera_ctrl: camera_ctrl.stop_camera())
+    boot.add('face_ai', start_face_ai)
+    boot.add('speech_ai', start_speech_ai)
+    boot.add('chatbot_ai', start_chatbot_ai)
+    return boot
+
+def show_boot_progress(boot):
+    """Once the display is up, show each finished component on it; each update replaces the last."""
+    def on_progress(component, done, total):
+        display_ctrl = boot.components['display'].instance
+        if display_ctrl is not None:
+            display_ctrl.show_status(f"{done}/{total} {component.name}")
+    boot.on_progress(on_progress)
+
+def apply_profile(profile, camera_ctrl, sensor_ctrl, display_ctrl, motor_ctrl):
+    """Push a governor profile to the running controllers; missing keys keep the current setting."""
+    camera_ctrl.set_vision_rates(max_fps=profile.get('camera_fps'),
+                                 resolution=profile.get('camera_resolution'),
+                                 detect_interval=profile.get('detect_interval'),
+                                 detect_scale=profile.get('detect_scale'),
+                                 scale_factor=profile.get('haar_scale_factor'))
+    sensor_ctrl.set_rates(imu_rate=profile.get('imu_rate'), tof_rate=profile.get('tof_rate'))
+    display_ctrl.set_fps(profile.get('display_fps'))
+    motor_ctrl.set_pwm_frequency(profile.get('pwm_freq'))
+
+def main():
+    setup_logging()
+    logger.info("Booting")
+
+    recorder = recorder_from_config()
+    boot = build_boot(recorder)
+    show_boot_progress(boot)
     try:
-        while True:
-            # Yüz algılama
-            face_detected = camera_ctrl.detect_face()
-            if face_detected:
-                display_ctrl.show_eyes("happy")
-                motor_ctrl.react_to_face()
-            else:
-                display_ctrl.show_eyes("neutral")
+        components = boot.boot()
+    except BootError as e:
+        logger.error("Boot failed: %s", e)
+        boot.report()
+        # Camera worker and its shared memory, sensor threads and the motor loop would otherwise keep running
+        boot.shutdown()
+        if recorder is not None:
+            recorder.close()
+        return
+    boot.report()
 
-            # Engel algılama
-            if sensor_ctrl.obstacle_detected():
-                motor_ctrl.avoid_obstacle()
+    motor_ctrl = components['motors']
+    sensor_ctrl = components['sensors']
+    camera_ctrl = components['camera']
+    display_ctrl = components['display']
+    speech_ai = components['speech_ai']
+    chatbot_ai = components['chatbot_ai']
+    display_ctrl.show_status(None)
+    display_ctrl.show_message("Robot Ready")
 
-            # Sesli komut dinleme ve cevap
-            command = speech_ai.listen()
-            if command:
-                response = chatbot_ai.get_response(command)
-                speech_ai.speak(response)
+    # Sıcaklık ve CPU yüküne göre hızları ayarlar; önce görüntü işleme yavaşlar
+    governor = governor_from_config()
+    if governor is not None:
+        governor.subscribe(lambda profile: apply_profile(profile, camera_ctrl, sensor_ctrl, display_ctrl, motor_ctrl))
+        governor.start()
 
-            time.sleep(0.1)  # Döngü hız kontrolü
+    try:
+        asyncio.run(run(motor_ctrl, sensor_ctrl, camera_ctrl, display_ctrl, speech_ai, chatbot_ai))
 
     except KeyboardInterrupt:
-        print("\nRobot stopped")
+        logger.info("Robot stopped")
         motor_ctrl.stop_all()
         display_ctrl.clear_display()
+    finally:
+        if governor is not None:
+            governor.stop()
+        camera_ctrl.stop_camera()
+        if recorder is not None:
+            recorder.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,211 @@
+"""
+audio.py
+
+PyAudio stand-in.
+Streams run in real time: input streams play a WAV file (looped) or silence
+into the microphone, output streams discard audio or record it to a WAV
+file. Blocking and callback modes behave like PortAudio, including the
+callback period.
+"""
+
+import itertools
+import os
+import threading
+import time
+import wave
+
+import numpy as np
+
+paFloat32 = 1
+paInt32 = 2
+paInt24 = 4
+paInt16 = 8
+paInt8 = 16
+paUInt8 = 32
+
+paContinue = 0
+paComplete = 1
+paAbort = 2
+
+paInputUnderflow = 1
+paInputOverflow = 2
+paOutputUnderflow = 4
+paOutputOverflow = 8
+
+_SAMPLE_SIZES = {paFloat32: 4, paInt32: 4, paInt24: 3, paInt16: 2, paInt8: 1, paUInt8: 1}
+
+_config = {'audio_input': None, 'audio_output': None}
+_output_index = itertools.count()
+
+def configure(config):
+    _config['audio_input'] = config.get('audio_input')
+    _config['audio_output'] = config.get('audio_output')
+
+def get_sample_size(format):
+    return _SAMPLE_SIZES[format]
+
+def get_format_from_width(width, unsigned=True):
+    if width == 1:
+        return paUInt8 if unsigned else paInt8
+    return {2: paInt16, 3: paInt24, 4: paFloat32}[width]
+
+def _load_input(path, rate, channels):
+    """Read a WAV file as int16 samples converted to the stream's rate and channel count."""
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit WAV input is supported")
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2')
+        samples = samples.reshape(-1, wav.getnchannels()).astype(np.float32)
+        source_rate = wav.getframerate()
+    mono = samples.mean(axis=1)
+    if source_rate != rate and len(mono):
+        n = int(round(len(mono) * rate / source_rate))
+        mono = np.interp(np.linspace(0, len(mono) - 1, n), np.arange(len(mono)), mono)
+    return np.repeat(mono[:, np.newaxis], channels, axis=1).astype('<i2').reshape(-1)
+
+class Stream:
+    def __init__(self, rate, channels, format, input=False, output=False, frames_per_buffer=1024,
+                 stream_callback=None, start=True, **kwargs):
+        self.rate = rate
+        self.channels = channels
+        self.format = format
+        self.frame_bytes = channels * get_sample_size(format)
+        self.frames_per_buffer = frames_per_buffer
+        self.callback = stream_callback
+        self.is_input = input
+        self.is_output = output
+
+        self.source = None
+        self.source_pos = 0
+        if input and _config['audio_input']:
+            if format != paInt16:
+                raise ValueError("Simulated input from a WAV file needs paInt16")
+            self.source = _load_input(_config['audio_input'], rate, channels)
+
+        self.sink = None
+        if output and _config['audio_output']:
+            base, ext = os.path.splitext(_config['audio_output'])
+            index = next(_output_index)
+            self.sink = wave.open(f"{base}-{index}{ext}" if index else _config['audio_output'], 'wb')
+            self.sink.setnchannels(channels)
+            self.sink.setsampwidth(get_sample_size(format))
+            self.sink.setframerate(rate)
+
+        self.active = False
+        self.started_at = None
+        self.frames_done = 0
+        self.thread = None
+        if start:
+            self.start_stream()
+
+    def _input_frames(self, frames):
+        if self.source is None or not len(self.source):
+            return bytes(frames * self.frame_bytes)
+        n = frames * self.channels
+        idx = np.arange(self.source_pos, self.source_pos + n) % len(self.source)
+        self.source_pos = (self.source_pos + n) % len(self.source)
+        return self.source[idx].tobytes()
+
+    def _wait_for(self, frames):
+        """Sleep until `frames` frames have elapsed in stream time."""
+        delay = self.started_at + frames / self.rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def start_stream(self):
+        if self.active:
+            return
+        self.active = True
+        self.started_at = time.monotonic() - self.frames_done / self.rate
+        if self.callback is not None:
+            self.thread = threading.Thread(target=self._run_callback, daemon=True)
+            self.thread.start()
+
+    def _run_callback(self):
+        status = 0
+        while self.active:
+            frames = self.frames_per_buffer
+            in_data = self._input_frames(frames) if self.is_input else None
+            now = time.monotonic()
+            time_info = {'input_buffer_adc_time': now, 'current_time': now, 'output_buffer_dac_time': now}
+            out_data, flag = self.callback(in_data, frames, time_info, status)
+            if self.is_output and out_data and self.sink is not None:
+                self.sink.writeframes(out_data)
+            self.frames_done += frames
+            if flag != paContinue:
+                self.active = False
+                break
+            # A late callback shows up as an underflow/overflow on the next one, like PortAudio
+            behind = time.monotonic() - (self.started_at + self.frames_done / self.rate)
+            status = (paOutputUnderflow if self.is_output else paInputOverflow) if behind > frames / self.rate else 0
+            self._wait_for(self.frames_done)
+
+    def read(self, num_frames, exception_on_overflow=True):
+        if not self.active:
+            raise OSError("Stream not open")
+        data = self._input_frames(num_frames)
+        self.frames_done += num_frames
+        self._wait_for(self.frames_done)
+        return data
+
+    def write(self, frames, num_frames=None, exception_on_underflow=False):
+        if not self.active:
+            raise OSError("Stream not open")
+        num_frames = num_frames or len(frames) // self.frame_bytes
+        if self.sink is not None:
+            self.sink.writeframes(frames)
+        self.frames_done += num_frames
+        self._wait_for(self.frames_done)
+
+    def get_read_available(self):
+        return self.frames_per_buffer
+
+    def get_write_available(self):
+        return self.frames_per_buffer
+
+    def is_active(self):
+        return self.active
+
+    def is_stopped(self):
+        return not self.active
+
+    def stop_stream(self):
+        self.active = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def close(self):
+        self.stop_stream()
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+
+class PyAudio:
+    def __init__(self):
+        self.streams = []
+
+    def open(self, *args, **kwargs):
+        stream = Stream(*args, **kwargs)
+        self.streams.append(stream)
+        return stream
+
+    def get_sample_size(self, format):
+        return get_sample_size(format)
+
+    def get_format_from_width(self, width, unsigned=True):
+        return get_format_from_width(width, unsigned)
+
+    def get_device_count(self):
+        return 1
+
+    def get_default_input_device_info(self):
+        return {'index': 0, 'name': 'sim', 'maxInputChannels': 2, 'defaultSampleRate': 16000.0}
+
+    def get_default_output_device_info(self):
+        return {'index': 0, 'name': 'sim', 'maxOutputChannels': 2, 'defaultSampleRate': 44100.0}
+
+    def terminate(self):
+        for stream in self.streams:
+            stream.close()
+        self.streams = []
@@ -0,0 +1,152 @@
+"""
+camera.py
+
+cv2.VideoCapture stand-ins.
+SyntheticCamera renders a textured scene with a face-like target drifting
+across it; FileCamera plays a video file or a directory of images. Both
+deliver frames at the camera frame rate, like a real capture device.
+"""
+
+import os
+import time
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.pgm')
+
+class PacedCapture:
+    """VideoCapture-like base: read() blocks until the next frame is due."""
+
+    def __init__(self, width, height, fps):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame_index = 0
+        self.opened = True
+        self._next_frame = time.monotonic()
+
+    def isOpened(self):
+        return self.opened
+
+    def _pace(self):
+        now = time.monotonic()
+        if self._next_frame > now:
+            time.sleep(self._next_frame - now)
+        else:
+            # Fell behind: the driver drops frames instead of queueing them
+            self._next_frame = now
+        self._next_frame += 1.0 / self.fps
+
+    def render(self, out):
+        raise NotImplementedError
+
+    def read(self, image=None):
+        if not self.opened:
+            return False, None
+        self._pace()
+        if image is None or image.shape != (self.height, self.width, 3):
+            image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        if not self.render(image):
+            return False, None
+        self.frame_index += 1
+        return True, image
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FRAME_WIDTH: self.width, cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+                cv2.CAP_PROP_FPS: self.fps, cv2.CAP_PROP_POS_FRAMES: self.frame_index}.get(prop, 0)
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FPS and value > 0:
+            self.fps = value
+            return True
+        return False
+
+    def release(self):
+        self.opened = False
+
+class SyntheticCamera(PacedCapture):
+    def __init__(self, width=640, height=480, fps=30, noise=4, seed=0):
+        """
+        :param noise: standard deviation of the per-frame sensor noise (grey levels)
+        """
+        super().__init__(width, height, fps)
+        rng = np.random.default_rng(seed)
+        # Static background: gradient plus coarse texture, so motion gating sees a stable scene
+        gradient = np.linspace(60, 160, width, dtype=np.float32)[np.newaxis, :].repeat(height, axis=0)
+        texture = cv2.resize(rng.integers(0, 40, (height // 16, width // 16)).astype(np.float32),
+                             (width, height), interpolation=cv2.INTER_LINEAR)
+        self.background = cv2.cvtColor((gradient + texture).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+        # A few precomputed noise fields, cycled so rendering stays cheap
+        self.noise = [rng.normal(0, noise, (height, width, 3)).astype(np.int16) for _ in range(4)] if noise else []
+
+    def face_position(self, t):
+        """Center and radius of the face-like target at time t (slow Lissajous drift)."""
+        cx = self.width * (0.5 + 0.3 * np.sin(t * 0.4))
+        cy = self.height * (0.5 + 0.15 * np.sin(t * 0.7))
+        return int(cx), int(cy), self.height // 6
+
+    def render(self, out):
+        np.copyto(out, self.background)
+        cx, cy, r = self.face_position(self.frame_index / self.fps)
+        cv2.ellipse(out, (cx, cy), (int(r * 0.8), r), 0, 0, 360, (170, 190, 220), -1)
+        for dx in (-r // 3, r // 3):
+            cv2.circle(out, (cx + dx, cy - r // 4), max(2, r // 8), (40, 40, 40), -1)
+        cv2.ellipse(out, (cx, cy + r // 3), (r // 3, max(2, r // 10)), 0, 0, 180, (60, 60, 120), -1)
+        if self.noise:
+            cv2.add(out, self.noise[self.frame_index % len(self.noise)], dst=out, dtype=cv2.CV_8U)
+        return True
+
+class FileCamera(PacedCapture):
+    def __init__(self, source, fps=None, loop=True):
+        """
+        :param source: video file or directory of images (played in name order)
+        :param fps: playback rate (defaults to the video's own rate, 30 for images)
+        :param loop: start over at the end instead of reporting end of stream
+        """
+        self.loop = loop
+        self.video = None
+        self.images = None
+        if os.path.isdir(source):
+            self.images = sorted(os.path.join(source, name) for name in os.listdir(source)
+                                 if name.lower().endswith(IMAGE_EXTENSIONS))
+            if not self.images:
+                raise ValueError(f"No images in {source}")
+            first = cv2.imread(self.images[0])
+            height, width = first.shape[:2]
+            fps = fps or 30
+        else:
+            self.video = cv2.VideoCapture(source)
+            if not self.video.isOpened():
+                raise ValueError(f"Unable to open {source}")
+            width = int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps = fps or self.video.get(cv2.CAP_PROP_FPS) or 30
+        super().__init__(width, height, fps)
+
+    def _next(self):
+        if self.images is not None:
+            if self.frame_index >= len(self.images) and not self.loop:
+                return None
+            return cv2.imread(self.images[self.frame_index % len(self.images)])
+        ok, frame = self.video.read()
+        if not ok and self.loop:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.video.read()
+        return frame if ok else None
+
+    def render(self, out):
+        frame = self._next()
+        if frame is None:
+            return False
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        if frame.shape[:2] != out.shape[:2]:
+            frame = cv2.resize(frame, (self.width, self.height))
+        np.copyto(out, frame)
+        return True
+
+    def release(self):
+        super().release()
+        if self.video is not None:
+            self.video.release()
@@ -0,0 +1,82 @@
+"""
+display.py
+
+Virtual SH1106 OLED.
+Stands in for the luma sh1106 device: commands and page data go over the
+(simulated) I2C bus to the SH1106 controller model, so the display costs
+the same bus time as on the robot, and the panel contents can be read back
+as an image.
+"""
+
+import numpy as np
+from PIL import Image
+
+from sim.i2c import get_devices
+
+CONTROL_COMMAND = 0x00
+CONTROL_DATA = 0x40
+DATA_CHUNK = 32          # bytes per I2C write, as luma sends them
+COLUMN_OFFSET = 2        # 128 visible columns centered in 132 column RAM
+
+INIT_SEQUENCE = (0xAE, 0xD5, 0x80, 0xA8, 0x3F, 0xD3, 0x00, 0x40, 0xAD, 0x8B, 0xA1, 0xC8,
+                 0xDA, 0x12, 0x81, 0x7F, 0xD9, 0x22, 0xDB, 0x35, 0xA4, 0xA6)
+
+class VirtualSH1106:
+    def __init__(self, bus, address=0x3C, width=128, height=64, bus_number=1):
+        """
+        :param bus: SMBus-compatible handle (usually a ManagedBus on the simulated bus)
+        """
+        self.bus = bus
+        self.address = address
+        self.width = width
+        self.height = height
+        self.mode = '1'
+        self.size = (width, height)
+        self.model = get_devices(bus_number)[address]
+        self.command(*INIT_SEQUENCE)
+        self.clear()
+        self.show()
+
+    def command(self, *cmd):
+        self.bus.write_i2c_block_data(self.address, CONTROL_COMMAND, list(cmd))
+
+    def data(self, data):
+        for i in range(0, len(data), DATA_CHUNK):
+            self.bus.write_i2c_block_data(self.address, CONTROL_DATA, list(data[i:i + DATA_CHUNK]))
+
+    def preprocess(self, image):
+        return image if image.mode == self.mode else image.convert(self.mode)
+
+    def display(self, image):
+        """Full frame update, like luma's device.display()."""
+        bits = np.asarray(self.preprocess(image), dtype=bool).reshape(self.height // 8, 8, self.width)
+        pages = np.packbits(bits, axis=1, bitorder='little').reshape(self.height // 8, self.width)
+        for page in range(self.height // 8):
+            self.command(0xB0 | page, COLUMN_OFFSET & 0x0F, 0x10 | (COLUMN_OFFSET >> 4))
+            self.data(pages[page].tolist())
+
+    def clear(self):
+        self.display(Image.new(self.mode, self.size))
+
+    def show(self):
+        self.command(0xAF)
+
+    def hide(self):
+        self.command(0xAE)
+
+    def contrast(self, level):
+        self.command(0x81, level)
+
+    def cleanup(self):
+        self.hide()
+
+    def snapshot(self):
+        """Return what the panel shows as a (height, width) bool array."""
+        pages = self.height // 8
+        ram = np.frombuffer(self.model.page_ram(), dtype=np.uint8).reshape(self.model.pages, self.model.columns)
+        visible = ram[:pages, COLUMN_OFFSET:COLUMN_OFFSET + self.width]
+        bits = np.unpackbits(visible[:, np.newaxis, :], axis=1, bitorder='little')
+        return bits.reshape(self.height, self.width).astype(bool)
+
+    def to_image(self):
+        return Image.fromarray(self.snapshot().astype(np.uint8) * 255).convert('1')
@@ -0,0 +1,164 @@
+"""
+gpio.py
+
+RPi.GPIO stand-in.
+Keeps pin modes, levels and PWM state in memory, counts writes, and runs
+edge callbacks on a background thread like the real library. Inputs are
+driven from a scenario with set_input().
+"""
+
+import threading
+import time
+
+BCM = 11
+BOARD = 10
+OUT = 0
+IN = 1
+LOW = 0
+HIGH = 1
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+WRITE_LATENCY = 5e-6  # a register write through /dev/gpiomem
+
+_lock = threading.Lock()
+_mode = None
+_pins = {}       # pin -> {'direction', 'value', 'pull'}
+_events = {}     # pin -> (edge, callback, bouncetime_s, last_event)
+_pwms = {}       # pin -> PWM
+
+writes = 0
+
+SPIN_SECONDS = 50e-6  # longest final stretch spun instead of slept
+
+def _sleep(seconds):
+    """
+    Wait as long as a write takes. The driver call releases the GIL meanwhile, so sleep for
+    the bulk of it and spin only the last few microseconds that time.sleep() would overshoot.
+    """
+    end = time.perf_counter() + seconds
+    if seconds > SPIN_SECONDS:
+        time.sleep(seconds - SPIN_SECONDS)
+    while time.perf_counter() < end:
+        pass
+
+def setmode(mode):
+    global _mode
+    _mode = mode
+
+def getmode():
+    return _mode
+
+def setwarnings(flag):
+    pass
+
+def setup(channel, direction, pull_up_down=PUD_OFF, initial=LOW):
+    channels = channel if isinstance(channel, (list, tuple)) else [channel]
+    with _lock:
+        for pin in channels:
+            value = initial if direction == OUT else (HIGH if pull_up_down == PUD_UP else LOW)
+            _pins[pin] = {'direction': direction, 'value': value, 'pull': pull_up_down}
+
+def output(channel, value):
+    global writes
+    channels = channel if isinstance(channel, (list, tuple)) else [channel]
+    for pin in channels:
+        if _pins.get(pin, {}).get('direction') != OUT:
+            raise RuntimeError(f"The GPIO channel {pin} has not been set up as an OUTPUT")
+        _sleep(WRITE_LATENCY)
+        _pins[pin]['value'] = int(bool(value))
+        writes += 1
+
+def input(channel):
+    if channel not in _pins:
+        raise RuntimeError(f"You must setup() GPIO channel {channel} first")
+    return _pins[channel]['value']
+
+def add_event_detect(channel, edge, callback=None, bouncetime=None):
+    with _lock:
+        if channel in _events:
+            raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+        _events[channel] = [edge, callback, (bouncetime or 0) / 1000.0, 0.0]
+
+def add_event_callback(channel, callback):
+    with _lock:
+        _events[channel][1] = callback
+
+def remove_event_detect(channel):
+    with _lock:
+        _events.pop(channel, None)
+
+def cleanup(channel=None):
+    with _lock:
+        channels = list(_pins) if channel is None else [channel]
+        for pin in channels:
+            _pins.pop(pin, None)
+            _events.pop(pin, None)
+            pwm = _pwms.pop(pin, None)
+            if pwm is not None:
+                pwm.running = False
+
+def set_input(channel, value):
+    """Drive an input pin from a scenario; fires edge callbacks on a thread like RPi.GPIO."""
+    value = int(bool(value))
+    with _lock:
+        state = _pins.get(channel)
+        if state is None:
+            raise RuntimeError(f"You must setup() GPIO channel {channel} first")
+        previous, state['value'] = state['value'], value
+        event = _events.get(channel)
+        if event is None or previous == value:
+            return
+        edge, callback, bouncetime, last = event
+        if edge == RISING and not value or edge == FALLING and value:
+            return
+        now = time.monotonic()
+        if now - last < bouncetime:
+            return
+        event[3] = now
+    if callback is not None:
+        threading.Thread(target=callback, args=(channel,), daemon=True).start()
+
+def configure(config):
+    from sim.replay import get_session
+    get_session(config)
+
+def get_pwm(pin):
+    """Return the PWM object driving a pin (None if there is none)."""
+    return _pwms.get(pin)
+
+class PWM:
+    def __init__(self, channel, frequency):
+        if _pins.get(channel, {}).get('direction') != OUT:
+            raise RuntimeError("You must setup() the GPIO channel as an output first")
+        self.channel = channel
+        self.frequency = frequency
+        self.duty_cycle = 0.0
+        self.running = False
+        self.writes = 0
+        _pwms[channel] = self
+
+    def start(self, duty_cycle):
+        self.running = True
+        self.ChangeDutyCycle(duty_cycle)
+
+    def ChangeDutyCycle(self, duty_cycle):
+        global writes
+        if not 0.0 <= duty_cycle <= 100.0:
+            raise ValueError("dutycycle must have a value from 0.0 to 100.0")
+        _sleep(WRITE_LATENCY)
+        self.duty_cycle = duty_cycle
+        self.writes += 1
+        writes += 1
+
+    def ChangeFrequency(self, frequency):
+        if frequency <= 0.0:
+            raise ValueError("frequency must be greater than 0.0")
+        self.frequency = frequency
+
+    def stop(self):
+        self.running = False
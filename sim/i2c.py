@@ -0,0 +1,445 @@
+"""
+i2c.py
+
+smbus2 stand-in with register-level device models.
+SMBus handles talk to per-bus device models (MPU6050 at 0x68, VL53L0X at
+0x29, SH1106 at 0x3C by default) and sleep for the time the transfer would
+take on a 400 kHz bus, so bus contention and latency behave like the robot.
+"""
+
+import random
+import struct
+import threading
+import time
+
+from sim.world import world
+
+BUS_CLOCK_HZ = 400000
+BITS_PER_BYTE = 9  # 8 data bits + ACK
+
+def _transfer_time(nbytes):
+    # Start + address byte + payload + stop
+    return (1 + nbytes) * BITS_PER_BYTE / BUS_CLOCK_HZ + 20e-6
+
+SPIN_SECONDS = 50e-6  # longest final stretch spun instead of slept
+
+def _sleep(seconds):
+    """
+    Wait as long as a transfer takes. The driver call releases the GIL meanwhile, so sleep for
+    the bulk of it and spin only the last few microseconds that time.sleep() would overshoot.
+    """
+    end = time.perf_counter() + seconds
+    if seconds > SPIN_SECONDS:
+        time.sleep(seconds - SPIN_SECONDS)
+    while time.perf_counter() < end:
+        pass
+
+class RegisterDevice:
+    """I2C device with a 256 byte register file and an auto-incrementing register pointer."""
+
+    no_increment = ()
+
+    def __init__(self):
+        self.registers = bytearray(256)
+        self.pointer = 0
+        self.lock = threading.RLock()
+
+    def read_register(self, register):
+        return self.registers[register]
+
+    def write_register(self, register, value):
+        self.registers[register] = value
+
+    def write(self, data):
+        """Handle a write transfer: the first byte selects the register, the rest are written."""
+        if not data:
+            return
+        with self.lock:
+            self.pointer = data[0]
+            for value in data[1:]:
+                self.write_register(self.pointer, value)
+                self._advance()
+
+    def read(self, length):
+        """Handle a read transfer from the current register pointer."""
+        with self.lock:
+            out = bytearray(length)
+            for i in range(length):
+                out[i] = self.read_register(self.pointer)
+                self._advance()
+            return bytes(out)
+
+    def _advance(self):
+        if self.pointer not in self.no_increment:
+            self.pointer = (self.pointer + 1) & 0xFF
+
+class MPU6050Model(RegisterDevice):
+    """Accelerometer/gyro data from the simulated world, sample rate divider and a 1 KB FIFO."""
+
+    PWR_MGMT_1 = 0x6B
+    SMPLRT_DIV = 0x19
+    CONFIG = 0x1A
+    FIFO_EN = 0x23
+    INT_STATUS = 0x3A
+    ACCEL_XOUT_H = 0x3B
+    GYRO_ZOUT_L = 0x48
+    USER_CTRL = 0x6A
+    FIFO_COUNTH = 0x72
+    FIFO_COUNTL = 0x73
+    FIFO_R_W = 0x74
+    WHO_AM_I = 0x75
+
+    FIFO_SIZE = 1024
+    INT_FIFO_OFLOW = 0x10
+    USER_CTRL_FIFO_EN = 0x40
+    USER_CTRL_FIFO_RESET = 0x04
+
+    no_increment = (FIFO_R_W,)
+
+    def __init__(self, accel_noise=0.01, gyro_noise=0.05):
+        super().__init__()
+        self.registers[self.PWR_MGMT_1] = 0x40  # asleep after power on
+        self.registers[self.WHO_AM_I] = 0x68
+        self.accel_noise = accel_noise
+        self.gyro_noise = gyro_noise
+        self.fifo = bytearray()
+        self.fifo_time = time.monotonic()
+        self._fifo_count = 0
+
+    def _sample_rate(self):
+        dlpf = self.registers[self.CONFIG] & 0x07
+        output_rate = 8000 if dlpf in (0, 7) else 1000
+        return output_rate / (1 + self.registers[self.SMPLRT_DIV])
+
+    def _sample(self):
+        """Return raw (ax, ay, az, temp, gx, gy, gz) int16 values."""
+        if self.registers[self.PWR_MGMT_1] & 0x40:
+            return (0,) * 7
+        accel, gyro = world.motion()
+        accel_noise = self.accel_noise if world.noise else 0.0
+        gyro_noise = self.gyro_noise if world.noise else 0.0
+        ax, ay, az = (int(round((a + random.gauss(0, accel_noise)) * 16384)) for a in accel)
+        gx, gy, gz = (int(round((g + random.gauss(0, gyro_noise)) * 131)) for g in gyro)
+        temp = int(round((world.temperature - 36.53) * 340))
+        clamp = lambda v: max(-32768, min(32767, v))
+        return tuple(clamp(v) for v in (ax, ay, az, temp, gx, gy, gz))
+
+    def _fill_fifo(self):
+        now = time.monotonic()
+        enabled = (self.registers[self.USER_CTRL] & self.USER_CTRL_FIFO_EN
+                   and self.registers[self.FIFO_EN] & 0x78
+                   and not self.registers[self.PWR_MGMT_1] & 0x40)
+        if not enabled:
+            self.fifo_time = now
+            return
+        period = 1.0 / self._sample_rate()
+        count = int((now - self.fifo_time) / period)
+        if count <= 0:
+            return
+        self.fifo_time += count * period
+        # Only the most recent samples can still be in the FIFO
+        count = min(count, self.FIFO_SIZE // 12 + 1)
+        for _ in range(count):
+            ax, ay, az, _, gx, gy, gz = self._sample()
+            self.fifo += struct.pack('>6h', ax, ay, az, gx, gy, gz)
+        if len(self.fifo) > self.FIFO_SIZE:
+            del self.fifo[:len(self.fifo) - self.FIFO_SIZE]
+            self.registers[self.INT_STATUS] |= self.INT_FIFO_OFLOW
+
+    def write_register(self, register, value):
+        if register == self.USER_CTRL and value & self.USER_CTRL_FIFO_RESET:
+            self.fifo.clear()
+            self.fifo_time = time.monotonic()
+            self.registers[self.INT_STATUS] &= ~self.INT_FIFO_OFLOW & 0xFF
+            value &= ~self.USER_CTRL_FIFO_RESET & 0xFF  # self clearing
+        super().write_register(register, value)
+
+    def read(self, length):
+        with self.lock:
+            if self.ACCEL_XOUT_H <= self.pointer <= self.GYRO_ZOUT_L:
+                # Latch one coherent sample into the data registers for this burst
+                self.registers[self.ACCEL_XOUT_H:self.GYRO_ZOUT_L + 1] = struct.pack('>7h', *self._sample())
+            self._fill_fifo()
+        return super().read(length)
+
+    def read_register(self, register):
+        if register == self.INT_STATUS:
+            value = self.registers[register]
+            self.registers[register] = 0  # cleared on read
+            return value
+        if register == self.FIFO_COUNTH:
+            self._fifo_count = len(self.fifo)
+            return self._fifo_count >> 8
+        if register == self.FIFO_COUNTL:
+            return self._fifo_count & 0xFF
+        if register == self.FIFO_R_W:
+            if not self.fifo:
+                return 0
+            value = self.fifo[0]
+            del self.fifo[0]
+            return value
+        return self.registers[register]
+
+class VL53L0XModel(RegisterDevice):
+    """
+    Time-of-flight ranging with the register behaviour the adafruit_vl53l0x driver relies on:
+    identification, SPAD info handshake, single shot / back-to-back ranging, interrupt status
+    and range result. Timing registers are stored but not decoded; every measurement takes
+    `timing_budget` seconds.
+    """
+
+    SYSRANGE_START = 0x00
+    SYSTEM_INTERRUPT_CLEAR = 0x0B
+    RESULT_INTERRUPT_STATUS = 0x13
+    RESULT_RANGE_MM = 0x1E
+    PAGE_SELECT = 0xFF
+    SPAD_STROBE = 0x83
+    SPAD_INFO = 0x92
+    OUT_OF_RANGE = 8190
+    MAX_RANGE_MM = 2000
+
+    def __init__(self, timing_budget=0.033, noise_mm=3.0):
+        super().__init__()
+        self.registers[0xC0] = 0xEE
+        self.registers[0xC1] = 0xAA
+        self.registers[0xC2] = 0x10
+        self.registers[0x91] = 0x3C  # stop variable
+        self.page = bytearray(256)   # registers behind PAGE_SELECT = 1
+        self.timing_budget = timing_budget
+        self.noise_mm = noise_mm
+        self.continuous = False
+        self.measurement_end = None
+        self.result = self.OUT_OF_RANGE
+
+    def _start(self, at):
+        self.measurement_end = at + self.timing_budget
+
+    def _measure(self):
+        distance = world.distance_mm
+        if distance is None or distance > self.MAX_RANGE_MM:
+            return self.OUT_OF_RANGE
+        noise = random.gauss(0, self.noise_mm + 0.01 * distance) if world.noise else 0.0
+        return max(0, min(self.OUT_OF_RANGE - 1, int(round(distance + noise))))
+
+    def _ready(self):
+        if self.measurement_end is None or time.monotonic() < self.measurement_end:
+            return False
+        if self.result is None:
+            self.result = self._measure()
+        return True
+
+    def write_register(self, register, value):
+        if self.registers[self.PAGE_SELECT] == 0x01 and register != self.PAGE_SELECT:
+            self.page[register] = value
+            return
+        if register == self.SYSRANGE_START:
+            if value & 0x02:
+                self.continuous = True
+                self.result = None
+                self._start(time.monotonic())
+            elif value & 0x01:
+                self.continuous = False
+                self.result = None
+                self._start(time.monotonic())
+            else:
+                self.continuous = False
+            return
+        if register == self.SYSTEM_INTERRUPT_CLEAR and value & 0x01:
+            if self.continuous and self.measurement_end is not None:
+                # Back-to-back mode: the next measurement started when the last one finished
+                self._start(max(self.measurement_end, time.monotonic() - self.timing_budget))
+                self.result = None
+            else:
+                self.measurement_end = None
+        super().write_register(register, value)
+
+    def read_register(self, register):
+        if self.registers[self.PAGE_SELECT] == 0x01 and register not in (self.PAGE_SELECT, self.SPAD_INFO):
+            if register == self.SPAD_STROBE:
+                return self.page[register] | 0x01  # SPAD info ready
+            return self.page[register]
+        if register == self.SYSRANGE_START:
+            return 0x02 if self.continuous else 0x00  # start bit clears once ranging begins
+        if register == self.RESULT_INTERRUPT_STATUS:
+            return 0x04 if self._ready() else 0x00
+        if register == self.SPAD_STROBE:
+            return self.registers[register] | 0x01
+        if register == self.SPAD_INFO:
+            return 0x80 | 5  # aperture SPADs, count 5
+        if register == self.RESULT_RANGE_MM:
+            return ((self.result or 0) >> 8) & 0xFF
+        if register == self.RESULT_RANGE_MM + 1:
+            return (self.result or 0) & 0xFF
+        return self.registers[register]
+
+class SH1106Model:
+    """SH1106 controller: interprets command and data streams into 8 pages of 132 column RAM."""
+
+    CONTROL_COMMAND = 0x00
+    CONTROL_DATA = 0x40
+
+    def __init__(self, pages=8, columns=132):
+        self.ram = bytearray(pages * columns)
+        self.pages = pages
+        self.columns = columns
+        self.page = 0
+        self.column = 0
+        self.display_on = False
+        self.lock = threading.Lock()
+        self.bytes_written = 0
+
+    def write(self, data):
+        if not data:
+            return
+        with self.lock:
+            self.bytes_written += len(data)
+            control, payload = data[0], data[1:]
+            if control & self.CONTROL_DATA:
+                for value in payload:
+                    if self.column < self.columns:
+                        self.ram[self.page * self.columns + self.column] = value
+                    self.column += 1
+            else:
+                self._commands(payload)
+
+    def _commands(self, payload):
+        i = 0
+        while i < len(payload):
+            cmd = payload[i]
+            if 0xB0 <= cmd <= 0xB7:
+                self.page = cmd & 0x07
+            elif cmd <= 0x0F:
+                self.column = (self.column & 0xF0) | cmd
+            elif 0x10 <= cmd <= 0x1F:
+                self.column = (self.column & 0x0F) | ((cmd & 0x0F) << 4)
+            elif cmd in (0xAE, 0xAF):
+                self.display_on = cmd == 0xAF
+            elif cmd in (0x81, 0xA8, 0xD3, 0xD5, 0xD9, 0xDA, 0xDB, 0xAD):
+                i += 1  # two byte command, skip the argument
+            i += 1
+
+    def read(self, length):
+        return bytes(length)
+
+    def page_ram(self):
+        with self.lock:
+            return bytes(self.ram)
+
+_buses = {}
+_buses_lock = threading.Lock()
+
+def default_devices():
+    return {0x68: MPU6050Model(), 0x29: VL53L0XModel(), 0x3C: SH1106Model()}
+
+def get_devices(bus=1):
+    """Return the device models attached to a simulated bus (address -> model)."""
+    with _buses_lock:
+        devices = _buses.get(bus)
+        if devices is None:
+            devices = _buses[bus] = default_devices()
+        return devices
+
+def configure(config):
+    distance = config.get('distance_mm')
+    if distance is not None:
+        world.set_distance(distance)
+    from sim.replay import get_session
+    get_session(config)
+
+class i2c_msg:
+    """Subset of smbus2.i2c_msg: iterable/bytes-convertible read and write messages."""
+
+    def __init__(self, addr, flags, buf):
+        self.addr = addr
+        self.flags = flags
+        self.buf = bytearray(buf)
+        self.len = len(self.buf)
+
+    @staticmethod
+    def read(address, length):
+        return i2c_msg(address, 1, bytes(length))
+
+    @staticmethod
+    def write(address, buf):
+        if isinstance(buf, str):
+            buf = buf.encode('utf-8')
+        return i2c_msg(address, 0, bytes(buf))
+
+    def __iter__(self):
+        return iter(self.buf)
+
+    def __len__(self):
+        return self.len
+
+    def __bytes__(self):
+        return bytes(self.buf)
+
+class SMBus:
+    def __init__(self, bus=1):
+        self.bus = bus
+        self.devices = get_devices(bus)
+
+    def _device(self, address):
+        device = self.devices.get(address)
+        if device is None:
+            _sleep(_transfer_time(0))
+            raise OSError(121, "Remote I/O error")
+        return device
+
+    def _write(self, address, data):
+        device = self._device(address)
+        _sleep(_transfer_time(len(data)))
+        device.write(bytes(data))
+
+    def _read(self, address, length):
+        device = self._device(address)
+        _sleep(_transfer_time(length))
+        return device.read(length)
+
+    def write_quick(self, address):
+        self._device(address)
+        _sleep(_transfer_time(0))
+
+    def read_byte(self, address):
+        return self._read(address, 1)[0]
+
+    def write_byte(self, address, value):
+        self._write(address, [value])
+
+    def read_byte_data(self, address, register):
+        self._write(address, [register])
+        return self._read(address, 1)[0]
+
+    def write_byte_data(self, address, register, value):
+        self._write(address, [register, value])
+
+    def read_word_data(self, address, register):
+        self._write(address, [register])
+        low, high = self._read(address, 2)
+        return low | (high << 8)
+
+    def write_word_data(self, address, register, value):
+        self._write(address, [register, value & 0xFF, value >> 8])
+
+    def read_i2c_block_data(self, address, register, length):
+        self._write(address, [register])
+        return list(self._read(address, length))
+
+    def write_i2c_block_data(self, address, register, data):
+        self._write(address, [register] + list(data))
+
+    def i2c_rdwr(self, *messages):
+        for msg in messages:
+            if msg.flags & 1:
+                msg.buf[:] = self._read(msg.addr, msg.len)
+            else:
+                self._write(msg.addr, msg.buf)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
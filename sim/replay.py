@@ -0,0 +1,149 @@
+"""
+replay.py
+
+Feeds a recording (utils/recording.py) back into the simulation.
+ReplayCamera serves the recorded frames as the camera, and WorldPlayer
+applies IMU samples, ranges and touch events to the simulated world and
+GPIO, so the unchanged controllers read them through the device models.
+Both share one ReplayClock: real time, scaled, or as fast as possible.
+"""
+
+import logging
+import threading
+import time
+
+import cv2
+
+from sim import gpio
+from sim.world import world
+from utils.recording import Recording, IMU, RANGE, TOUCH
+
+logger = logging.getLogger(__name__)
+
+class ReplayClock:
+    def __init__(self, origin, speed=1.0):
+        """
+        :param origin: recording timestamp that maps to the moment the clock starts
+        :param speed: playback speed factor; 0 replays as fast as possible
+        """
+        self.origin = origin
+        self.speed = speed
+        self.started = None
+        self.lock = threading.Lock()
+
+    def wait_until(self, timestamp):
+        if not self.speed:
+            return
+        with self.lock:
+            if self.started is None:
+                self.started = time.monotonic()
+        delay = self.started + (timestamp - self.origin) / self.speed - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+class ReplayCamera:
+    """cv2.VideoCapture stand-in returning read-only frame views straight from the mapped file."""
+
+    def __init__(self, recording, clock, loop=False):
+        self.recording = recording
+        self.clock = clock
+        self.loop = loop
+        self.frames = recording.frames()
+        self.opened = True
+        self.frame_index = 0
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self, image=None):
+        if not self.opened:
+            return False, None
+        try:
+            timestamp, frame = next(self.frames)
+        except StopIteration:
+            if not self.loop:
+                return False, None
+            self.frames = self.recording.frames()
+            return self.read()
+        self.clock.wait_until(timestamp)
+        self.frame_index += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.frame_index
+        return 0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.opened = False
+
+class WorldPlayer:
+    def __init__(self, recording, clock):
+        self.recording = recording
+        self.clock = clock
+        self.thread = None
+        self.running = False
+        self.finished = threading.Event()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        world.noise = False  # the recorded values already carry the sensor noise
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        for record in self.recording.records((IMU, RANGE, TOUCH)):
+            if not self.running:
+                break
+            if record.kind == IMU:
+                for sample in record.data:
+                    self.clock.wait_until(sample[0])
+                    world.set_motion(sample[1:4].tolist(), sample[4:7].tolist())
+                continue
+            self.clock.wait_until(record.timestamp)
+            if record.kind == RANGE:
+                world.set_distance(record.data)
+            elif record.kind == TOUCH:
+                pin, state = record.data
+                try:
+                    if state and gpio.input(pin):
+                        # Older recordings only hold presses (rising edge listener), release first
+                        gpio.set_input(pin, 0)
+                    gpio.set_input(pin, state)
+                except RuntimeError:
+                    pass  # pin not set up (nobody listening)
+        self.running = False
+        self.finished.set()
+        logger.info("End of recording")
+
+class ReplaySession:
+    def __init__(self, path, speed=1.0, loop_camera=False):
+        self.recording = Recording(path)
+        self.clock = ReplayClock(self.recording.start_time, speed)
+        self.camera = ReplayCamera(self.recording, self.clock, loop=loop_camera)
+        self.player = WorldPlayer(self.recording, self.clock)
+        logger.info("%s: %.1f s at %s", path, self.recording.duration,
+                    'max speed' if not speed else f'{speed}x')
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session(config):
+    """Return the process-wide replay session for the configured recording (None if not replaying)."""
+    global _session
+    path = config.get('replay')
+    if not path:
+        return None
+    with _session_lock:
+        if _session is None:
+            _session = ReplaySession(path, float(config.get('replay_speed', 1.0)))
+            _session.player.start()
+        return _session
@@ -0,0 +1,34 @@
+"""
+world.py
+
+Shared state of the simulated environment.
+The device models read from it (what the IMU feels, what the ToF sensor
+sees) and tests or benchmarks change it to script a scenario.
+"""
+
+import threading
+
+class World:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.accel = (0.0, 0.0, 1.0)  # g, robot standing still and level
+        self.gyro = (0.0, 0.0, 0.0)   # deg/s
+        self.temperature = 25.0       # deg C
+        self.distance_mm = 600        # nearest obstacle in front of the ToF sensor
+        self.noise = True             # device models add sensor noise (off when replaying recorded values)
+
+    def set_motion(self, accel=None, gyro=None):
+        with self.lock:
+            if accel is not None:
+                self.accel = tuple(accel)
+            if gyro is not None:
+                self.gyro = tuple(gyro)
+
+    def set_distance(self, distance_mm):
+        self.distance_mm = distance_mm
+
+    def motion(self):
+        with self.lock:
+            return self.accel, self.gyro
+
+world = World()
@@ -0,0 +1,126 @@
+"""
+bench_face_detectors.py
+
+Compares face detector backends on a directory of recorded frames or on a
+robot recording (utils/recording.py).
+Reports latency percentiles, throughput and how often the backends agree.
+
+Run from the repository root:
+    python -m tests.bench_face_detectors --frames recordings/frames --model models/face.tflite
+    python -m tests.bench_face_detectors --recording recordings/run.rec
+"""
+
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from controllers.face_detectors import create_detector
+from controllers.face_tracker import box_iou
+from utils.recording import Recording
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.pgm')
+
+def load_frames(directory, scale):
+    frames = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        gray = cv2.imread(os.path.join(directory, filename), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            continue
+        if scale != 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        frames.append(gray)
+    return frames
+
+def load_recording(path, scale, limit=None):
+    frames = []
+    with Recording(path) as recording:
+        for _, gray in recording.frames():
+            if limit is not None and len(frames) >= limit:
+                break
+            if scale != 1.0:
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            else:
+                gray = gray.copy()  # the view is only valid while the recording is open
+            frames.append(gray)
+    return frames
+
+def run_backend(detector, frames, warmup=3):
+    for gray in frames[:warmup]:
+        detector.detect(gray)
+    latencies = []
+    results = []
+    start = time.perf_counter()
+    for gray in frames:
+        t0 = time.perf_counter()
+        results.append(detector.detect(gray))
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    return np.array(latencies), total, results
+
+def agreement(results_a, results_b, iou_threshold=0.5):
+    """Return (fraction of frames where both agree on face presence, mean box match ratio)."""
+    presence = []
+    matches = []
+    for faces_a, faces_b in zip(results_a, results_b):
+        presence.append(bool(faces_a) == bool(faces_b))
+        if not faces_a and not faces_b:
+            continue
+        unmatched = [box for box, _ in faces_b]
+        matched = 0
+        for box, _ in faces_a:
+            best = max(unmatched, key=lambda other: box_iou(box, other), default=None)
+            if best is not None and box_iou(box, best) >= iou_threshold:
+                unmatched.remove(best)
+                matched += 1
+        matches.append(matched / max(len(faces_a), len(faces_b)))
+    return float(np.mean(presence)), float(np.mean(matches)) if matches else 1.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face detector backends")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--frames', help="directory of recorded frames")
+    source.add_argument('--recording', help="robot recording file")
+    parser.add_argument('--limit', type=int, help="use at most this many frames from a recording")
+    parser.add_argument('--model', help=".tflite model for the tflite backend")
+    parser.add_argument('--cascade', help="Haar cascade XML (defaults to OpenCV's frontal face)")
+    parser.add_argument('--threads', type=int, default=2, help="TFLite interpreter threads")
+    parser.add_argument('--scale', type=float, default=0.5, help="downscale applied before detection")
+    args = parser.parse_args()
+
+    if args.recording:
+        frames = load_recording(args.recording, args.scale, args.limit)
+    else:
+        frames = load_frames(args.frames, args.scale)
+    if not frames:
+        print(f"No frames found in {args.frames or args.recording}")
+        return
+    print(f"Loaded {len(frames)} frames ({frames[0].shape[1]}x{frames[0].shape[0]})")
+
+    detectors = [create_detector("haar", cascade_path=args.cascade, min_size=max(1, int(50 * args.scale)))]
+    if args.model:
+        detectors.append(create_detector("tflite", model_path=args.model, num_threads=args.threads))
+
+    results = {}
+    print(f"{'backend':<8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'fps':>8} {'faces':>6}")
+    for detector in detectors:
+        latencies, total, detections = run_backend(detector, frames)
+        results[detector.name] = detections
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+        faces = sum(len(d) for d in detections)
+        print(f"{detector.name:<8} {p50:8.2f} {p90:8.2f} {p99:8.2f} {latencies.max() * 1000:8.2f} "
+              f"{len(frames) / total:8.1f} {faces:6d}")
+        detector.close()
+
+    names = list(results)
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            presence, boxes = agreement(results[a], results[b])
+            print(f"{a} vs {b}: presence agreement {presence * 100:.1f}%, box agreement {boxes * 100:.1f}%")
+
+if __name__ == "__main__":
+    main()
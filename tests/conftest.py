@@ -0,0 +1,5 @@
+"""Tests run on the simulated hardware (see utils/hardware.py); set before any controller is imported."""
+
+import os
+
+os.environ.setdefault('ROBOT_SIM', '1')
@@ -1,35 +1,24 @@
-from flask import Flask, Response
-from picamera2 import Picamera2
-import cv2
+"""
+Live camera check: streams CameraController frames as MJPEG.
+Run from the repository root and open http://<robot-ip>:5000/
+    python -m tests.test_camera
+"""
 
-app = Flask(__name__)
-picam2 = Picamera2()
-picam2.configure(picam2.create_video_configuration(main={"size": (1024, 720)}))
-picam2.start()
+import time
 
-def gen_frames():
-    while True:
-        frame = picam2.capture_array()
-        # BGR to RGB, changes reds to blue and blues to reds
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-        _, buffer = cv2.imencode('.jpg', frame)
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-
-@app.route('/')
-def index():
-    return '''
-        <html>
-        <head><title>Pi-Cam</title></head>
-        <body>
-            <img src="/video_feed">
-        </body>
-        </html>
-    '''
-
-@app.route('/video_feed')
-def video_feed():
-    return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+from controllers.camera_controller import CameraController
+from controllers.stream_server import MJPEGStreamer
+from utils.logger_tools import setup_logging
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    setup_logging(log_file=False)
+    camera = CameraController()
+    camera.start_camera()
+    streamer = MJPEGStreamer(camera, port=5000)
+    streamer.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        streamer.stop()
+        camera.stop_camera()
@@ -0,0 +1,110 @@
+"""
+Runtime checks on the simulated hardware.
+    python -m pytest tests/test_runtime.py
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from controllers.motor_controller import MotorController
+from controllers.sensor_controller import SensorController
+from main import motor_task, sensor_task
+from utils.event_bus import BlockingLane, DeadlineMissed, EventBus, ExecutorBusy
+
+class ObstacleAhead:
+    """Sensor readings with an obstacle in front and the robot level."""
+
+    def obstacle_detected(self):
+        return True
+
+    def get_distance(self):
+        return 100
+
+    def is_tilted(self):
+        return False
+
+    def imu_fault(self):
+        return False
+
+def _duty_cycles(motor_ctrl):
+    return {pwm: pwm.duty_cycle for pwm in motor_ctrl._duty}
+
+def test_obstacle_event_drives_motors():
+    motor_ctrl = MotorController()
+    motor_ctrl.initialize_motors()
+    before = _duty_cycles(motor_ctrl)
+    seen = []
+
+    async def scenario():
+        bus = EventBus()
+        bus.bind()
+        motor_lane = BlockingLane(ThreadPoolExecutor(max_workers=1))
+        safety_lane = BlockingLane(ThreadPoolExecutor(max_workers=1))
+        tasks = [asyncio.create_task(sensor_task(bus, ObstacleAhead())),
+                 asyncio.create_task(motor_task(bus, motor_ctrl, motor_lane, safety_lane))]
+        # Sample the outputs while the avoidance manoeuvre runs
+        for _ in range(20):
+            await asyncio.sleep(0.05)
+            seen.append(_duty_cycles(motor_ctrl))
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        motor_lane.shutdown()
+        safety_lane.shutdown()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        motor_ctrl.cleanup()
+
+    assert any(duty != before for duty in seen)
+    # The manoeuvre starts by reversing both motors
+    assert any(duty[motor_ctrl.motor1_backward_pwm] > 0 and duty[motor_ctrl.motor2_backward_pwm] > 0
+               for duty in seen)
+
+def test_lane_keeps_one_call_in_flight():
+    calls = []
+
+    def slow():
+        calls.append(time.monotonic())
+        time.sleep(0.3)
+
+    async def scenario():
+        lane = BlockingLane(ThreadPoolExecutor(max_workers=1))
+        with pytest.raises(DeadlineMissed):
+            await lane.run(slow, deadline=0.05)
+        assert lane.busy
+        with pytest.raises(ExecutorBusy):
+            await lane.run(slow, deadline=0.05)
+        await asyncio.sleep(0.4)
+        assert not lane.busy
+        await lane.run(slow)
+        lane.shutdown()
+        return lane
+
+    lane = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert lane.skipped == 1
+
+def test_stale_imu_is_reported():
+    sensor_ctrl = SensorController(max_sample_age=0.2)
+    sensor_ctrl.initialize_sensors()
+    try:
+        time.sleep(0.1)
+        assert not sensor_ctrl.imu_fault()
+        assert sensor_ctrl.get_orientation() is not None
+
+        def failing_read():
+            raise OSError("I2C bus error")
+        sensor_ctrl.mpu.read_burst = failing_read
+        time.sleep(0.4)
+
+        assert sensor_ctrl.imu_fault()
+        assert sensor_ctrl.get_orientation() is None
+        stats = sensor_ctrl.get_sensor_stats()['imu']
+        assert stats['stale'] and stats['stale_events'] == 1
+    finally:
+        sensor_ctrl.cleanup()
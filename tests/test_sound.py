@@ -1,3 +1,14 @@
-import pygame
-pygame.mixer.init()
-pygame.mixer.Sound("assets/sounds/hello.wav").play()
+import time
+
+from controllers.sound_engine import SoundEngine
+from utils.hardware import pyaudio
+from utils.logger_tools import setup_logging
+
+if __name__ == '__main__':
+    setup_logging(log_file=False)
+    # python -m tests.test_sound
+    engine = SoundEngine(pyaudio.PyAudio())
+    engine.start()
+    engine.play("hello")
+    time.sleep(2)
+    engine.stop()
@@ -0,0 +1,39 @@
+"""
+Voice activity detection on synthetic audio.
+    python -m pytest tests/test_voice_activity.py
+"""
+
+import numpy as np
+
+from controllers.voice_activity import EnergyVAD, UtteranceSegmenter
+
+RATE = 16000
+FRAME = 480  # 30 ms
+
+def _hum(amplitude, frames, rng, freq=120.0):
+    """Low-frequency hum with a little noise, like a motor or fan; crosses zero rarely."""
+    t = np.arange(frames * FRAME) / RATE
+    signal = amplitude * np.sin(2 * np.pi * freq * t) + rng.normal(0, amplitude * 0.05, len(t))
+    return np.clip(signal, -32768, 32767).astype(np.int16).reshape(frames, FRAME)
+
+def test_noise_step_is_not_speech_forever():
+    rng = np.random.default_rng(0)
+    vad = EnergyVAD()
+    segmenter = UtteranceSegmenter(vad)
+    for frame in _hum(300, 50, rng):
+        assert not vad.is_speech(frame)
+
+    # The motors start: 20x louder background from now on
+    utterances = 0
+    in_speech = []
+    for frame in _hum(6000, 600, rng):
+        if segmenter.feed(frame) is not None:
+            utterances += 1
+        in_speech.append(segmenter.in_speech)
+
+    # At most the one forced utterance while the floor catches up, then silence again
+    assert utterances <= 1
+    assert not any(in_speech[-300:])
+
+    # Speech well above the new background is still detected
+    assert vad.is_speech(_hum(30000, 1, rng, freq=300.0)[0])
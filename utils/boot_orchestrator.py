@@ -0,0 +1,194 @@
+"""
+boot_orchestrator.py
+
+Parallel startup of the robot's components.
+Each component is declared with a factory and the components it depends on.
+Components whose dependencies are ready are initialized concurrently on a
+thread pool, so slow waits (camera open, sensor wake-up, TTS engine start)
+overlap instead of adding up. Factories import their modules themselves,
+which keeps heavy imports (cv2, pyaudio, luma, speech engines) off the
+startup path until the component is actually built. Progress callbacks fire
+as components finish, and every component's init time is recorded. When a
+required component fails, shutdown() stops the ones already running.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Component states
+PENDING = 'pending'
+RUNNING = 'running'
+READY = 'ready'
+FAILED = 'failed'
+SKIPPED = 'skipped'   # a dependency failed
+
+class BootError(Exception):
+    """A required component failed to initialize."""
+
+class BootComponent:
+    def __init__(self, name, factory, depends=(), required=True, stop=None):
+        self.name = name
+        self.factory = factory
+        self.depends = tuple(depends)
+        self.required = required
+        self.stop = stop
+        self.state = PENDING
+        self.instance = None
+        self.error = None
+        self.started = None
+        self.elapsed = None
+
+class BootOrchestrator:
+    def __init__(self, max_workers=4):
+        """
+        :param max_workers: components initialized at the same time
+        """
+        self.max_workers = max_workers
+        self.components = {}
+        self._callbacks = []
+        self._ready = []  # components in the order they became ready
+        self.total_time = None
+
+    def add(self, name, factory, depends=(), required=True, stop=None):
+        """
+        Declare a component.
+        :param factory: callable building and starting the component; it receives the instances of
+                        its dependencies as keyword arguments named after them
+        :param depends: names of components that must be ready first
+        :param required: when False a failure is reported and the boot continues without it
+        :param stop: optional callable(instance) releasing the component, used by shutdown()
+        """
+        if name in self.components:
+            raise ValueError(f"Component '{name}' declared twice")
+        self.components[name] = BootComponent(name, factory, depends, required, stop)
+
+    def on_progress(self, callback):
+        """Register callback(component, done, total), called when a component is ready, failed or skipped."""
+        self._callbacks.append(callback)
+
+    def _check_graph(self):
+        for component in self.components.values():
+            for dependency in component.depends:
+                if dependency not in self.components:
+                    raise ValueError(f"'{component.name}' depends on unknown component '{dependency}'")
+        # Depth-first search for cycles
+        visiting, done = set(), set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError("Dependency cycle: " + " -> ".join(path + [name]))
+            visiting.add(name)
+            for dependency in self.components[name].depends:
+                visit(dependency, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.components:
+            visit(name, [])
+
+    def _init(self, component):
+        component.started = time.monotonic()
+        kwargs = {name: self.components[name].instance for name in component.depends}
+        try:
+            return component.factory(**kwargs)
+        finally:
+            component.elapsed = time.monotonic() - component.started
+            if metrics.enabled:
+                metrics.histogram('boot.' + component.name).record(component.elapsed)
+
+    def _finished(self, component):
+        done = sum(c.state in (READY, FAILED, SKIPPED) for c in self.components.values())
+        for callback in self._callbacks:
+            try:
+                callback(component, done, len(self.components))
+            except Exception as e:
+                logger.error("Progress callback failed: %s", e)
+
+    def boot(self):
+        """
+        Initialize every component, dependencies first and independent ones in parallel.
+        :return: dict of component name -> instance (None for failed optional components)
+        :raises BootError: when a required component fails; the components already running are left up,
+                           call shutdown() to stop them
+        """
+        self._check_graph()
+        start = time.monotonic()
+        running = {}
+        failure = None
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='boot') as pool:
+            while True:
+                if failure is None:
+                    for component in self.components.values():
+                        if component.state != PENDING:
+                            continue
+                        states = [self.components[name].state for name in component.depends]
+                        if any(state in (FAILED, SKIPPED) for state in states):
+                            component.state = SKIPPED
+                            component.error = "dependency failed"
+                            logger.warning("%s: skipped, a dependency failed", component.name)
+                            if component.required:
+                                failure = f"{component.name} skipped"
+                            self._finished(component)
+                        elif all(state == READY for state in states):
+                            component.state = RUNNING
+                            running[pool.submit(self._init, component)] = component
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    component = running.pop(future)
+                    try:
+                        component.instance = future.result()
+                        component.state = READY
+                        self._ready.append(component)
+                        logger.info("%s: ready in %.0f ms", component.name, component.elapsed * 1000)
+                    except Exception as e:
+                        component.state = FAILED
+                        component.error = str(e)
+                        logger.error("%s: failed after %.0f ms: %s", component.name, component.elapsed * 1000, e)
+                        if component.required and failure is None:
+                            failure = f"{component.name} failed: {e}"
+                    self._finished(component)
+        self.total_time = time.monotonic() - start
+        if failure is not None:
+            raise BootError(failure)
+        logger.info("%d components in %.0f ms", len(self.components), self.total_time * 1000)
+        return {name: component.instance for name, component in self.components.items()}
+
+    def shutdown(self):
+        """Stop the ready components that declared a stop callable, dependents before their dependencies."""
+        while self._ready:
+            component = self._ready.pop()
+            if component.stop is None or component.instance is None:
+                continue
+            try:
+                component.stop(component.instance)
+                logger.info("%s: stopped", component.name)
+            except Exception as e:
+                logger.error("%s: stop failed: %s", component.name, e)
+
+    def get_boot_stats(self):
+        """Return the total boot time and each component's state and init time (seconds)."""
+        return {
+            'total_s': self.total_time,
+            'components': {
+                name: {'state': c.state, 'init_s': c.elapsed, 'error': c.error}
+                for name, c in self.components.items()
+            },
+        }
+
+    def report(self):
+        """Print the per-component init times, slowest first."""
+        components = sorted(self.components.values(), key=lambda c: c.elapsed or 0.0, reverse=True)
+        for c in components:
+            elapsed = f"{c.elapsed * 1000:8.0f} ms" if c.elapsed is not None else f"{'-':>8}   "
+            logger.info("%-12s %-8s %s", c.name, c.state, elapsed)
+        if self.total_time is not None:
+            logger.info("%-12s %-8s %8.0f ms", 'total', '', self.total_time * 1000)
@@ -0,0 +1,135 @@
+"""
+event_bus.py
+
+Small asyncio publish/subscribe event bus for the robot runtime.
+Safety-critical events (obstacle, tilt) go into a priority lane that every
+subscriber drains before any normal event. Blocking calls are pushed to
+executors with a deadline so they cannot stall the event loop.
+"""
+
+import asyncio
+import itertools
+import time
+from collections import namedtuple
+
+Event = namedtuple('Event', ['topic', 'data', 'timestamp', 'critical'])
+
+LANE_CRITICAL = 0
+LANE_NORMAL = 1
+
+class Subscription:
+    def __init__(self, topics, max_pending=32):
+        """
+        :param topics: topics to receive (None for all)
+        :param max_pending: normal events beyond this are dropped; critical events never are
+        """
+        self.topics = set(topics) if topics is not None else None
+        self.max_pending = max_pending
+        self.queue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self.normal_pending = 0
+        self.dropped = 0
+
+    def wants(self, topic):
+        return self.topics is None or topic in self.topics
+
+    def put(self, event):
+        if not event.critical:
+            if self.normal_pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self.normal_pending += 1
+        lane = LANE_CRITICAL if event.critical else LANE_NORMAL
+        self.queue.put_nowait((lane, next(self._seq), event))
+
+    async def get(self):
+        """Return the next event, critical events first."""
+        lane, _, event = await self.queue.get()
+        if lane == LANE_NORMAL:
+            self.normal_pending -= 1
+        return event
+
+class EventBus:
+    def __init__(self):
+        self.subscriptions = []
+        self.loop = None
+        self.published = 0
+
+    def subscribe(self, *topics, max_pending=32):
+        """Create a subscription for the given topics (all topics if none are given)."""
+        subscription = Subscription(topics or None, max_pending)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def publish(self, topic, data=None, critical=False):
+        """Publish from the event loop thread."""
+        event = Event(topic, data, time.monotonic(), critical)
+        self.published += 1
+        for subscription in self.subscriptions:
+            if subscription.wants(topic):
+                subscription.put(event)
+
+    def publish_threadsafe(self, topic, data=None, critical=False):
+        """Publish from any other thread (e.g. hardware callbacks)."""
+        self.loop.call_soon_threadsafe(self.publish, topic, data, critical)
+
+    def bind(self, loop=None):
+        self.loop = loop or asyncio.get_running_loop()
+
+class DeadlineMissed(Exception):
+    pass
+
+async def run_blocking(executor, func, *args, deadline=None):
+    """
+    Run a blocking call in an executor without blocking the event loop.
+    :param deadline: seconds to wait for the result; raises DeadlineMissed when exceeded
+                     (the call itself keeps running in its executor thread)
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor, func, *args)
+    return await _await_deadline(future, func, deadline)
+
+async def _await_deadline(future, func, deadline):
+    if deadline is None:
+        # Shielded so cancelling the caller leaves the future tracking the still-running call
+        return await asyncio.shield(future)
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), deadline)
+    except asyncio.TimeoutError:
+        raise DeadlineMissed(f"{getattr(func, '__name__', func)} exceeded {deadline:.3f}s")
+
+class ExecutorBusy(Exception):
+    pass
+
+class BlockingLane:
+    """
+    An executor with at most one call in flight.
+    A call that missed its deadline keeps running in its thread; until it finishes the lane
+    is busy and run() refuses new work, so late calls never pile up behind a slow or hung one.
+    Callers check `busy` and skip their turn instead.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.pending = None
+        self.skipped = 0
+
+    @property
+    def busy(self):
+        return self.pending is not None and not self.pending.done()
+
+    def skip(self):
+        """Record a turn the caller skipped because the lane was busy."""
+        self.skipped += 1
+
+    async def run(self, func, *args, deadline=None):
+        """Like run_blocking(); raises ExecutorBusy while an earlier call is still running."""
+        if self.busy:
+            self.skip()
+            raise ExecutorBusy(f"{getattr(func, '__name__', func)}: previous call still running")
+        loop = asyncio.get_running_loop()
+        self.pending = loop.run_in_executor(self.executor, func, *args)
+        return await _await_deadline(self.pending, func, deadline)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,237 @@
+"""
+governor.py
+
+Adaptive performance governor.
+SystemMonitor samples CPU utilization (/proc/stat), SoC temperature
+(/sys/class/thermal) and the firmware throttling flags. Governor steps
+through the performance profiles in config/settings.yml as the Pi heats up
+or runs out of CPU, and back once it has cooled down with some margin
+(hysteresis), so the robot degrades vision first instead of letting the
+firmware throttle everything at once. Subscribers receive the new profile
+and apply it to the running controllers.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from utils.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+SystemSample = namedtuple('SystemSample', ['timestamp', 'cpu', 'temperature', 'throttled'])
+
+PROC_STAT = '/proc/stat'
+THERMAL_ZONE = '/sys/class/thermal/thermal_zone0/temp'
+THROTTLED = '/sys/devices/platform/soc/soc:firmware/get_throttled'
+
+# get_throttled bits describing the current state (the higher bits are "has occurred" flags)
+THROTTLED_NOW = 0xF  # under-voltage, frequency capped, throttled, soft temperature limit
+
+class SystemMonitor:
+    def __init__(self, stat_path=PROC_STAT, thermal_path=THERMAL_ZONE, throttled_path=THROTTLED):
+        """
+        Paths are parameters so other boards (or test files) can be used; a missing
+        file reports None for that value.
+        """
+        self.stat_path = stat_path
+        self.thermal_path = thermal_path
+        self.throttled_path = throttled_path
+        self._last_cpu = None
+
+    def _cpu_times(self):
+        with open(self.stat_path) as f:
+            fields = [int(value) for value in f.readline().split()[1:]]
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+        return sum(fields[:8]), idle  # guest time is already included in user
+
+    def read_cpu(self):
+        """CPU utilization (0..1) since the previous call, None on the first call or without /proc."""
+        try:
+            total, idle = self._cpu_times()
+        except (OSError, ValueError, IndexError):
+            return None
+        last, self._last_cpu = self._last_cpu, (total, idle)
+        if last is None or total == last[0]:
+            return None
+        return 1.0 - (idle - last[1]) / (total - last[0])
+
+    def read_temperature(self):
+        """SoC temperature in degrees Celsius, or None."""
+        try:
+            with open(self.thermal_path) as f:
+                return int(f.read().strip()) / 1000.0
+        except (OSError, ValueError):
+            return None
+
+    def read_throttled(self):
+        """True while the firmware reports under-voltage, capping or throttling; None if unavailable."""
+        try:
+            with open(self.throttled_path) as f:
+                return bool(int(f.read().strip(), 16) & THROTTLED_NOW)
+        except (OSError, ValueError):
+            return None
+
+    def sample(self):
+        return SystemSample(time.monotonic(), self.read_cpu(), self.read_temperature(), self.read_throttled())
+
+THRESHOLDS = ('temp_c', 'cpu', 'throttled')
+
+def _merge_profiles(profiles):
+    """
+    Each profile inherits the settings of the one before it, so only the changes need to be listed.
+    Thresholds are not inherited, and the first profile is the baseline that is never entered through one.
+    """
+    merged = []
+    settings = {}
+    for index, profile in enumerate(profiles):
+        settings = dict(settings, **{key: value for key, value in profile.items() if key not in THRESHOLDS})
+        current = dict(settings, name=profile.get('name', f'level{index}'))
+        if index > 0:
+            current.update((key, profile[key]) for key in THRESHOLDS if key in profile)
+        merged.append(current)
+    return merged
+
+class Governor:
+    def __init__(self, profiles, interval=2.0, temp_hysteresis=5.0, cpu_hysteresis=0.15, min_dwell=10.0,
+                 cpu_smoothing=0.3, monitor=None):
+        """
+        :param profiles: list of profile dicts, least to most degraded. Every profile after the first
+                         is entered when any of its thresholds is reached: temp_c (degrees C),
+                         cpu (smoothed utilization 0..1) or throttled (true: firmware throttling)
+        :param interval: seconds between samples
+        :param temp_hysteresis: degrees below temp_c before a profile is left again
+        :param cpu_hysteresis: utilization below cpu before a profile is left again
+        :param min_dwell: minimum seconds in a profile before stepping back up
+        :param cpu_smoothing: weight of the newest CPU sample in the moving average
+        :param monitor: SystemMonitor (or compatible) providing samples
+        """
+        if not profiles:
+            raise ValueError("Governor needs at least one profile")
+        self.profiles = _merge_profiles(profiles)
+        self.interval = interval
+        self.temp_hysteresis = temp_hysteresis
+        self.cpu_hysteresis = cpu_hysteresis
+        self.min_dwell = min_dwell
+        self.cpu_smoothing = cpu_smoothing
+        self.monitor = monitor or SystemMonitor()
+
+        self.level = 0
+        self.changed_at = time.monotonic()
+        self.cpu = None
+        self.last_sample = None
+        self._subscribers = []
+        self.running = False
+        self.thread = None
+        self._stop = threading.Event()
+
+        # Statistics
+        self.changes = 0
+        self.time_in_profile = {profile['name']: 0.0 for profile in self.profiles}
+
+    @property
+    def profile(self):
+        return self.profiles[self.level]
+
+    def subscribe(self, callback):
+        """Register callback(profile); it is called at once with the current profile and on every change."""
+        self._subscribers.append(callback)
+        self._notify(callback)
+
+    def _notify(self, callback):
+        try:
+            callback(self.profile)
+        except Exception as e:
+            logger.error("Applying profile '%s' failed: %s", self.profile['name'], e)
+
+    def _over(self, profile, sample, temp_margin=0.0, cpu_margin=0.0):
+        """True when a profile's entry condition holds, `margin` below its thresholds."""
+        temp_c = profile.get('temp_c')
+        if temp_c is not None and sample.temperature is not None and sample.temperature >= temp_c - temp_margin:
+            return True
+        cpu = profile.get('cpu')
+        if cpu is not None and self.cpu is not None and self.cpu >= cpu - cpu_margin:
+            return True
+        return bool(profile.get('throttled')) and bool(sample.throttled)
+
+    def _target_level(self, sample, now):
+        # Degrade at once to the most degraded profile whose thresholds are reached
+        for level in range(len(self.profiles) - 1, self.level, -1):
+            if self._over(self.profiles[level], sample):
+                return level
+        # Recover one step at a time, once clearly below the current profile's thresholds
+        if self.level > 0 and now - self.changed_at >= self.min_dwell \
+                and not self._over(self.profile, sample, self.temp_hysteresis, self.cpu_hysteresis):
+            return self.level - 1
+        return self.level
+
+    def update(self, sample=None):
+        """Take (or use) one sample and switch profiles if needed; returns the current profile."""
+        sample = sample or self.monitor.sample()
+        self.last_sample = sample
+        if sample.cpu is not None:
+            self.cpu = sample.cpu if self.cpu is None else \
+                self.cpu + self.cpu_smoothing * (sample.cpu - self.cpu)
+        now = time.monotonic()
+        level = self._target_level(sample, now)
+        if level != self.level:
+            self.time_in_profile[self.profile['name']] += now - self.changed_at
+            previous = self.profile['name']
+            self.level = level
+            self.changed_at = now
+            self.changes += 1
+            temperature = f"{sample.temperature:.1f} C" if sample.temperature is not None else "n/a"
+            cpu = f"{self.cpu * 100:.0f}%" if self.cpu is not None else "n/a"
+            logger.info("%s -> %s (temp %s, cpu %s, throttled %s)",
+                        previous, self.profile['name'], temperature, cpu, sample.throttled)
+            for callback in self._subscribers:
+                self._notify(callback)
+        return self.profile
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, name="governor", daemon=True)
+        self.thread.start()
+        logger.info("Started with profile '%s'", self.profile['name'])
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.update()
+            except Exception as e:
+                logger.error("Update failed: %s", e)
+
+    def stop(self):
+        self.running = False
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def get_governor_stats(self):
+        sample = self.last_sample
+        time_in_profile = dict(self.time_in_profile)
+        time_in_profile[self.profile['name']] += time.monotonic() - self.changed_at
+        return {
+            'profile': self.profile['name'],
+            'changes': self.changes,
+            'cpu': self.cpu,
+            'temperature': sample.temperature if sample else None,
+            'throttled': sample.throttled if sample else None,
+            'time_in_profile': time_in_profile,
+        }
+
+def governor_from_config():
+    """Return a Governor for the governor section of settings.yml, or None if disabled or unconfigured."""
+    config = get_section('governor')
+    if not config.get('enabled', True) or not config.get('profiles'):
+        return None
+    return Governor(config['profiles'],
+                    interval=float(config.get('interval', 2.0)),
+                    temp_hysteresis=float(config.get('temp_hysteresis_c', 5.0)),
+                    cpu_hysteresis=float(config.get('cpu_hysteresis', 0.15)),
+                    min_dwell=float(config.get('min_dwell_s', 10.0)))
@@ -0,0 +1,75 @@
+"""
+hardware.py
+
+Selects real or simulated hardware backends.
+Controllers import GPIO, smbus2 and pyaudio from here instead of the
+hardware libraries, and open the camera and display through the factory
+functions. With ROBOT_SIM=1 (or simulation.enabled in config/settings.yml)
+the sim package models stand in, so everything runs on a Linux machine
+without a Pi attached. ROBOT_REPLAY=<recording> additionally drives the
+simulation from a recording (ROBOT_REPLAY_SPEED, 0 = as fast as possible).
+Backends are imported on first use.
+"""
+
+import importlib
+import os
+
+from utils.settings import get_section
+
+_TRUE = ('1', 'true', 'yes', 'on')
+
+def _sim_config():
+    config = dict(get_section('simulation'))
+    env = os.environ.get('ROBOT_SIM')
+    if env is not None:
+        config['enabled'] = env.lower() in _TRUE
+    for key, var in (('camera', 'ROBOT_SIM_CAMERA'), ('audio_input', 'ROBOT_SIM_AUDIO'),
+                     ('audio_output', 'ROBOT_SIM_AUDIO_OUT'), ('replay', 'ROBOT_REPLAY'),
+                     ('replay_speed', 'ROBOT_REPLAY_SPEED')):
+        if os.environ.get(var):
+            config[key] = os.environ[var]
+    if config.get('replay'):
+        config['enabled'] = True  # replay runs on the simulated devices
+    return config
+
+SIM_CONFIG = _sim_config()
+SIMULATED = bool(SIM_CONFIG.get('enabled'))
+
+# Module attribute -> (real module, simulated module)
+_BACKENDS = {
+    'GPIO': ('RPi.GPIO', 'sim.gpio'),
+    'smbus2': ('smbus2', 'sim.i2c'),
+    'pyaudio': ('pyaudio', 'sim.audio'),
+}
+
+def __getattr__(name):
+    if name not in _BACKENDS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    real, simulated = _BACKENDS[name]
+    module = importlib.import_module(simulated if SIMULATED else real)
+    if SIMULATED and hasattr(module, 'configure'):
+        module.configure(SIM_CONFIG)
+    globals()[name] = module
+    return module
+
+def open_camera(index=0):
+    """Return a cv2.VideoCapture-compatible camera."""
+    import cv2
+    if not SIMULATED:
+        return cv2.VideoCapture(index)
+    from sim.camera import FileCamera, SyntheticCamera
+    from sim.replay import get_session
+    session = get_session(SIM_CONFIG)
+    if session is not None:
+        return session.camera
+    source = SIM_CONFIG.get('camera')
+    return FileCamera(source) if source else SyntheticCamera()
+
+def open_display(bus, address):
+    """Return an SH1106 device (luma on hardware, a virtual panel on the simulated bus)."""
+    if SIMULATED:
+        from sim.display import VirtualSH1106
+        return VirtualSH1106(bus, address)
+    from luma.core.interface.serial import i2c
+    from luma.oled.device import sh1106
+    return sh1106(i2c(bus=bus, address=address))
@@ -0,0 +1,261 @@
+"""
+i2c_bus.py
+
+Shared I2C bus manager.
+Owns the single smbus2 handle for a physical I2C bus and serializes every
+transaction by priority class, so IMU reads are not stuck behind display pushes.
+Keeps per-device transaction latency and error statistics.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.hardware import smbus2
+
+# Priority classes (lower value wins the bus first)
+PRIORITY_IMU = 0
+PRIORITY_RANGING = 1
+PRIORITY_DEFAULT = 2
+PRIORITY_DISPLAY = 3
+
+class PriorityLock:
+    """Re-entrant lock that hands the bus to the highest priority waiter on release."""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._waiters = []
+        self._seq = itertools.count()
+        self._owner = None
+        self._depth = 0
+
+    def acquire(self, priority=PRIORITY_DEFAULT):
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth += 1
+                return
+            if self._owner is None and not self._waiters:
+                self._owner = me
+                self._depth = 1
+                return
+            entry = (priority, next(self._seq), me)
+            heapq.heappush(self._waiters, entry)
+            self._cond.wait_for(lambda: self._owner is None and self._waiters[0] is entry)
+            heapq.heappop(self._waiters)
+            self._owner = me
+            self._depth = 1
+
+    def release(self):
+        with self._cond:
+            self._depth -= 1
+            if self._depth == 0:
+                self._owner = None
+                self._cond.notify_all()
+
+    def has_waiters_above(self, priority):
+        """True if somebody with a more urgent priority class is waiting for the bus."""
+        waiters = self._waiters
+        return bool(waiters) and waiters[0][0] < priority
+
+class DeviceStats:
+    def __init__(self):
+        self.transactions = 0
+        self.errors = 0
+        self.busy_time = 0.0  # seconds spent holding the bus
+        self.wait_time = 0.0  # seconds spent waiting for the bus
+        self.max_latency = 0.0
+
+    def to_dict(self):
+        n = max(self.transactions, 1)
+        return {
+            'transactions': self.transactions,
+            'errors': self.errors,
+            'avg_latency_ms': (self.busy_time + self.wait_time) / n * 1000,
+            'avg_wait_ms': self.wait_time / n * 1000,
+            'max_latency_ms': self.max_latency * 1000,
+            'busy_time_s': self.busy_time,
+        }
+
+class I2CBusManager:
+    def __init__(self, bus_number=1):
+        self.bus_number = bus_number
+        self.bus = smbus2.SMBus(bus_number)
+        self.lock = PriorityLock()
+        self.stats = {}
+        self.started = time.monotonic()
+
+    def _device_stats(self, address):
+        stats = self.stats.get(address)
+        if stats is None:
+            stats = self.stats.setdefault(address, DeviceStats())
+        return stats
+
+    @contextmanager
+    def transaction(self, address, priority=PRIORITY_DEFAULT):
+        """
+        Hold the bus for one or more operations on a device.
+        Nested transactions on the same thread reuse the held bus, so related
+        block transfers can be batched under a single arbitration.
+        :yield: the raw smbus2 handle
+        """
+        requested = time.monotonic()
+        self.lock.acquire(priority)
+        acquired = time.monotonic()
+        stats = self._device_stats(address)
+        try:
+            yield self.bus
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            released = time.monotonic()
+            self.lock.release()
+            stats.transactions += 1
+            stats.wait_time += acquired - requested
+            stats.busy_time += released - acquired
+            stats.max_latency = max(stats.max_latency, released - requested)
+
+    def write_blocks(self, address, blocks, priority=PRIORITY_DEFAULT):
+        """Write several (register, data) blocks under one bus arbitration."""
+        with self.transaction(address, priority) as bus:
+            for register, data in blocks:
+                bus.write_i2c_block_data(address, register, list(data))
+
+    def is_contended(self, priority):
+        """True if a more urgent transaction is waiting, i.e. lower priority work should back off."""
+        return self.lock.has_waiters_above(priority)
+
+    def client(self, priority=PRIORITY_DEFAULT):
+        """Return an SMBus-compatible handle whose transactions use the given priority class."""
+        return ManagedBus(self, priority)
+
+    def busio(self, priority=PRIORITY_DEFAULT):
+        """Return a busio.I2C-compatible handle for CircuitPython drivers."""
+        return BusioI2C(self, priority)
+
+    def get_stats(self):
+        """Per-device stats keyed by hex address, plus overall bus utilization."""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        busy = sum(stats.busy_time for stats in self.stats.values())
+        return {
+            'utilization': busy / elapsed,
+            'devices': {f"0x{address:02X}": stats.to_dict() for address, stats in self.stats.items()},
+        }
+
+class ManagedBus:
+    """Drop-in replacement for smbus2.SMBus that routes every call through the bus manager."""
+
+    def __init__(self, manager, priority):
+        self.manager = manager
+        self.priority = priority
+
+    def batch(self, address):
+        """Context manager holding the bus for several calls to one device."""
+        return self.manager.transaction(address, self.priority)
+
+    def read_byte(self, address):
+        with self.manager.transaction(address, self.priority) as bus:
+            return bus.read_byte(address)
+
+    def write_byte(self, address, value):
+        with self.manager.transaction(address, self.priority) as bus:
+            bus.write_byte(address, value)
+
+    def write_quick(self, address):
+        with self.manager.transaction(address, self.priority) as bus:
+            bus.write_quick(address)
+
+    def read_byte_data(self, address, register):
+        with self.manager.transaction(address, self.priority) as bus:
+            return bus.read_byte_data(address, register)
+
+    def write_byte_data(self, address, register, value):
+        with self.manager.transaction(address, self.priority) as bus:
+            bus.write_byte_data(address, register, value)
+
+    def read_i2c_block_data(self, address, register, length):
+        with self.manager.transaction(address, self.priority) as bus:
+            return bus.read_i2c_block_data(address, register, length)
+
+    def write_i2c_block_data(self, address, register, data):
+        with self.manager.transaction(address, self.priority) as bus:
+            bus.write_i2c_block_data(address, register, data)
+
+    def i2c_rdwr(self, *messages):
+        with self.manager.transaction(messages[0].addr, self.priority) as bus:
+            bus.i2c_rdwr(*messages)
+
+    def close(self):
+        # The bus handle is owned by the manager
+        pass
+
+class BusioI2C:
+    """Minimal busio.I2C stand-in (try_lock/unlock/writeto/readfrom_into) on top of the bus manager."""
+
+    def __init__(self, manager, priority):
+        self.manager = manager
+        self.priority = priority
+
+    def try_lock(self):
+        self.manager.lock.acquire(self.priority)
+        return True
+
+    def unlock(self):
+        self.manager.lock.release()
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        data = bytes(buffer[start:end])
+        with self.manager.transaction(address, self.priority) as bus:
+            if data:
+                bus.i2c_rdwr(smbus2.i2c_msg.write(address, data))
+            else:
+                bus.write_quick(address)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        end = len(buffer) if end is None else end
+        read = smbus2.i2c_msg.read(address, end - start)
+        with self.manager.transaction(address, self.priority) as bus:
+            bus.i2c_rdwr(read)
+        buffer[start:end] = bytes(read)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *,
+                              out_start=0, out_end=None, in_start=0, in_end=None):
+        in_end = len(buffer_in) if in_end is None else in_end
+        write = smbus2.i2c_msg.write(address, bytes(buffer_out[out_start:out_end]))
+        read = smbus2.i2c_msg.read(address, in_end - in_start)
+        with self.manager.transaction(address, self.priority) as bus:
+            bus.i2c_rdwr(write, read)
+        buffer_in[in_start:in_end] = bytes(read)
+
+    def scan(self):
+        return scan_addresses(self.manager)
+
+    def deinit(self):
+        pass
+
+def scan_addresses(manager):
+    """Return the addresses that acknowledge a read on the managed bus."""
+    devices = []
+    for address in range(0x03, 0x78):
+        try:
+            with manager.transaction(address) as bus:
+                bus.read_byte(address)
+            devices.append(address)
+        except OSError:
+            # No device at this address
+            pass
+    return devices
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+def get_bus_manager(bus_number=1):
+    """Return the process-wide manager for an I2C bus, creating it on first use."""
+    with _managers_lock:
+        manager = _managers.get(bus_number)
+        if manager is None:
+            manager = _managers[bus_number] = I2CBusManager(bus_number)
+        return manager
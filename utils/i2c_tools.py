@@ -3,9 +3,10 @@ i2c_tools.py
 
 Utility functions for scanning and initializing I2C devices.
 Useful for debugging and confirming connected I2C addresses.
+All access goes through the shared bus manager (utils/i2c_bus.py).
 """
 
-import smbus2
+from utils.i2c_bus import get_bus_manager, scan_addresses
 
 def scan_i2c(bus_number=1):
     """
@@ -13,18 +14,10 @@ def scan_i2c(bus_number=1):
     :param bus_number: I2C bus number, typically 1 on Raspberry Pi
     :return: List of detected device addresses
     """
-    bus = smbus2.SMBus(bus_number)
-    devices = []
     print("Scanning I2C bus...")
-    for address in range(0x03, 0x78):
-        try:
-            bus.read_byte(address)
-            devices.append(address)
-            print(f"Found device at 0x{address:02X}")
-        except OSError:
-            # No device at this address
-            pass
-    bus.close()
+    devices = scan_addresses(get_bus_manager(bus_number))
+    for address in devices:
+        print(f"Found device at 0x{address:02X}")
     if not devices:
         print("No I2C devices found.")
     return devices
@@ -38,12 +31,23 @@ def initialize_device(bus_number=1, address=0x00, init_commands=None):
     """
     if init_commands is None:
         init_commands = []
-    bus = smbus2.SMBus(bus_number)
+    manager = get_bus_manager(bus_number)
     try:
-        for reg, val in init_commands:
-            bus.write_byte_data(address, reg, val)
-            print(f"Sent init command to 0x{address:02X}: reg=0x{reg:02X}, val=0x{val:02X}")
+        with manager.transaction(address) as bus:
+            for reg, val in init_commands:
+                bus.write_byte_data(address, reg, val)
+                print(f"Sent init command to 0x{address:02X}: reg=0x{reg:02X}, val=0x{val:02X}")
     except Exception as e:
         print(f"Error initializing device at 0x{address:02X}: {e}")
-    finally:
-        bus.close()
+
+def print_bus_stats(bus_number=1):
+    """
+    Print per-device transaction counts, latency and errors for the shared bus.
+    :param bus_number: I2C bus number
+    """
+    stats = get_bus_manager(bus_number).get_stats()
+    print(f"I2C bus {bus_number} utilization: {stats['utilization'] * 100:.1f}%")
+    for address, device in stats['devices'].items():
+        print(f"  {address}: {device['transactions']} transactions, "
+              f"avg {device['avg_latency_ms']:.2f} ms (wait {device['avg_wait_ms']:.2f} ms), "
+              f"max {device['max_latency_ms']:.2f} ms, {device['errors']} errors")
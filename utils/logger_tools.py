@@ -1,44 +1,266 @@
 """
-logger.py
+logger_tools.py
 
-Basic logger utility to log messages with timestamps.
-Supports different log levels: INFO, WARNING, ERROR.
+Logging setup for the robot.
+Modules log through the standard logging module
+(`logger = logging.getLogger(__name__)`). setup_logging() routes every record
+through a bounded queue to a background listener thread, so the control loops
+never wait on console or SD card writes:
+
+    logger -> RateLimitFilter -> queue -> listener thread -> console
+                                                          -> rotating log file
+
+Repeats of the same message, errors included, are rate limited per message
+key, and the number suppressed is reported with the next one let through.
+The log file can be plain text or compact JSON lines, and is flushed in
+batches to spare the SD card; the first error of each key and window is
+flushed at once.
+
+Configured from the logging section of config/settings.yml, overridden by
+ROBOT_LOG_LEVEL, ROBOT_LOG_FILE and ROBOT_LOG_JSON.
 """
 
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from utils.settings import get_section
 
 LOG_DIR = "logs"
 LOG_FILE = os.path.join(LOG_DIR, "robot.log")
 
+TEXT_FORMAT = '%(asctime)s %(levelname)-7s [%(name)s] %(message)s'
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, interval=10.0, burst=5, max_keys=1024):
+        """
+        Let at most `burst` records per key through every `interval` seconds.
+        The key is the logger, level and unformatted message, so "Obstacle at %d mm" is one key
+        whatever the distance; pass extra={'log_key': ...} to choose the key explicitly.
+        The first record of each window is marked `window_start`, so handlers can single it out.
+        :param max_keys: keys tracked before expired ones are pruned
+        """
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.max_keys = max_keys
+        self._windows = {}  # key -> [window start, records let through, records suppressed]
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        key = getattr(record, 'log_key', None) or (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if window is not None and window[2]:
+                    record.suppressed = window[2]
+                if window is None and len(self._windows) >= self.max_keys:
+                    self._prune(now)
+                self._windows[key] = [now, 1, 0]
+                record.window_start = True
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            self.suppressed += 1
+            return False
+
+    def _prune(self, now):
+        for key in [key for key, window in self._windows.items() if now - window[0] >= self.interval]:
+            del self._windows[key]
+
+class TextFormatter(logging.Formatter):
+    def __init__(self, fmt=TEXT_FORMAT):
+        super().__init__(fmt)
+
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            text += f" ({suppressed} similar messages suppressed)"
+        return text
+
+class JsonLinesFormatter(logging.Formatter):
+    """One compact JSON object per line: ts, level, logger, msg, and thread, suppressed, exc when relevant."""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if record.threadName != 'MainThread':
+            entry['thread'] = record.threadName
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_text or record.exc_info:
+            entry['exc'] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(',', ':'), ensure_ascii=False)
+
+class LogQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records are dropped (and counted) when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Only merge the arguments here; timestamps and formatting happen on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """
+    Size-rotated log file that flushes at most every `flush_interval` seconds, and at once for
+    the first error of a rate limit window (repeats wait for the next batch).
+    """
+
+    def __init__(self, filename, max_bytes, backup_count, flush_interval=5.0):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._force_flush = False
+
+    def emit(self, record):
+        self._force_flush = record.levelno >= logging.ERROR and getattr(record, 'window_start', True)
+        super().emit(record)
+
+    def flush(self):
+        now = time.monotonic()
+        if self._force_flush or now - self._last_flush >= self.flush_interval:
+            super().flush()
+            self._last_flush = now
+
+    def close(self):
+        self._force_flush = True
+        super().close()
+
+_listener = None
+_queue_handler = None
+_rate_limit = None
+_setup_lock = threading.Lock()
+
+FALSE_VALUES = ('', '0', 'false', 'no', 'off', 'none')
+
+def _env_flag(name, default):
+    value = os.environ.get(name)
+    return default if value is None else value.lower() in ('1', 'true', 'yes')
+
+def _log_file_setting(value):
+    """A log file path, or False for "false", "0", "no" and the like (as YAML or env var)."""
+    if value is None or value is False or str(value).strip().lower() in FALSE_VALUES:
+        return False
+    return str(value)
+
+def setup_logging(level=None, log_file=None, console=True, json_lines=None, max_bytes=None,
+                  backup_count=None, rate_interval=None, rate_burst=None, queue_size=None):
+    """
+    Route all logging through the background listener. Safe to call more than once:
+    later calls return the running listener without adding handlers.
+    Arguments left as None come from the logging section of settings.yml.
+    :param log_file: rotating log file (False for console only)
+    :param json_lines: write the log file as JSON lines instead of text
+    :param max_bytes: rotate the log file at this size
+    :param backup_count: rotated files kept
+    :param rate_interval, rate_burst: at most rate_burst records per message key every rate_interval seconds
+    :param queue_size: records buffered for the listener; further records are dropped
+    """
+    global _listener, _queue_handler, _rate_limit
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+        config = get_section('logging')
+        level = os.environ.get('ROBOT_LOG_LEVEL') or level or config.get('level', 'INFO')
+        if log_file is None:
+            log_file = os.environ.get('ROBOT_LOG_FILE', config.get('file', LOG_FILE))
+        log_file = _log_file_setting(log_file)
+        json_lines = _env_flag('ROBOT_LOG_JSON', json_lines if json_lines is not None
+                               else bool(config.get('json', False)))
+
+        handlers = []
+        if console:
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(TextFormatter())
+            handlers.append(console_handler)
+        if log_file:
+            directory = os.path.dirname(log_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            file_handler = BufferedRotatingFileHandler(
+                log_file,
+                max_bytes=max_bytes or int(config.get('max_bytes', 5 << 20)),
+                backup_count=backup_count if backup_count is not None else int(config.get('backups', 3)),
+                flush_interval=float(config.get('flush_interval', 5.0)))
+            file_handler.setFormatter(JsonLinesFormatter() if json_lines else TextFormatter())
+            handlers.append(file_handler)
+
+        log_queue = queue.Queue(maxsize=queue_size or int(config.get('queue_size', 1000)))
+        _rate_limit = RateLimitFilter(interval=rate_interval or float(config.get('rate_interval', 10.0)),
+                                      burst=rate_burst or int(config.get('rate_burst', 5)))
+        _queue_handler = LogQueueHandler(log_queue)
+        _queue_handler.addFilter(_rate_limit)
+
+        root = logging.getLogger()
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+        root.addHandler(_queue_handler)
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _listener
+
+def shutdown_logging():
+    """Write out the queued records and close the handlers."""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _queue_handler = None
+
+def get_logging_stats():
+    if _listener is None:
+        return {}
+    return {
+        'queued': _queue_handler.queue.qsize(),
+        'dropped': _queue_handler.dropped,
+        'suppressed': _rate_limit.suppressed,
+    }
+
 def setup_logger():
-    if not os.path.exists(LOG_DIR):
-        os.makedirs(LOG_DIR)
-    
-    logger = logging.getLogger("MiniRobotLogger")
-    logger.setLevel(logging.DEBUG)
-    
-    # File handler for logging to a file
-    fh = logging.FileHandler(LOG_FILE)
-    fh.setLevel(logging.DEBUG)
-    
-    # Console handler for printing to stdout
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.INFO)
-    
-    # Log format
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
-    
-    logger.addHandler(fh)
-    logger.addHandler(ch)
-    
+    """Kept for older scripts: sets up logging and returns the robot's general logger."""
+    setup_logging()
     return logger
 
-logger = setup_logger()
+logger = logging.getLogger("MiniRobotLogger")
 
 # Example usage:
+# setup_logging()
 # logger.info("Robot started")
 # logger.warning("Low battery")
 # logger.error("Motor failure detected")
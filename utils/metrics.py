@@ -0,0 +1,278 @@
+"""
+metrics.py
+
+Lightweight latency instrumentation for hot paths.
+Spans are measured with the monotonic clock and recorded into fixed-size,
+log-bucketed histograms, both cumulative and over a sliding window of the
+last minute, so a recent regression is not buried under hours of history.
+When metrics are disabled a span costs one attribute check. Stats are
+served as JSON over HTTP and can be logged periodically.
+
+Enable with ROBOT_METRICS=1 (or true/yes/on) or metrics.enable().
+"""
+
+import bisect
+import functools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds: 1 us .. ~100 s, ~10% apart
+BUCKET_BOUNDS = [1e-6 * 1.1 ** i for i in range(int(math.log(1e8) / math.log(1.1)) + 1)]
+
+# Sliding window: WINDOW_SLOTS sub-histograms of WINDOW_SLOT_SECONDS each, the oldest one reused
+WINDOW_SLOTS = 6
+WINDOW_SLOT_SECONDS = 10.0
+
+def _percentile(counts, count, q, maximum):
+    """Approximate q-th percentile (0-100) of bucket counts, reported as the bucket's upper bound."""
+    if count == 0:
+        return 0.0
+    rank = q / 100.0 * count
+    seen = 0
+    for index, n in enumerate(counts):
+        seen += n
+        if seen >= rank and n:
+            return min(BUCKET_BOUNDS[index], maximum) if index < len(BUCKET_BOUNDS) else maximum
+    return maximum
+
+class Histogram:
+    """Fixed-size latency histogram (seconds). Updates are unlocked; small races only skew counts."""
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.min = math.inf
+        self.created = time.monotonic()
+        # Per slot: bucket counts, the epoch (monotonic time // WINDOW_SLOT_SECONDS) they belong to, max
+        self._slots = [[0] * len(self.counts) for _ in range(WINDOW_SLOTS)]
+        self._slot_epochs = [-1] * WINDOW_SLOTS
+        self._slot_max = [0.0] * WINDOW_SLOTS
+
+    def record(self, value):
+        index = bisect.bisect_left(BUCKET_BOUNDS, value)
+        epoch = int(time.monotonic() // WINDOW_SLOT_SECONDS)
+        slot = epoch % WINDOW_SLOTS
+        if self._slot_epochs[slot] != epoch:
+            # Slot last used a full window ago, start it over
+            self._slots[slot] = [0] * len(self.counts)
+            self._slot_max[slot] = 0.0
+            self._slot_epochs[slot] = epoch
+        self._slots[slot][index] += 1
+        if value > self._slot_max[slot]:
+            self._slot_max[slot] = value
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if value < self.min:
+            self.min = value
+
+    def percentile(self, q):
+        """Approximate q-th percentile (0-100) since startup, reported as the bucket's upper bound."""
+        return _percentile(self.counts, self.count, q, self.max)
+
+    def window(self):
+        """
+        Bucket counts, count, max and covered seconds of the sliding window (about the last minute).
+        Read-only, so any number of readers can use it without disturbing each other.
+        """
+        now = time.monotonic()
+        epoch = int(now // WINDOW_SLOT_SECONDS)
+        counts = [0] * len(self.counts)
+        maximum = 0.0
+        for slot in range(WINDOW_SLOTS):
+            if epoch - self._slot_epochs[slot] < WINDOW_SLOTS:
+                for index, n in enumerate(self._slots[slot]):
+                    counts[index] += n
+                maximum = max(maximum, self._slot_max[slot])
+        window_start = max((epoch - WINDOW_SLOTS + 1) * WINDOW_SLOT_SECONDS, self.created)
+        return counts, sum(counts), maximum, max(now - window_start, 1e-9)
+
+    def rate(self):
+        """Events per second over the sliding window."""
+        _, count, _, elapsed = self.window()
+        return count / elapsed
+
+    def summary(self):
+        counts, count, maximum, elapsed = self.window()
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'min_ms': self.min * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(50) * 1000,
+            'p90_ms': self.percentile(90) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000,
+            'recent': {
+                'count': count,
+                'rate_hz': count / elapsed,
+                'p50_ms': _percentile(counts, count, 50, maximum) * 1000,
+                'p99_ms': _percentile(counts, count, 99, maximum) * 1000,
+                'max_ms': maximum * 1000,
+            },
+        }
+
+class _Span:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.monotonic() - self.start)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class LoopTimer:
+    """Records the duration of each loop iteration and its jitter against the intended period."""
+
+    def __init__(self, metrics, name, period):
+        self.metrics = metrics
+        self.period = period
+        self.iterations = metrics.histogram(name)
+        self.jitter = metrics.histogram(name + '.jitter')
+        self._last = None
+
+    def tick(self):
+        if not self.metrics.enabled:
+            self._last = None
+            return
+        now = time.monotonic()
+        if self._last is not None:
+            interval = now - self._last
+            self.iterations.record(interval)
+            self.jitter.record(abs(interval - self.period))
+        self._last = now
+
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self.server = None
+        self.reporter = None
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram(name))
+        return histogram
+
+    def span(self, name):
+        """Context manager timing a block: `with metrics.span('display.push'): ...`"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self.histogram(name))
+
+    def timed(self, name):
+        """Decorator timing every call of a function."""
+        def decorator(func):
+            histogram = self.histogram(name)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.monotonic()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.record(time.monotonic() - start)
+            return wrapper
+        return decorator
+
+    def loop(self, name, period):
+        return LoopTimer(self, name, period)
+
+    def snapshot(self):
+        """
+        Summary of every histogram: totals since startup, and under 'recent' the percentiles and call
+        rate of the sliding window. Taking a snapshot changes nothing, so callers do not interfere.
+        """
+        result = {}
+        for name, histogram in list(self.histograms.items()):
+            if histogram.count == 0:
+                continue
+            summary = histogram.summary()
+            summary['rate_hz'] = summary['recent']['rate_hz']
+            result[name] = summary
+        return result
+
+    def serve(self, host='127.0.0.1', port=8081):
+        """Serve the current snapshot as JSON on http://host:port/metrics."""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics.snapshot(), indent=1).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logger.info("Serving on http://%s:%d/metrics", host, port)
+
+    def start_reporter(self, interval=30.0, log=None):
+        """Log each stage's last-minute summary every `interval` seconds (through `log`, default the logger)."""
+        log = log or logger.info
+
+        def report():
+            while True:
+                time.sleep(interval)
+                if not self.enabled:
+                    continue
+                for name, s in sorted(self.snapshot().items()):
+                    recent = s['recent']
+                    log(f"{name}: {recent['rate_hz']:.1f}/s p50 {recent['p50_ms']:.2f}ms "
+                        f"p99 {recent['p99_ms']:.2f}ms max {recent['max_ms']:.2f}ms (last minute)")
+
+        self.reporter = threading.Thread(target=report, daemon=True)
+        self.reporter.start()
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+metrics = Metrics(enabled=os.environ.get('ROBOT_METRICS', '').strip().lower() in TRUE_VALUES)
+span = metrics.span
+timed = metrics.timed
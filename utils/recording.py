@@ -0,0 +1,312 @@
+"""
+recording.py
+
+Sensor and camera recordings.
+A recording is an append-only file of chunks, each holding timestamped
+records (grayscale frames, IMU samples, ToF ranges, touch events), followed
+by an index of the chunks when the recorder is closed cleanly. Recorder
+writes on a background thread behind a bounded queue and drops records
+rather than blocking capture. Recording reads through mmap and hands out
+NumPy views into the file, so replay does not copy frame data.
+
+Layout (little-endian):
+    file header   8s magic, u32 version, u32 reserved
+    chunk         4s 'CHNK', u32 payload bytes, u32 records, u32 reserved,
+                  f64 first timestamp, f64 last timestamp, payload
+    record        u8 kind, u8 reserved, u16 reserved, u32 payload bytes,
+                  f64 timestamp, payload padded to 8 bytes
+    index         per chunk: u64 offset, u32 payload bytes, u32 records,
+                  f64 first timestamp, f64 last timestamp
+    footer        u64 index offset, u32 chunks, 4s 'RIDX'
+"""
+
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'ROBOREC\0'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sII')
+CHUNK_HEADER = struct.Struct('<4sIIIdd')
+CHUNK_MAGIC = b'CHNK'
+RECORD_HEADER = struct.Struct('<BBHId')
+INDEX_ENTRY = struct.Struct('<QIIdd')
+FOOTER = struct.Struct('<QI4s')
+FOOTER_MAGIC = b'RIDX'
+
+# Record kinds
+FRAME = 1   # u16 width, u16 height, u32 reserved, uint8 pixels
+IMU = 2     # float64 (n, 7): timestamp, ax, ay, az (g), gx, gy, gz (deg/s)
+RANGE = 3   # float64 raw distance in mm (NaN when there was no reading)
+TOUCH = 4   # u16 pin, u8 state
+KIND_NAMES = {FRAME: 'frame', IMU: 'imu', RANGE: 'range', TOUCH: 'touch'}
+
+FRAME_HEADER = struct.Struct('<HHI')
+RANGE_PAYLOAD = struct.Struct('<d')
+TOUCH_PAYLOAD = struct.Struct('<HB5x')
+
+Record = namedtuple('Record', ['kind', 'timestamp', 'data'])
+ChunkInfo = namedtuple('ChunkInfo', ['offset', 'size', 'records', 'first', 'last'])
+
+def _padding(size):
+    return -size % 8
+
+class Recorder:
+    def __init__(self, path, queue_size=256, chunk_bytes=4 << 20, flush_interval=1.0):
+        """
+        :param path: output file (overwritten)
+        :param queue_size: records buffered for the writer thread; further records are dropped
+        :param chunk_bytes: payload size at which a chunk is written out
+        :param flush_interval: write a partial chunk after this many seconds
+        """
+        self.path = path
+        self.chunk_bytes = chunk_bytes
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'wb')
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+        self.index = []
+
+        # Statistics
+        self.records = 0
+        self.dropped = 0
+        self.bytes_written = FILE_HEADER.size
+
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _put(self, kind, timestamp, payload):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait((kind, timestamp, payload))
+            self.records += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def record_frame(self, gray, timestamp):
+        """Queue a grayscale frame (copied, so ring buffer views may be passed)."""
+        self._put(FRAME, timestamp, np.array(gray, dtype=np.uint8, copy=True))
+
+    def record_imu(self, samples):
+        """Queue IMU samples, an (n, 7) array of (timestamp, ax, ay, az, gx, gy, gz)."""
+        samples = np.array(samples, dtype='<f8', copy=True).reshape(-1, 7)
+        if len(samples):
+            self._put(IMU, float(samples[-1, 0]), samples)
+
+    def record_range(self, raw_mm, timestamp):
+        self._put(RANGE, timestamp, RANGE_PAYLOAD.pack(float('nan') if raw_mm is None else raw_mm))
+
+    def record_touch(self, pin, state, timestamp):
+        self._put(TOUCH, timestamp, TOUCH_PAYLOAD.pack(pin, int(bool(state))))
+
+    def _encode(self, kind, timestamp, payload):
+        """Return the buffers making up one record (no copy of array payloads)."""
+        if kind == FRAME:
+            height, width = payload.shape
+            parts = [FRAME_HEADER.pack(width, height, 0), payload.data]
+        elif kind == IMU:
+            parts = [payload.data]
+        else:
+            parts = [payload]
+        size = sum(len(part) if not isinstance(part, memoryview) else part.nbytes for part in parts)
+        pad = _padding(size)
+        return [RECORD_HEADER.pack(kind, 0, 0, size, timestamp)] + parts + ([bytes(pad)] if pad else []), \
+            RECORD_HEADER.size + size + pad
+
+    def _write_chunk(self, parts, size, count, first, last):
+        offset = self.file.tell()
+        self.file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, size, count, 0, first, last))
+        self.file.writelines(parts)
+        self.file.flush()
+        self.index.append(ChunkInfo(offset, size, count, first, last))
+        self.bytes_written += CHUNK_HEADER.size + size
+
+    def _run(self):
+        parts, size, count, first, last = [], 0, 0, None, None
+        flush_at = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self.queue.get(timeout=max(0.0, flush_at - time.monotonic()))
+            except queue.Empty:
+                item = ()
+            if item:
+                kind, timestamp, payload = item
+                record_parts, record_size = self._encode(kind, timestamp, payload)
+                parts.extend(record_parts)
+                size += record_size
+                count += 1
+                first = timestamp if first is None else min(first, timestamp)
+                last = timestamp if last is None else max(last, timestamp)
+            done = item is None
+            if count and (done or size >= self.chunk_bytes or time.monotonic() >= flush_at):
+                self._write_chunk(parts, size, count, first, last)
+                parts, size, count, first, last = [], 0, 0, None, None
+            if time.monotonic() >= flush_at:
+                flush_at = time.monotonic() + self.flush_interval
+            if done:
+                break
+
+        index_offset = self.file.tell()
+        for entry in self.index:
+            self.file.write(INDEX_ENTRY.pack(*entry))
+        self.file.write(FOOTER.pack(index_offset, len(self.index), FOOTER_MAGIC))
+        self.file.close()
+
+    def close(self):
+        """Write out everything queued, the index and the footer."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+        logger.info("%s: %d records, %d dropped", self.path, self.records, self.dropped)
+
+    def get_stats(self):
+        return {
+            'records': self.records,
+            'dropped': self.dropped,
+            'queued': self.queue.qsize(),
+            'chunks': len(self.index),
+            'bytes_written': self.bytes_written,
+        }
+
+def recorder_from_config():
+    """Return a Recorder for ROBOT_RECORD / recording.path in settings.yml, or None."""
+    from utils.settings import get_section
+    path = os.environ.get('ROBOT_RECORD') or get_section('recording').get('path')
+    return Recorder(path) if path else None
+
+class Recording:
+    """Memory-mapped reader; frame and IMU data are returned as read-only views into the file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = FILE_HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a recording")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported recording version {version}")
+        self.chunks = self._read_index()
+        if self.chunks is None:
+            # Recorder did not close cleanly; rebuild the index from the chunk headers
+            self.chunks = self._scan_chunks()
+
+    def _read_index(self):
+        if len(self.map) < FILE_HEADER.size + FOOTER.size:
+            return None
+        index_offset, count, magic = FOOTER.unpack_from(self.map, len(self.map) - FOOTER.size)
+        if magic != FOOTER_MAGIC:
+            return None
+        return [ChunkInfo(*INDEX_ENTRY.unpack_from(self.map, index_offset + i * INDEX_ENTRY.size))
+                for i in range(count)]
+
+    def _scan_chunks(self):
+        chunks = []
+        offset = FILE_HEADER.size
+        while offset + CHUNK_HEADER.size <= len(self.map):
+            magic, size, count, _, first, last = CHUNK_HEADER.unpack_from(self.map, offset)
+            if magic != CHUNK_MAGIC or offset + CHUNK_HEADER.size + size > len(self.map):
+                break  # truncated tail
+            chunks.append(ChunkInfo(offset, size, count, first, last))
+            offset += CHUNK_HEADER.size + size
+        return chunks
+
+    @property
+    def start_time(self):
+        return min((chunk.first for chunk in self.chunks), default=0.0)
+
+    @property
+    def end_time(self):
+        return max((chunk.last for chunk in self.chunks), default=0.0)
+
+    @property
+    def duration(self):
+        return self.end_time - self.start_time
+
+    def _decode(self, kind, offset, size):
+        if kind == FRAME:
+            width, height, _ = FRAME_HEADER.unpack_from(self.map, offset)
+            return np.frombuffer(self.map, dtype=np.uint8, count=width * height,
+                                 offset=offset + FRAME_HEADER.size).reshape(height, width)
+        if kind == IMU:
+            return np.frombuffer(self.map, dtype='<f8', count=size // 8, offset=offset).reshape(-1, 7)
+        if kind == RANGE:
+            value = RANGE_PAYLOAD.unpack_from(self.map, offset)[0]
+            return None if value != value else value
+        if kind == TOUCH:
+            return TOUCH_PAYLOAD.unpack_from(self.map, offset)
+        return self.map[offset:offset + size]
+
+    def records(self, kinds=None, start=None, end=None):
+        """
+        Yield Records in file order.
+        :param kinds: record kinds to return (all when None)
+        :param start, end: timestamp range; chunks outside it are skipped via the index
+        """
+        for chunk in self.chunks:
+            if start is not None and chunk.last < start or end is not None and chunk.first > end:
+                continue
+            offset = chunk.offset + CHUNK_HEADER.size
+            for _ in range(chunk.records):
+                kind, _, _, size, timestamp = RECORD_HEADER.unpack_from(self.map, offset)
+                offset += RECORD_HEADER.size
+                if (kinds is None or kind in kinds) and (start is None or timestamp >= start) \
+                        and (end is None or timestamp <= end):
+                    yield Record(kind, timestamp, self._decode(kind, offset, size))
+                offset += size + _padding(size)
+
+    def frames(self, start=None, end=None):
+        """Yield (timestamp, grayscale view) pairs."""
+        for record in self.records((FRAME,), start, end):
+            yield record.timestamp, record.data
+
+    def imu(self, start=None, end=None):
+        """Return all IMU samples as one (n, 7) array."""
+        blocks = [record.data for record in self.records((IMU,), start, end)]
+        return np.concatenate(blocks) if blocks else np.zeros((0, 7))
+
+    def ranges(self, start=None, end=None):
+        """Return (timestamp, raw_mm) rows; raw_mm is NaN where there was no reading."""
+        rows = [(record.timestamp, np.nan if record.data is None else record.data)
+                for record in self.records((RANGE,), start, end)]
+        return np.array(rows, dtype=np.float64).reshape(-1, 2)
+
+    def touches(self, start=None, end=None):
+        """Return a list of (timestamp, pin, state)."""
+        return [(record.timestamp,) + record.data for record in self.records((TOUCH,), start, end)]
+
+    def summary(self):
+        counts = {}
+        for record in self.records():
+            name = KIND_NAMES.get(record.kind, str(record.kind))
+            counts[name] = counts.get(name, 0) + 1
+        return {'chunks': len(self.chunks), 'duration_s': self.duration, 'records': counts}
+
+    def close(self):
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # views are still alive; the mapping goes away with the last of them
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
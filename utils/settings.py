@@ -0,0 +1,36 @@
+"""
+settings.py
+
+Loads config/settings.yml.
+PyYAML is optional: without it (or without the file) every section is empty
+and callers fall back to their defaults and environment variables.
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'settings.yml')
+
+_cache = {}
+
+def load_settings(path=SETTINGS_PATH):
+    """Return the parsed settings file as a dict (cached per path)."""
+    if path in _cache:
+        return _cache[path]
+    settings = {}
+    try:
+        import yaml
+        with open(path) as f:
+            settings = yaml.safe_load(f) or {}
+    except ImportError:
+        logger.warning("PyYAML not installed, using defaults")
+    except FileNotFoundError:
+        pass
+    _cache[path] = settings
+    return settings
+
+def get_section(name, path=SETTINGS_PATH):
+    """Return one top level section of the settings file ({} if missing)."""
+    return load_settings(path).get(name) or {}